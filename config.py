@@ -21,6 +21,72 @@ expected_columns = {
     "users": ["user_id", "age", "gender", "occupation", "zip_code"],
 }
 
+# bronze ingestion settings
+INGEST_CONFIG = {
+    "concurrent": os.getenv("INGEST_CONCURRENT", "true").lower() == "true",
+    "max_workers": int(os.getenv("INGEST_MAX_WORKERS", "3")),
+    "timeout": int(os.getenv("INGEST_TIMEOUT", "60")),  # seconds
+    # sources streamed chunk by chunk into a multipart upload instead of held in memory
+    "stream_sources": [
+        s for s in os.getenv("INGEST_STREAM_SOURCES", "ratings").split(",") if s
+    ],
+    "chunk_rows": int(os.getenv("INGEST_CHUNK_ROWS", "500000")),
+    "part_size": int(os.getenv("INGEST_PART_SIZE", str(16 * 1024 * 1024))),  # bytes
+    # rows per block of the time index kept next to bronze ratings
+    "index_block_rows": int(os.getenv("INGEST_INDEX_BLOCK_ROWS", "100000")),
+    # streamed ratings are spilled as sorted runs and merged, so index blocks never
+    # overlap. local scratch for the runs, "" for the temp dir
+    "sort_dir": os.getenv("INGEST_SORT_DIR", ""),
+    # duplicate keys across chunks are counted with a fixed size bloom filter, so
+    # validation memory stays bounded. the count is an upper estimate: about 0.1% of
+    # keys are false positives at 50M keys in 64MB. set to false to skip the check
+    "duplicate_check": os.getenv("INGEST_DUPLICATE_CHECK", "true").lower() == "true",
+    "key_filter_bytes": int(
+        os.getenv("INGEST_KEY_FILTER_BYTES", str(64 * 1024 * 1024))
+    ),
+    # skip download/upload of sources whose fingerprint matches what is in bronze
+    "fingerprints": os.getenv("INGEST_FINGERPRINTS", "true").lower() == "true",
+}
+
+# bronze storage format: "csv" or "parquet" (compression: "zstd", "snappy", ...)
+BRONZE_CONFIG = {
+    "format": os.getenv("BRONZE_FORMAT", "csv").lower(),
+    "compression": os.getenv("BRONZE_COMPRESSION", "zstd"),
+}
+
+# compaction of small silver ratings part files into sorted parquet files
+COMPACTION_CONFIG = {
+    "target_file_bytes": int(
+        os.getenv("COMPACTION_TARGET_FILE_BYTES", str(128 * 1024 * 1024))
+    ),
+    "min_files": int(
+        os.getenv("COMPACTION_MIN_FILES", "4")
+    ),  # small files per month
+    "max_workers": int(
+        os.getenv("COMPACTION_MAX_WORKERS", "4")
+    ),  # months at a time
+    "compression": os.getenv("COMPACTION_COMPRESSION", "zstd"),
+}
+
+# silver ratings: daily partitions written at the same time by one run
+SILVER_CONFIG = {
+    "max_workers": int(os.getenv("SILVER_MAX_WORKERS", "8")),
+    # cleaning engine: "pandas" or "arrow" (Arrow compute kernels, same output)
+    "engine": os.getenv("SILVER_ENGINE", "pandas").lower(),
+    # processes running the string heavy cleaning kernels (1: in process, 0: one per
+    # core) and rows per chunk. ratings are always cleaned in process
+    "kernel_workers": int(os.getenv("SILVER_KERNEL_WORKERS", "1")),
+    "kernel_chunk_rows": int(os.getenv("SILVER_KERNEL_CHUNK_ROWS", "250000")),
+    # initial ratings load out of core: "auto" (when bronze exceeds the budget), "true", "false"
+    "out_of_core": os.getenv("SILVER_OUT_OF_CORE", "auto").lower(),
+    "memory_budget_bytes": int(
+        os.getenv("SILVER_MEMORY_BUDGET_BYTES", str(512 * 1024**2))
+    ),
+    "spill_dir": os.getenv(
+        "SILVER_SPILL_DIR", ""
+    ),  # local scratch, "" for the temp dir
+}
+
 # date columns to process
 date_columns = {"movies": "release_date", "ratings": "timestamp"}
 
@@ -29,13 +95,49 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 
+# S3 client tuning (shared by every thread of a process)
+S3_CLIENT_CONFIG = {
+    "max_pool_connections": int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50")),
+    "retry_mode": os.getenv("S3_RETRY_MODE", "adaptive"),  # legacy, standard, adaptive
+    "max_attempts": int(os.getenv("S3_MAX_ATTEMPTS", "10")),  # including the first
+    "tcp_keepalive": os.getenv("S3_TCP_KEEPALIVE", "true").lower() == "true",
+    "connect_timeout": int(os.getenv("S3_CONNECT_TIMEOUT", "10")),  # seconds
+    "read_timeout": int(os.getenv("S3_READ_TIMEOUT", "60")),  # seconds
+}
+
+# read-through cache of S3 objects, revalidated with conditional GETs (If-None-Match)
+# in memory only by default. set OBJECT_CACHE_DIR (e.g under the temp dir) to keep
+# a disk tier across runs
+OBJECT_CACHE_CONFIG = {
+    "enabled": os.getenv("OBJECT_CACHE_ENABLED", "true").lower() == "true",
+    "memory_bytes": int(os.getenv("OBJECT_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024))),
+    "disk_dir": os.getenv("OBJECT_CACHE_DIR", ""),
+    "disk_bytes": int(os.getenv("OBJECT_CACHE_DISK_BYTES", str(2 * 1024**3))),
+}
+
+# storage backend: "s3" or "local" (buckets become directories under local_root)
+STORAGE_CONFIG = {
+    "backend": os.getenv("STORAGE_BACKEND", "s3").lower(),
+    "local_root": os.getenv("LOCAL_STORAGE_ROOT", "data/storage"),
+    # conditional (ETag) writes of shared objects e.g watermarks and manifests
+    "cas_attempts": int(os.getenv("STORAGE_CAS_ATTEMPTS", "10")),  # including the first
+    "cas_backoff_seconds": float(os.getenv("STORAGE_CAS_BACKOFF_SECONDS", "0.05")),
+}
+
 S3_BUCKET_BRONZE = os.getenv("S3_BUCKET_BRONZE")
 S3_BUCKET_SILVER = os.getenv("S3_BUCKET_SILVER")
 S3_BUCKET_GOLD = os.getenv("S3_BUCKET_GOLD")
 WATERMARKS_PATH = (
-    "watermarks/watermarks.csv"  # although JSON preferred over parquet for metadata
+    "watermarks/watermarks.csv"  # legacy, superseded by watermarks/current/ and history/
 )
 
+# watermark store: loose history records folded into a segment every N advances
+WATERMARK_CONFIG = {
+    "compact_every": int(os.getenv("WATERMARK_COMPACT_EVERY", "52")),
+}
+FINGERPRINTS_PATH = "fingerprints/sources.json"
+DIMENSION_HASHES_PATH = "dimensions/hashes.json"  # in the silver bucket
+
 # Postgres configuration keys
 POSTGRES_CONFIG = {
     "host": os.getenv("POSTGRES_HOST", "localhost"),
@@ -43,6 +145,27 @@ POSTGRES_CONFIG = {
     "database": os.getenv("POSTGRES_DB", "movie_rating_database"),
     "user": os.getenv("POSTGRES_USER"),
     "password": os.getenv("POSTGRES_PASSWORD"),
+    # one pooled engine per process, shared by every statement of a task
+    "pool_size": int(os.getenv("POSTGRES_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("POSTGRES_MAX_OVERFLOW", "5")),
+    "pool_pre_ping": os.getenv("POSTGRES_POOL_PRE_PING", "true").lower() == "true",
+    "pool_recycle": int(os.getenv("POSTGRES_POOL_RECYCLE", "1800")),  # seconds
+    "connect_timeout": int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "10")),  # seconds
+    # server-side limit of one statement, 0 for none
+    "statement_timeout_ms": int(os.getenv("POSTGRES_STATEMENT_TIMEOUT_MS", "0")),
+}
+
+# staging loads: "copy" streams frames with COPY ... FROM STDIN, "insert" uses to_sql.
+# COPY falls back to to_sql if it fails
+POSTGRES_LOAD_CONFIG = {
+    "method": os.getenv("POSTGRES_LOAD_METHOD", "copy").lower(),
+    "copy_chunk_rows": int(os.getenv("POSTGRES_COPY_CHUNK_ROWS", "100000")),
+}
+
+# gold loads: keep the ratings watermark in prod.pipeline_watermarks, committed in the
+# same transaction as the upsert, instead of in the silver bucket
+GOLD_CONFIG = {
+    "db_watermarks": os.getenv("GOLD_DB_WATERMARKS", "false").lower() == "true",
 }
 
 # orchestration
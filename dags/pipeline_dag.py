@@ -23,6 +23,7 @@ from pipeline.b_silver.transform import (
     prepare_ratings_df,
     prepare_users_df,
 )
+from pipeline.b_silver.compaction import compact_ratings
 from pipeline.s_gold.load import *
 
 default_args = {
@@ -78,6 +79,10 @@ with DAG(
         op_kwargs={"pipeline_start": pipeline_start},
     )
 
+    compact_silver_ratings = PythonOperator(
+        task_id="compact_ratings", python_callable=compact_ratings
+    )
+
     # -------------------
     # Gold tasks
     # -------------------
@@ -121,9 +126,9 @@ with DAG(
 
     check_movie_freshness >> movies_to_silver
     check_users_freshness >> users_to_silver
-    check_ratings_freshness >> ratings_to_silver
+    check_ratings_freshness >> ratings_to_silver >> compact_silver_ratings
 
-    [movies_to_silver, users_to_silver, ratings_to_silver] >> ensure_staging
+    [movies_to_silver, users_to_silver, compact_silver_ratings] >> ensure_staging
 
     ensure_staging >> [dim_movies_to_gold, dim_users_to_gold] >> fct_ratings_to_gold
 
@@ -0,0 +1,157 @@
+# importing libraries/modules
+import json
+import hashlib
+import pandas as pd
+from urllib.request import Request, urlopen
+from pipeline.a_bronze.ingest import get_direct_url
+from pipeline.storage import as_storage
+from utils.logger import get_logger
+from config import S3_BUCKET_BRONZE, FINGERPRINTS_PATH
+
+# initialize logger
+logger = get_logger(__name__)
+
+
+# function to fetch the http validators of a source
+def probe_source(url: str, timeout: int = 60) -> dict:
+    """
+    Sends a HEAD request to a source and returns its ETag/Last-Modified headers.
+
+    Parameters:
+        url (str): drive share link of the file
+        timeout (int): socket timeout in seconds
+
+    Returns:
+        dict: {"etag": ..., "last_modified": ...} with only the headers the source provided
+    """
+    try:
+        request = Request(get_direct_url(url), method="HEAD")
+        with urlopen(request, timeout=timeout) as response:
+            headers = response.headers
+            probe = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+        return {k: v for k, v in probe.items() if v}
+
+    except Exception as e:
+        logger.warning(f"Could not probe {url}. Falling back to content hash: {e}")
+        return {}
+
+
+# function to hash a dataframe's content
+def frame_digest(df: pd.DataFrame, digest=None):
+    """
+    Feeds a dataframe's row hashes into a sha256 digest.
+    Calling it chunk by chunk gives the same result as one call on the whole frame.
+
+    Parameters:
+        df (pd.DataFrame): dataframe or chunk to hash
+        digest (hashlib object): running digest to update. a new one is created if None.
+
+    Returns:
+        hashlib object: the updated digest
+    """
+    if digest is None:
+        digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest
+
+
+# function to read fingerprints
+def read_fingerprints(client) -> dict:
+    """
+    Reads the source fingerprint store from the Bronze bucket.
+
+    Return:
+        dict: {source name: fingerprint record}. Empty if no store exists yet.
+    """
+    try:
+        data = as_storage(client).get(S3_BUCKET_BRONZE, FINGERPRINTS_PATH)
+        store = json.loads(data)
+        logger.info("Successfully read source fingerprints.")
+        return store if isinstance(store, dict) else {}
+
+    except Exception as e:
+        logger.warning(f"Source fingerprints not found. Initializing new ones: {e}")
+        return {}
+
+
+# function to write fingerprints
+def write_fingerprints(client, store: dict):
+    """
+    Writes the source fingerprint store to the Bronze bucket.
+
+    Parameters:
+        store (dict): {source name: fingerprint record}
+    """
+    as_storage(client).put(
+        S3_BUCKET_BRONZE,
+        FINGERPRINTS_PATH,
+        json.dumps(store, indent=2, default=str).encode("utf-8"),
+        content_type="application/json",
+    )
+    logger.info("Source fingerprints updated successfully in S3.")
+
+
+# function to check a bronze object is present
+def bronze_object_exists(client, object_name: str) -> bool:
+    """
+    Checks that an object is present in the Bronze bucket.
+    """
+    return as_storage(client).exists(S3_BUCKET_BRONZE, object_name)
+
+
+# function to compare a fresh probe with a stored fingerprint
+def is_unchanged(record: dict, probe: dict = None, sha256: str = None) -> bool:
+    """
+    Decides whether a source matches what was last loaded into bronze.
+    ETag wins over Last-Modified, which wins over the content hash.
+
+    Parameters:
+        record (dict): stored fingerprint of the source
+        probe (dict): fresh ETag/Last-Modified of the source
+        sha256 (str): fresh content hash of the source
+
+    Returns:
+        bool: True if the source is unchanged
+    """
+    if not record:
+        return False
+
+    probe = probe or {}
+    for field in ("etag", "last_modified"):
+        if probe.get(field) and record.get(field):
+            return probe[field] == record[field]
+
+    return sha256 is not None and sha256 == record.get("sha256")
+
+
+# function to mark a source as re-verified
+def record_fingerprint(
+    store: dict,
+    file: str,
+    object_name: str,
+    probe: dict = None,
+    sha256: str = None,
+    skipped: bool = False,
+):
+    """
+    Records a source's fingerprint after it was uploaded or skipped.
+    verified_at is refreshed in both cases so freshness checks treat a skip as fresh.
+    """
+    now = pd.Timestamp.now(tz="UTC").isoformat()
+    record = dict(store.get(file, {}))
+    record.update({k: v for k, v in (probe or {}).items() if v})
+    if sha256:
+        record["sha256"] = sha256
+    record["object_name"] = object_name
+    record["verified_at"] = now
+    record["skipped"] = skipped
+    if not skipped:
+        record["uploaded_at"] = now
+    store[file] = record
+
+
+if __name__ == "__main__":
+    pass
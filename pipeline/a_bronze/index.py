@@ -0,0 +1,309 @@
+# importing libraries/modules
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+from pipeline.schemas import read_csv, apply_dtypes
+from utils.logger import get_logger
+from config import S3_BUCKET_BRONZE
+
+# initialize logger
+logger = get_logger(__name__)
+
+# bronze datasets stored sorted by a time column, with a block index next to them
+indexed_columns = {"ratings": "timestamp"}
+
+
+# function to name a dataset's index in bronze
+def bronze_index_name(file: str) -> str:
+    """
+    Returns the Bronze key of a dataset's time index e.g "ratings.index.json".
+    """
+    return f"{file}.index.json"
+
+
+# function to put a frame in index order
+def sort_by_time(df: pd.DataFrame, file: str) -> pd.DataFrame:
+    """
+    Sorts a frame of an indexed dataset by its time column (stable, nulls last).
+    Frames of other datasets, or without the column, are returned unchanged.
+    """
+    column = indexed_columns.get(file)
+    if column is None or column not in df.columns:
+        return df
+    return df.sort_values(column, kind="stable", na_position="last")
+
+
+class SortedRuns:
+    """
+    Time sorted runs of an indexed dataset spilled to local disk, one per chunk,
+    merged back into a single time ordered stream. Lets a dataset streamed chunk
+    by chunk be stored globally sorted with a bounded amount of rows in memory.
+    """
+
+    def __init__(self, file: str, directory: str):
+        self.file = file
+        self.column = indexed_columns[file]
+        self.directory = directory
+        self.paths = []
+
+    def spill(self, df: pd.DataFrame):
+        """
+        Sorts a chunk by time and writes it to disk as a new run.
+        """
+        if df.empty:
+            return
+        path = os.path.join(self.directory, f"run-{len(self.paths):06d}.parquet")
+        sort_by_time(df, self.file).to_parquet(path, index=False)
+        self.paths.append(path)
+
+    def _batches(self, path: str, batch_rows: int):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            yield pa.Table.from_batches([batch]).to_pandas()
+
+    def _keys(self, df: pd.DataFrame) -> np.ndarray:
+        # nulls sort last
+        return pd.to_numeric(df[self.column], errors="coerce").to_numpy(
+            dtype="float64", na_value=np.inf
+        )
+
+    def merge(self, block_rows: int, memory_rows: int):
+        """
+        Yields the rows of every run in time order (nulls last), in frames of
+        block_rows rows. Every run is read in batches, so about memory_rows rows
+        are held at a time whatever the number of runs.
+        """
+        batch_rows = max(memory_rows // max(len(self.paths), 1), 1)
+        readers = [self._batches(path, batch_rows) for path in self.paths]
+        heads = [next(reader, None) for reader in readers]
+        pending = []
+        pending_rows = 0
+
+        while any(head is not None for head in heads):
+            # every row up to the smallest last key of the loaded batches is final
+            keys = {
+                i: self._keys(head) for i, head in enumerate(heads) if head is not None
+            }
+            cutoff = min(k[-1] for k in keys.values())
+
+            parts = []
+            for i, k in keys.items():
+                n = int(np.searchsorted(k, cutoff, side="right"))
+                parts.append(heads[i].iloc[:n])
+                heads[i] = heads[i].iloc[n:]
+                if heads[i].empty:
+                    heads[i] = next(readers[i], None)
+
+            merged = sort_by_time(pd.concat(parts, ignore_index=True), self.file)
+            pending.append(merged)
+            pending_rows += merged.shape[0]
+            if pending_rows < block_rows:
+                continue
+
+            rows = pd.concat(pending, ignore_index=True)
+            full = rows.shape[0] - rows.shape[0] % block_rows
+            for start in range(0, full, block_rows):
+                yield rows.iloc[start : start + block_rows]
+            pending = [rows.iloc[full:]]
+            pending_rows = rows.shape[0] - full
+
+        if pending_rows:
+            yield pd.concat(pending, ignore_index=True)
+
+
+class TimeIndex:
+    """
+    Zone map of a bronze object: for every block of rows, where the block is
+    (byte range of a CSV or row group of a Parquet file) and the min/max of its
+    time column. Readers fetch only the blocks that overlap a time window.
+    """
+
+    def __init__(self, file: str, object_name: str, file_format: str):
+        self.file = file
+        self.object_name = object_name
+        self.file_format = file_format
+        self.column = indexed_columns[file]
+        self.header = None  # CSV header line, prepended to fetched byte ranges
+        self.blocks = []
+        self.sorted = True  # time column ascending across the whole object
+        self._last_max = None
+
+    def add_block(self, df: pd.DataFrame, offset: int = None, length: int = None):
+        """
+        Records a block that was just written. CSV blocks pass their byte range.
+        """
+        values = pd.to_numeric(df[self.column], errors="coerce").dropna()
+        low = int(values.min()) if len(values) else None
+        high = int(values.max()) if len(values) else None
+
+        if low is not None:
+            if not values.is_monotonic_increasing or (
+                self._last_max is not None and low < self._last_max
+            ):
+                self.sorted = False
+            self._last_max = high
+
+        block = {"rows": int(df.shape[0]), "min": low, "max": high}
+        if self.file_format == "parquet":
+            block["row_group"] = len(self.blocks)
+        else:
+            block["offset"] = offset
+            block["length"] = length
+        self.blocks.append(block)
+
+    def to_dict(self, etag: str) -> dict:
+        return {
+            "dataset": self.file,
+            "object_name": self.object_name,
+            "format": self.file_format,
+            "etag": etag,
+            "column": self.column,
+            "sorted": self.sorted,
+            "header": self.header,
+            "blocks": self.blocks,
+        }
+
+
+# function to write a frame block by block
+def write_blocks(
+    writer, df: pd.DataFrame, index: TimeIndex, block_rows: int, parquet_writer=None
+):
+    """
+    Appends a frame to an open bronze object in blocks of block_rows rows and
+    records every block in the index. CSV blocks are written without a header.
+
+    Parameters:
+        writer: binary file the CSV bytes go to (ignored for parquet)
+        df (pd.DataFrame): rows to write, in storage order
+        index (TimeIndex): index of the object
+        block_rows (int): rows per block
+        parquet_writer (pq.ParquetWriter): writer of a parquet object. each block is a row group.
+    """
+    for start in range(0, df.shape[0], block_rows):
+        block = df.iloc[start : start + block_rows]
+        if parquet_writer is not None:
+            table = pa.Table.from_pandas(
+                block, schema=parquet_writer.schema, preserve_index=False
+            )
+            # one row group per block, so row groups map 1:1 to index blocks
+            parquet_writer.write_table(table, row_group_size=max(len(block), 1))
+            index.add_block(block)
+        else:
+            offset = writer.tell()
+            block.to_csv(writer, index=False, header=False)
+            index.add_block(block, offset, writer.tell() - offset)
+
+
+# function to write an index next to its object
+def write_index(storage, index: TimeIndex, etag: str):
+    """
+    Writes a dataset's time index to the Bronze bucket.
+
+    Parameters:
+        storage: storage backend
+        index (TimeIndex): index of the object just written
+        etag (str): ETag of that object, so readers can detect a stale index
+    """
+    storage.put(
+        S3_BUCKET_BRONZE,
+        bronze_index_name(index.file),
+        json.dumps(index.to_dict(etag), default=str).encode("utf-8"),
+        content_type="application/json",
+    )
+    logger.info(
+        f"Indexed {index.object_name}: {len(index.blocks)} blocks, sorted={index.sorted}."
+    )
+
+
+# function to group adjacent CSV blocks into byte ranges
+def merge_ranges(blocks: list) -> list:
+    """
+    Turns CSV blocks into as few inclusive (start, end) byte ranges as possible.
+    """
+    ranges = []
+    for block in sorted(blocks, key=lambda b: b["offset"]):
+        start, end = block["offset"], block["offset"] + block["length"] - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+# function to read one time window of an indexed bronze dataset
+def read_window(storage, file: str, object_name: str, start=None, end=None):
+    """
+    Reads the rows of an indexed bronze dataset whose time column is within
+    [start, end], fetching only the blocks that overlap the window.
+
+    Parameters:
+        storage: storage backend
+        file (str): dataset name e.g "ratings"
+        object_name (str): key of the bronze object e.g "ratings.csv"
+        start (int): lower bound in epoch seconds, inclusive. None for no bound.
+        end (int): upper bound in epoch seconds, inclusive. None for no bound.
+
+    Returns:
+        pd.DataFrame: rows of the window, or None if there is no up to date index
+        (the caller should then read the whole object)
+    """
+    try:
+        index = json.loads(storage.get(S3_BUCKET_BRONZE, bronze_index_name(file)))
+        etag = storage.head(S3_BUCKET_BRONZE, object_name)["ETag"]
+    except ClientError as e:
+        logger.info(f"No time index for {object_name}: {e}")
+        return None
+
+    if index["object_name"] != object_name or index["etag"] != etag:
+        logger.warning(f"Time index of {object_name} is stale. Ignoring it.")
+        return None
+
+    blocks = [
+        b
+        for b in index["blocks"]
+        if b["min"] is not None
+        and (start is None or b["max"] >= start)
+        and (end is None or b["min"] <= end)
+    ]
+
+    if index["format"] == "parquet":
+        with storage.open_ranged(S3_BUCKET_BRONZE, object_name) as source:
+            parquet_file = pq.ParquetFile(source)
+            table = parquet_file.read_row_groups([b["row_group"] for b in blocks])
+        df = apply_dtypes(table.to_pandas(), file)
+    else:
+        parts = [index["header"].encode("utf-8")]
+        for range_start, range_end in merge_ranges(blocks):
+            parts.append(
+                storage.get_range(S3_BUCKET_BRONZE, object_name, range_start, range_end)
+            )
+        df = read_csv(io.BytesIO(b"".join(parts)), file)
+
+    # trim the edge blocks to the window
+    column = index["column"]
+    if index["sorted"]:
+        values = df[column].to_numpy(dtype="float64", na_value=np.inf)
+        low = 0 if start is None else np.searchsorted(values, start, side="left")
+        high = len(values) if end is None else np.searchsorted(values, end, "right")
+        df = df.iloc[low:high]
+    else:
+        values = pd.to_numeric(df[column], errors="coerce")
+        mask = values.notna()
+        if start is not None:
+            mask &= values >= start
+        if end is not None:
+            mask &= values <= end
+        df = df[mask]
+
+    logger.info(
+        f"Read {df.shape[0]} {file} rows from {len(blocks)}/{len(index['blocks'])} blocks of {object_name}."
+    )
+    return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    pass
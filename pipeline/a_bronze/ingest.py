@@ -1,32 +1,175 @@
 # importing libraries/modules
+import io
+import time
 import pandas as pd
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pipeline.schemas import read_csv
 from utils.logger import get_logger
 
 # initialize logger
 logger = get_logger(__name__)
 
 
+# function to turn a drive share link into a direct download link
+def get_direct_url(url: str) -> str:
+    """
+    Converts a Google Drive share link into a direct download link.
+
+    Parameters:
+        url (str): drive share link of the file
+
+    Returns:
+        str: direct download url
+    """
+    file_id = url.split("/")[-2]
+    return f"https://drive.usercontent.google.com/download?id={file_id}&export=download&authuser=0&confirm=t"
+
+
+class MeteredStream(io.RawIOBase):
+    """
+    Read-only wrapper around a network response that counts bytes as the parser pulls them.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes_read = 0
+        self.started = time.perf_counter()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def close(self):
+        try:
+            self._raw.close()
+        finally:
+            super().close()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes_read / self.elapsed if self.elapsed > 0 else 0.0
+
+
+# function to open a source as a byte stream
+def open_source_stream(url: str, timeout: int = 60) -> MeteredStream:
+    """
+    Opens a source file as a metered byte stream without buffering it in memory.
+
+    Parameters:
+        url (str): drive share link of the file
+        timeout (int): socket timeout in seconds
+
+    Returns:
+        MeteredStream: readable stream of the raw file bytes
+    """
+    return MeteredStream(urlopen(get_direct_url(url), timeout=timeout))
+
+
+# function to stream one source into a dataframe
+def read_source(file: str, url: str, timeout: int = 60) -> pd.DataFrame:
+    """
+    Streams a single source file into a dataframe, parsing bytes as they arrive.
+
+    Parameters:
+        file (str): name of the file
+        url (str): drive share link of the file
+        timeout (int): socket timeout in seconds
+
+    Returns:
+        pd.DataFrame: content of the file
+    """
+    logger.info(f"Streaming {file}...")
+
+    with open_source_stream(url, timeout) as stream:
+        df = read_csv(io.BufferedReader(stream), file)
+
+    logger.info(
+        f"Successfully read {file}: {stream.bytes_read} bytes in {stream.elapsed:.2f}s "
+        f"({stream.bytes_per_sec / 1e6:.2f} MB/s)."
+    )
+    return df
+
+
+# function to stream one source in fixed-size chunks
+def read_source_chunks(file: str, url: str, chunk_size: int, timeout: int = 60):
+    """
+    Streams a single source file as a sequence of dataframe chunks.
+    Only one chunk is held in memory at a time.
+
+    Parameters:
+        file (str): name of the file
+        url (str): drive share link of the file
+        chunk_size (int): number of rows per chunk
+        timeout (int): socket timeout in seconds
+
+    Yields:
+        pd.DataFrame: the next chunk of rows
+    """
+    logger.info(f"Streaming {file} in chunks of {chunk_size} rows...")
+
+    rows = 0
+    with open_source_stream(url, timeout) as stream:
+        with read_csv(io.BufferedReader(stream), file, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                rows += chunk.shape[0]
+                yield chunk
+
+    logger.info(
+        f"Successfully read {file}: {rows} rows, {stream.bytes_read} bytes in {stream.elapsed:.2f}s "
+        f"({stream.bytes_per_sec / 1e6:.2f} MB/s)."
+    )
+
+
 # function to read files from source (drive)
-def read_files(urls: dict) -> dict:
+def read_files(
+    urls: dict, concurrent: bool = False, max_workers: int = None, timeout: int = 60
+) -> dict:
     """
     Reads a list of the 3 file paths into dataframes
 
     Parameters:
         urls: dictionary of file names and their urls
+        concurrent (bool): download all sources in parallel and stream them into the parser
+        max_workers (int): size of the download pool. defaults to one thread per source.
+        timeout (int): socket timeout in seconds for streamed downloads
 
     Returns:
         dict: dictionary of file names and created dataframes
     """
     dataframes = {}
 
+    if concurrent and urls:
+        workers = max_workers or len(urls)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(read_source, file, url, timeout): file
+                for file, url in urls.items()
+            }
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    dataframes[file] = future.result()
+                except Exception as e:
+                    logger.info(f"Failed to read {file}. Error: {e}")
+
+        return dataframes
+
     for file, url in urls.items():
         try:
-            file_id = url.split("/")[-2]
-            direct_url = f"https://drive.usercontent.google.com/download?id={file_id}&export=download&authuser=0&confirm=t"
+            direct_url = get_direct_url(url)
 
             logger.info(f"Reading {file}...")
 
-            df = pd.read_csv(direct_url)
+            df = read_csv(direct_url, file)
             dataframes[file] = df
 
             logger.info(f"Successfully read {file}.")
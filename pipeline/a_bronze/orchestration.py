@@ -1,10 +1,25 @@
 # Importing required modules
-from pipeline.a_bronze.ingest import read_files
-from pipeline.a_bronze.validation import validate_columns, validate_nulls
-from pipeline.a_bronze.upload import upload_to_bronze
+import hashlib
+from pipeline.a_bronze.ingest import read_files, read_source_chunks
+from pipeline.a_bronze.validation import validate_dataframes
+from pipeline.a_bronze.upload import (
+    upload_to_bronze,
+    stream_to_bronze,
+    bronze_object_name,
+)
+from pipeline.a_bronze.fingerprints import (
+    probe_source,
+    frame_digest,
+    read_fingerprints,
+    write_fingerprints,
+    bronze_object_exists,
+    is_unchanged,
+    record_fingerprint,
+)
 from utils.logger import get_logger
-from config import urls, expected_columns, S3_BUCKET_BRONZE
-from pipeline.s3_client import initialize_s3_client, create_bucket_if_not_exists
+from config import urls, expected_columns, S3_BUCKET_BRONZE, INGEST_CONFIG
+from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage, create_bucket_if_not_exists
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -15,26 +30,121 @@ def source_to_bronze():
 
     logger.info("Starting Bronze layer data pipeline...")
 
-    # Initialize AWS S3 client
-    client = initialize_s3_client()
+    # Initialize storage (AWS S3 client, or a local directory)
+    client = get_storage(initialize_s3_client)
+
+    use_fingerprints = INGEST_CONFIG["fingerprints"]
 
     try:
+        # Step 0: Skip sources whose ETag/Last-Modified match what is in bronze
+        store = read_fingerprints(client) if use_fingerprints else {}
+        probes, pending = {}, {}
+        for file, url in urls.items():
+            probes[file] = (
+                probe_source(url, INGEST_CONFIG["timeout"]) if use_fingerprints else {}
+            )
+            if is_unchanged(store.get(file), probes[file]) and bronze_object_exists(
+                client, bronze_object_name(file)
+            ):
+                logger.info(f"{file} unchanged at source. Skipping download.")
+                record_fingerprint(
+                    store, file, bronze_object_name(file), probes[file], skipped=True
+                )
+            else:
+                pending[file] = url
+
+        # large sources skip the in-memory path and are streamed chunk by chunk
+        streamed = {
+            file: url
+            for file, url in pending.items()
+            if file in INGEST_CONFIG["stream_sources"]
+        }
+        buffered = {file: url for file, url in pending.items() if file not in streamed}
+
         # Step 1: Read raw files
-        dataframes = read_files(urls)
+        dataframes = read_files(
+            buffered,
+            concurrent=INGEST_CONFIG["concurrent"],
+            max_workers=INGEST_CONFIG["max_workers"],
+            timeout=INGEST_CONFIG["timeout"],
+        )
         logger.info("Successfully ingested raw data.")
 
-        # Step 2: Validate schema & nulls
-        validate_columns(dataframes, expected_columns)
-        validate_nulls(dataframes)
+        # Step 2: Validate schema, nulls, dtypes, ranges & duplicate keys in one pass
+        validate_dataframes(dataframes, expected_columns)
         logger.info("Data validation completed successfully.")
 
         # Step 3: Ensure Bronze bucket exists
         create_bucket_if_not_exists(client, S3_BUCKET_BRONZE)
 
-        # Step 4: Upload to Bronze
-        upload_to_bronze(client, dataframes)
+        # Step 4: Upload to Bronze, leaving out content that is already there
+        hashes = {}
+        if use_fingerprints:
+            for file in list(dataframes):
+                hashes[file] = frame_digest(dataframes[file]).hexdigest()
+                if is_unchanged(
+                    store.get(file), sha256=hashes[file]
+                ) and bronze_object_exists(client, bronze_object_name(file)):
+                    logger.info(f"{file} content unchanged. Skipping upload.")
+                    record_fingerprint(
+                        store,
+                        file,
+                        bronze_object_name(file),
+                        probes[file],
+                        hashes[file],
+                        skipped=True,
+                    )
+                    del dataframes[file]
+
+        uploaded = upload_to_bronze(client, dataframes)
+        for file in uploaded or []:
+            record_fingerprint(
+                store,
+                file,
+                bronze_object_name(file),
+                probes.get(file),
+                hashes.get(file),
+            )
         logger.info("Data successfully uploaded to Bronze S3 bucket.")
 
+        # Step 5: Stream large sources to Bronze (validated chunk by chunk)
+        for file, url in streamed.items():
+            chunks = read_source_chunks(
+                file, url, INGEST_CONFIG["chunk_rows"], INGEST_CONFIG["timeout"]
+            )
+
+            # content hash is built while streaming; a match discards the upload
+            digest = hashlib.sha256() if use_fingerprints else None
+            stored_sha = store.get(file, {}).get("sha256")
+            if stored_sha and not bronze_object_exists(
+                client, bronze_object_name(file)
+            ):
+                stored_sha = None
+
+            stream_to_bronze(
+                client,
+                file,
+                chunks,
+                expected_columns,
+                digest=digest,
+                skip_if_sha256=stored_sha,
+            )
+
+            if use_fingerprints:
+                sha256 = digest.hexdigest()
+                record_fingerprint(
+                    store,
+                    file,
+                    bronze_object_name(file),
+                    probes.get(file),
+                    sha256,
+                    skipped=(sha256 == stored_sha),
+                )
+
+        # Step 6: Persist fingerprints, including skips, for the freshness checks
+        if use_fingerprints:
+            write_fingerprints(client, store)
+
         logger.info("Bronze pipeline execution completed successfully!")
 
     except Exception as e:
@@ -1,44 +1,245 @@
 # importing libraries/modules
 import io
 import boto3
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from utils.logger import get_logger
-from pipeline.s3_client import initialize_s3_client
-from config import S3_BUCKET_BRONZE
+from pipeline.storage import as_storage
+from pipeline.a_bronze.validation import DataValidator
+from pipeline.a_bronze.fingerprints import frame_digest
+from pipeline.a_bronze.index import (
+    SortedRuns,
+    TimeIndex,
+    indexed_columns,
+    sort_by_time,
+    write_blocks,
+    write_index,
+)
+from config import S3_BUCKET_BRONZE, INGEST_CONFIG, BRONZE_CONFIG, expected_columns
 
 # initialize logger
 logger = get_logger(__name__)
 
 
-def upload_to_bronze(s3_client, dataframes: dict):
+# function to name a dataset's object in bronze
+def bronze_object_name(file: str) -> str:
+    """
+    Returns the Bronze object key of a dataset for the configured storage format.
+
+    Parameters:
+        file (str): name of the file e.g "ratings"
+
+    Returns:
+        str: object key e.g "ratings.csv" or "ratings.parquet"
+    """
+    extension = "parquet" if BRONZE_CONFIG["format"] == "parquet" else "csv"
+    return f"{file}.{extension}"
+
+
+# function to order columns as declared in config
+def order_columns(df: pd.DataFrame, file: str) -> pd.DataFrame:
+    """
+    Puts the expected columns first, in config order, followed by any extras.
+    Gives every Parquet object of a dataset the same column layout.
+    """
+    expected = [c for c in expected_columns.get(file, []) if c in df.columns]
+    extras = [c for c in df.columns if c not in expected]
+    return df[expected + extras]
+
+
+# function to check whether a dataset gets a time index
+def is_indexed(df: pd.DataFrame, file: str) -> bool:
+    """
+    Returns True if a dataset is stored sorted by time with a block index,
+    i.e it is listed in index.indexed_columns and has the time column.
+    """
+    return indexed_columns.get(file) in df.columns
+
+
+# function to serialize a dataframe for bronze
+def to_bronze_bytes(df: pd.DataFrame, file: str) -> tuple:
+    """
+    Serializes a dataframe in the configured bronze format. Indexed datasets
+    (e.g ratings) are sorted by time and written block by block with their index.
+
+    Parameters:
+        df (pd.DataFrame): content of the file
+        file (str): name of the file
+
+    Returns:
+        tuple: (CSV text or a compressed Parquet file, TimeIndex or None)
+    """
+    as_parquet = BRONZE_CONFIG["format"] == "parquet"
+    buffer = io.BytesIO()
+
+    if is_indexed(df, file):
+        df = order_columns(sort_by_time(df, file), file)
+        index = TimeIndex(file, bronze_object_name(file), BRONZE_CONFIG["format"])
+        block_rows = INGEST_CONFIG["index_block_rows"]
+        if as_parquet:
+            schema = pa.Table.from_pandas(df, preserve_index=False).schema
+            with pq.ParquetWriter(
+                buffer, schema, compression=BRONZE_CONFIG["compression"]
+            ) as parquet_writer:
+                write_blocks(buffer, df, index, block_rows, parquet_writer)
+        else:
+            index.header = df.head(0).to_csv(index=False)
+            buffer.write(index.header.encode("utf-8"))
+            write_blocks(buffer, df, index, block_rows)
+        return buffer.getvalue(), index
+
+    if as_parquet:
+        order_columns(df, file).to_parquet(
+            buffer, index=False, compression=BRONZE_CONFIG["compression"]
+        )
+    else:
+        df.to_csv(buffer, index=False)  # puts content inside buffer
+    return buffer.getvalue(), None
+
+
+def upload_to_bronze(s3_client, dataframes: dict) -> list:
     """
     Uploads dataframes to a specified S3 Bronze bucket.
 
     Parameters:
         dataframes: dictionary of file names and their dataframes.
+
+    Returns:
+        list: names of the files that were uploaded successfully
     """
-    # s3 client initialized in orchestration script passed
-    client = s3_client
+    # s3 client (or storage backend) initialized in orchestration script passed
+    storage = as_storage(s3_client)
+    uploaded = []
 
     for file, df in dataframes.items():
         try:
             logger.info(f"Starting {file} upload to bronze bucket")
 
-            # Convert DataFrame to in-memory buffer
-            csv_buffer = io.BytesIO()
-            df.to_csv(csv_buffer, index=False)  # puts content inside buffer
-            csv_buffer.seek(0)
+            # Convert DataFrame to in-memory bytes
+            body, index = to_bronze_bytes(df, file)
 
-            object_name = f"{file}.csv"  # prefix ensures Bronze folder in bucket
+            object_name = bronze_object_name(file)
             logger.info(f"Uploading {object_name} to S3 bucket {S3_BUCKET_BRONZE}")
 
             # Upload the file to S3
-            client.put_object(
-                Bucket=S3_BUCKET_BRONZE, Key=object_name, Body=csv_buffer.getvalue()
-            )
+            response = storage.put(S3_BUCKET_BRONZE, object_name, body)
+
+            # index last: it records the ETag of the object it describes
+            if index is not None:
+                write_index(storage, index, response.get("ETag"))
 
             logger.info(
                 f"Successfully uploaded {object_name} to S3 bucket {S3_BUCKET_BRONZE}."
             )
+            uploaded.append(file)
 
         except Exception as e:
             logger.error(f"Failed to upload {file}. Error: {e}")
+
+    return uploaded
+
+
+def stream_to_bronze(
+    s3_client,
+    file: str,
+    chunks,
+    expected_cols: dict,
+    digest=None,
+    skip_if_sha256: str = None,
+) -> int:
+    """
+    Validates a stream of dataframe chunks and writes them to the Bronze bucket
+    as one object via a multipart upload. Peak memory is bounded by one chunk plus one part.
+    Chunks of indexed datasets are sorted and spilled to local disk as runs, then
+    merged into one time sorted object with a block index, so the index blocks
+    never overlap whatever order the source is in.
+
+    Parameters:
+        file (str): name of the file
+        chunks (iterable): dataframe chunks of the file, in order
+        expected_cols (dict): {name: list of expected columns}
+        digest (hashlib object): running content hash, updated with every chunk
+        skip_if_sha256 (str): content hash already in bronze. if the streamed content
+            hashes to the same value the upload is discarded instead of committed.
+
+    Returns:
+        int: number of rows streamed
+    """
+    object_name = bronze_object_name(file)
+    as_parquet = BRONZE_CONFIG["format"] == "parquet"
+    logger.info(f"Streaming {object_name} to S3 bucket {S3_BUCKET_BRONZE}")
+
+    rows = 0
+    parquet_writer = None
+    index = None
+    storage = as_storage(s3_client)
+    block_rows = INGEST_CONFIG["index_block_rows"]
+    validator = DataValidator(file, expected_cols[file])
+    with storage.open_write(
+        S3_BUCKET_BRONZE,
+        object_name,
+        part_size=INGEST_CONFIG["part_size"],
+        content_type="application/parquet" if as_parquet else "application/csv",
+    ) as writer, tempfile.TemporaryDirectory(
+        dir=INGEST_CONFIG["sort_dir"] or None
+    ) as sort_dir:
+        for chunk in chunks:
+            validator.update(chunk)
+
+            if digest is not None:
+                frame_digest(chunk, digest)
+
+            if rows == 0 and is_indexed(chunk, file):
+                index = TimeIndex(file, object_name, BRONZE_CONFIG["format"])
+                runs = SortedRuns(file, sort_dir)
+
+            if as_parquet:
+                chunk = order_columns(chunk, file)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(
+                        writer,
+                        pa.Table.from_pandas(chunk, preserve_index=False).schema,
+                        compression=BRONZE_CONFIG["compression"],
+                    )
+            elif index is not None and rows == 0:
+                index.header = chunk.head(0).to_csv(index=False)
+                writer.write(index.header.encode("utf-8"))
+
+            # indexed rows are written once every chunk is in, merged in time order
+            if index is not None:
+                runs.spill(chunk)
+            elif as_parquet:
+                # every chunk becomes a row group
+                parquet_writer.write_table(
+                    pa.Table.from_pandas(
+                        chunk, schema=parquet_writer.schema, preserve_index=False
+                    )
+                )
+            else:
+                chunk.to_csv(writer, index=False, header=(rows == 0))
+            rows += chunk.shape[0]
+
+        if index is not None:
+            for block in runs.merge(block_rows, INGEST_CONFIG["chunk_rows"]):
+                write_blocks(writer, block, index, block_rows, parquet_writer)
+
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+        validator.log_report()
+
+        if digest is not None and digest.hexdigest() == skip_if_sha256:
+            logger.info(f"{file} content unchanged. Discarding streamed upload.")
+            writer.abort()
+            return rows
+
+    # index last: it records the ETag of the committed object
+    if index is not None:
+        write_index(storage, index, writer.etag)
+
+    logger.info(
+        f"Successfully streamed {rows} {file} records to S3 bucket {S3_BUCKET_BRONZE}."
+    )
+    return rows
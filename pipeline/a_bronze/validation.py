@@ -1,35 +1,225 @@
 # importing libraries/modules
+import numpy as np
+import pandas as pd
+from pipeline.schemas import get_dtypes
 from utils.logger import get_logger
+from config import INGEST_CONFIG
 
 # initialize logger
 logger = get_logger(__name__)
 
+# natural key of each dataset, used to count duplicate records
+key_columns = {
+    "movies": ["item_id"],
+    "ratings": ["user_id", "item_id", "timestamp"],
+    "users": ["user_id"],
+}
 
-# function to check columns
-def validate_columns(dataframes: dict, expected_cols: dict):
+# inclusive (min, max) of numeric columns. None means "now" for timestamps.
+value_ranges = {
+    "ratings": {
+        "rating": (1, 5),
+        "timestamp": (pd.Timestamp("1990-01-01", tz="UTC").timestamp(), None),
+    },
+    "users": {"age": (1, 120)},
+}
+
+
+class KeyFilter:
+    """
+    Bloom filter of 64-bit key hashes in a fixed number of bytes: remembers the
+    keys of every chunk of a stream with bounded memory, at the cost of rare false
+    positives (a new key reported as seen), never false negatives.
     """
-    Validates that each dataframe contains the expected columns.
 
-    Parameters:
-        dataframes (dict): {name: dataframe}
-        expected_columns (dict): {name: list of expected columns}
+    # probes per key, double hashed from the key hash
+    PROBES = 4
+
+    def __init__(self, size_bytes: int):
+        self.bits = np.zeros(max(size_bytes, 1), dtype=np.uint8)
+        self.n_bits = np.uint64(self.bits.size * 8)
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        step = (hashes * np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+        probes = np.arange(self.PROBES, dtype=np.uint64)
+        return (hashes[:, None] + probes[None, :] * step[:, None]) % self.n_bits
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Adds unique key hashes and returns a mask of those probably added before.
+        """
+        positions = self._positions(hashes.astype(np.uint64, copy=False))
+        byte = (positions >> np.uint64(3)).astype(np.int64)
+        mask = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        seen = ((self.bits[byte] & mask) != 0).all(axis=1)
+        np.bitwise_or.at(self.bits, byte.ravel(), mask.ravel())
+        return seen
+
+
+class DataValidator:
     """
-    for file, df in dataframes.items():
-        logger.info(f"Validating columns for {file}..")
-        expected_columns = set(expected_cols[file])
+    Validates one dataset in a single pass per chunk and accumulates the results,
+    so a streamed file is checked as it is read instead of in a second scan.
+
+    Checks: column presence, null counts, dtype conformance with the schema
+    registry, value ranges and duplicate natural keys (across chunks too).
+    Duplicates are exact within a chunk, so for a frame validated in one piece.
+    Only a stream gets a KeyFilter of INGEST_CONFIG["key_filter_bytes"], from
+    its second chunk on, to estimate duplicates across chunks, see config.
+    """
+
+    def __init__(self, name: str, expected_cols: list):
+        self.name = name
+        self.expected_cols = list(expected_cols)
+        self.rows = 0
+        self.chunks = 0
+        self.null_counts = pd.Series(dtype="int64")
+        self.dtype_mismatches = {}
+        self.range_violations = {}
+        self.duplicate_keys = 0
+        self._first_keys = None  # unique key hashes of the first chunk
+        self._key_filter = None  # allocated when a second chunk arrives
+
+    def check_columns(self, df: pd.DataFrame):
+        """
+        Raises if expected columns are missing and warns about extra ones.
+        """
+        expected_columns = set(self.expected_cols)
         actual_columns = set(df.columns)
         missing = expected_columns - actual_columns
         extra = actual_columns - expected_columns
 
         # if missing set is not empty
         if missing:
-            logger.error(f"Missing columns in {file}: {missing}")
-            raise ValueError(f"Missing columns in {file}: {missing}")
+            logger.error(f"Missing columns in {self.name}: {missing}")
+            raise ValueError(f"Missing columns in {self.name}: {missing}")
+
+        # if extra columns are present (only reported once for a stream)
+        if extra and self.chunks == 0:
+            logger.warning(f"Extra columns found in {self.name}: {extra}")
+
+    def update(self, df: pd.DataFrame):
+        """
+        Folds one dataframe or chunk into the running results.
+        """
+        self.check_columns(df)
+
+        # nulls
+        self.null_counts = self.null_counts.add(df.isna().sum(), fill_value=0)
+
+        # dtypes
+        for column, dtype in get_dtypes(self.name).items():
+            if column in df.columns and str(df[column].dtype) != dtype:
+                self.dtype_mismatches[column] = str(df[column].dtype)
+
+        # value ranges
+        now = pd.Timestamp.now(tz="UTC").timestamp()
+        for column, (low, high) in value_ranges.get(self.name, {}).items():
+            if column not in df.columns:
+                continue
+            values = pd.to_numeric(df[column], errors="coerce")
+            high = now if high is None else high
+            out_of_range = int(((values < low) | (values > high)).sum())
+            if out_of_range:
+                self.range_violations[column] = (
+                    self.range_violations.get(column, 0) + out_of_range
+                )
+
+        # duplicate natural keys, within this chunk and against earlier chunks
+        keys = [c for c in key_columns.get(self.name, []) if c in df.columns]
+        if keys and not df.empty and INGEST_CONFIG["duplicate_check"]:
+            hashes = pd.util.hash_pandas_object(df[keys], index=False).to_numpy()
+            unique = np.unique(hashes)
+            repeated = 0
+            if self._key_filter is None and self._first_keys is None:
+                self._first_keys = unique
+            else:
+                if self._key_filter is None:
+                    self._key_filter = KeyFilter(INGEST_CONFIG["key_filter_bytes"])
+                    self._key_filter.add(self._first_keys)
+                    self._first_keys = None
+                repeated = self._key_filter.add(unique).sum()
+            self.duplicate_keys += int(len(hashes) - len(unique) + repeated)
+
+        self.rows += df.shape[0]
+        self.chunks += 1
+
+    def report(self) -> dict:
+        """
+        Returns the accumulated validation results.
+        """
+        nulls = self.null_counts[self.null_counts > 0].astype(int)
+        return {
+            "dataset": self.name,
+            "rows": self.rows,
+            "null_counts": nulls.to_dict(),
+            "dtype_mismatches": dict(self.dtype_mismatches),
+            "range_violations": dict(self.range_violations),
+            "duplicate_keys": self.duplicate_keys,
+        }
+
+    def log_report(self) -> dict:
+        """
+        Logs a summary of the results and returns them.
+        """
+        report = self.report()
+        nulls = self.null_counts[self.null_counts > 0].astype(int)
+
+        if report["null_counts"]:
+            logger.warning(f"{self.name} has {nulls.sum()} missing values:\n{nulls}")
+        else:
+            logger.info(f"No missing values found in {self.name}.")
+
+        if report["dtype_mismatches"]:
+            logger.warning(
+                f"{self.name} columns not matching the schema registry: {report['dtype_mismatches']}"
+            )
+        if report["range_violations"]:
+            logger.warning(
+                f"{self.name} values out of range: {report['range_violations']}"
+            )
+        if report["duplicate_keys"]:
+            logger.warning(
+                f"{self.name} has {report['duplicate_keys']} duplicate keys on {key_columns[self.name]}"
+            )
+
+        logger.info(f"Validated {self.rows} {self.name} records.")
+        return report
+
+
+# function to validate every dataframe in one pass
+def validate_dataframes(dataframes: dict, expected_cols: dict) -> dict:
+    """
+    Runs every check on each dataframe in a single pass.
+
+    Parameters:
+        dataframes (dict): {name: dataframe}
+        expected_columns (dict): {name: list of expected columns}
+
+    Returns:
+        dict: {name: validation report}
+    """
+    reports = {}
+    for file, df in dataframes.items():
+        logger.info(f"Validating {file}..")
+        validator = DataValidator(file, expected_cols[file])
+        validator.update(df)
+        reports[file] = validator.log_report()
+    return reports
 
-        # if extra columns are present
-        if extra:
-            logger.warning(f"Extra columns found in {file}: {extra}")
 
+# function to check columns
+def validate_columns(dataframes: dict, expected_cols: dict):
+    """
+    Validates that each dataframe contains the expected columns.
+
+    Parameters:
+        dataframes (dict): {name: dataframe}
+        expected_columns (dict): {name: list of expected columns}
+    """
+    for file, df in dataframes.items():
+        logger.info(f"Validating columns for {file}..")
+        DataValidator(file, expected_cols[file]).check_columns(df)
         logger.info(f"successfully validated {file}'s columns.")
 
 
@@ -0,0 +1,290 @@
+# importing libraries/modules
+import io
+import json
+import math
+import argparse
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage
+from pipeline.storage import read_file as read_stored_file
+from pipeline.partitions import (
+    read_manifest,
+    replace_files,
+    write_part,
+    new_run_id,
+    legacy_files,
+    month_partition,
+    MONTH_PARTITION,
+)
+from pipeline.key_index import RATINGS_KEY
+from utils.logger import get_logger
+from config import S3_BUCKET_SILVER, COMPACTION_CONFIG
+
+# initialize logger
+logger = get_logger(__name__)
+
+# rows serialized to estimate the parquet size of a row
+SAMPLE_ROWS = 100_000
+
+
+# function to find the files of every month, legacy ones included
+def partition_inputs(storage, manifest: dict) -> dict:
+    """
+    Groups the committed files of the ratings dataset by month: daily parts,
+    compacted monthly files and legacy monthly CSVs the manifest does not list yet.
+
+    Returns:
+        dict: {monthly partition e.g "year=2000/month=01": [file entries]}
+    """
+    inputs = {}
+    for entry in manifest["files"] + legacy_files(storage, manifest):
+        inputs.setdefault(month_partition(entry["partition"]), []).append(entry)
+    return inputs
+
+
+# function to pick the files worth compacting
+def plan_compaction(
+    inputs: dict, target_bytes: int, min_files: int, partitions: list = None
+) -> dict:
+    """
+    Picks the small files of each month that should be merged.
+
+    Daily partitions hold about one part per run, so files are planned by month:
+    a month qualifies when it holds at least min_files small files (under half the
+    target size) that fit in fewer target-sized files, or a legacy CSV. Output of
+    earlier compactions (files of the monthly partition) is never counted as small:
+    new parts are merged into a new file next to it instead of re-reading the whole
+    month on every run. Months requested explicitly (or holding a requested
+    partition) are compacted whenever they hold a small file, earlier output
+    included. Files already near the target size are left alone.
+
+    Returns:
+        dict: {monthly partition: [file entries to merge]}
+    """
+    months = {month_partition(p) for p in partitions} if partitions else None
+    plan = {}
+    for month, files in sorted(inputs.items()):
+        if months and month not in months:
+            continue
+
+        small = [
+            f
+            for f in files
+            if f.get("legacy")
+            or (
+                f.get("bytes", 0) < target_bytes / 2
+                and (months or not MONTH_PARTITION.match(f["partition"]))
+            )
+        ]
+        output_files = math.ceil(sum(f.get("bytes", 0) for f in small) / target_bytes)
+        if months and small:
+            plan[month] = small
+        elif any(f.get("legacy") for f in small):
+            plan[month] = small
+        elif len(small) >= min_files and output_files < len(small):
+            plan[month] = small
+    return plan
+
+
+# function to merge one partition
+def compact_partition(
+    storage,
+    partition: str,
+    files: list,
+    run_id: str,
+    target_bytes: int,
+    compression: str,
+) -> dict:
+    """
+    Merges the files of a month into timestamp-sorted, deduplicated Parquet files
+    of about target_bytes each, written to the monthly partition. Each file spans
+    as many days as fit, and readers plan them from their time statistics.
+    Nothing is visible until the manifest commit.
+
+    Returns:
+        dict: report of the partition, with the "added" manifest entries
+    """
+    frames = []
+    for entry in files:
+        df = read_stored_file(storage, S3_BUCKET_SILVER, entry["key"])
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True)
+    input_rows = df.shape[0]
+    df = df.drop_duplicates(subset=RATINGS_KEY, keep="last")  # inputs are oldest first
+    df = df.sort_values(["timestamp", "user_id", "item_id"], kind="mergesort")
+    df = df.reset_index(drop=True)
+
+    # size output files from the parquet size of a sample of rows
+    sample = df.head(SAMPLE_ROWS)
+    buffer = io.BytesIO()
+    sample.to_parquet(buffer, index=False, compression=compression)
+    bytes_per_row = max(len(buffer.getvalue()) / max(len(sample), 1), 1)
+    rows_per_file = max(int(target_bytes / bytes_per_row), 1)
+
+    added = []
+    for i, start in enumerate(range(0, df.shape[0], rows_per_file)):
+        added.append(
+            write_part(
+                storage,
+                df.iloc[start : start + rows_per_file],
+                "ratings",
+                partition,
+                f"{run_id}-c{i:03d}",
+                file_format="parquet",
+                compression=compression,
+            )
+        )
+
+    return {
+        "partition": partition,
+        "status": "compacted",
+        "input_files": len(files),
+        "input_bytes": sum(f.get("bytes", 0) for f in files),
+        "input_rows": input_rows,
+        "duplicates_dropped": input_rows - df.shape[0],
+        "output_files": len(added),
+        "output_bytes": sum(f["bytes"] for f in added),
+        "output_rows": df.shape[0],
+        "added": added,
+    }
+
+
+# function to compact silver ratings partitions
+def compact_ratings(
+    partitions: list = None,
+    dry_run: bool = False,
+    max_workers: int = None,
+    target_bytes: int = None,
+    min_files: int = None,
+) -> list:
+    """
+    Compacts the small part files of silver ratings partitions into a few large,
+    sorted Parquet files and commits every merged partition in one manifest write.
+    Replaced files are deleted after the commit.
+
+    Parameters:
+        partitions (list): months to compact e.g ["year=2000/month=01"], given as
+            a month, a day or a legacy month ["2000-01"]. default: every month
+            that qualifies
+        dry_run (bool): only report what would be compacted
+        max_workers (int): partitions compacted at the same time
+        target_bytes (int): size of the output files
+        min_files (int): small files a month needs before it is compacted
+
+    Returns:
+        list: one report per partition
+    """
+    target_bytes = target_bytes or COMPACTION_CONFIG["target_file_bytes"]
+    min_files = min_files or COMPACTION_CONFIG["min_files"]
+    max_workers = max_workers or COMPACTION_CONFIG["max_workers"]
+    compression = COMPACTION_CONFIG["compression"]
+
+    storage = get_storage(initialize_s3_client)
+    manifest = read_manifest(storage, "ratings")
+    plan = plan_compaction(
+        partition_inputs(storage, manifest), target_bytes, min_files, partitions
+    )
+
+    if not plan:
+        logger.info("No silver ratings partitions need compaction.")
+        return []
+
+    if dry_run:
+        reports = []
+        for partition, files in plan.items():
+            input_bytes = sum(f.get("bytes", 0) for f in files)
+            reports.append(
+                {
+                    "partition": partition,
+                    "status": "planned",
+                    "input_files": len(files),
+                    "input_bytes": input_bytes,
+                    "input_rows": sum(f.get("rows") or 0 for f in files),
+                    "max_output_files": max(math.ceil(input_bytes / target_bytes), 1),
+                }
+            )
+            logger.info(
+                f"[dry run] Would compact {len(files)} files ({input_bytes} bytes) of ratings/{partition}"
+            )
+        return reports
+
+    logger.info(
+        f"Compacting {len(plan)} ratings partitions with {max_workers} workers."
+    )
+
+    run_id = new_run_id()
+    reports = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                compact_partition,
+                storage,
+                partition,
+                files,
+                run_id,
+                target_bytes,
+                compression,
+            ): partition
+            for partition, files in plan.items()
+        }
+        for future in as_completed(futures):
+            partition = futures[future]
+            try:
+                reports.append(future.result())
+            except Exception as e:
+                # one bad partition does not block the others
+                logger.error(f"Compaction of ratings/{partition} failed: {e}")
+                reports.append(
+                    {"partition": partition, "status": "failed", "error": str(e)}
+                )
+
+    compacted = [r for r in reports if r["status"] == "compacted"]
+    if compacted:
+        removed = [f["key"] for r in compacted for f in plan[r["partition"]]]
+        added = [entry for r in compacted for entry in r["added"]]
+        replace_files(storage, "ratings", removed, added)
+
+        for key in removed:
+            storage.delete(S3_BUCKET_SILVER, key)
+
+    for report in sorted(reports, key=lambda r: r["partition"]):
+        report.pop("added", None)
+        if report["status"] == "compacted":
+            logger.info(
+                f"Compacted ratings/{report['partition']}: {report['input_files']} files -> "
+                f"{report['output_files']}, {report['duplicates_dropped']} duplicates dropped."
+            )
+
+    if len(compacted) < len(reports):
+        raise RuntimeError(
+            f"{len(reports) - len(compacted)} ratings partitions failed to compact."
+        )
+    return sorted(reports, key=lambda r: r["partition"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compact silver ratings partitions into sorted Parquet files."
+    )
+    parser.add_argument(
+        "--partition",
+        action="append",
+        help="month to compact e.g year=2000/month=01. repeatable. default: every month that qualifies",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="only report the plan")
+    parser.add_argument("--max-workers", type=int, help="partitions at the same time")
+    parser.add_argument("--target-bytes", type=int, help="size of the output files")
+    parser.add_argument("--min-files", type=int, help="small files per month")
+    args = parser.parse_args()
+
+    report = compact_ratings(
+        partitions=args.partition,
+        dry_run=args.dry_run,
+        max_workers=args.max_workers,
+        target_bytes=args.target_bytes,
+        min_files=args.min_files,
+    )
+    print(json.dumps(report, indent=2, default=str))
@@ -0,0 +1,272 @@
+# importing libraries/modules
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
+from pipeline.schemas import read_csv
+from utils.logger import get_logger
+from config import SILVER_CONFIG
+
+# initialize logger
+logger = get_logger(__name__)
+
+# last run of every kernel: {name: {"rows", "chunks", "workers", "seconds"}}
+kernel_timings = {}
+
+
+# Kernels: pure frame-in/frame-out cleaning steps, no I/O.
+# They are row-local (a chunk is cleaned the same as the whole frame), so they can
+# run over chunks in parallel. Dedup is not row-local and is left to the caller.
+
+
+# function to clean movies
+def clean_movies(df: pd.DataFrame, cutoff) -> pd.DataFrame:
+    """
+    Cleans a frame of bronze movies: lower-case columns, UTC release dates up to
+    cutoff, no missing ids or titles, trimmed strings.
+
+    Parameters:
+        df (pd.DataFrame): bronze movies
+        cutoff (pd.Timestamp): latest release date kept (UTC)
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower()
+
+    # ensure release_date is datetime
+    df["release_date"] = pd.to_datetime(df["release_date"], errors="coerce")
+    df["release_date"] = df["release_date"].dt.tz_localize("UTC")
+    df = df[df["release_date"] <= cutoff]
+
+    # drop rows with missing item_id or movie_title
+    df = df.dropna(subset=["item_id", "movie_title"])
+
+    # trim and clean string columns
+    df["movie_title"] = df["movie_title"].str.strip()
+    df["primary_genre"] = df["primary_genre"].str.strip().str.title()
+    df["imdb_url"] = df["imdb_url"].str.strip()
+    return df
+
+
+# function to clean ratings
+def clean_ratings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans a frame of bronze ratings: snake_case columns, no missing user_id,
+    item_id or rating, epoch seconds converted to UTC datetimes.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df = df.dropna(subset=["user_id", "item_id", "rating"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s").dt.tz_localize("UTC")
+    return df
+
+
+# function to clean users
+def clean_users(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans a frame of bronze users: snake_case columns, no missing user_id,
+    trimmed and consistently cased strings.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df = df.dropna(subset=["user_id"])
+
+    # clean string fields: whitespaces and case
+    df["gender"] = df["gender"].str.strip().str.upper()
+    df["occupation"] = df["occupation"].str.strip().str.title()
+    df["zip_code"] = df["zip_code"].astype(str).str.strip()
+    return df
+
+
+# Arrow kernels: the same cleaning with Arrow compute, whose string and temporal
+# kernels run on Arrow buffers without per-row Python objects. Output is identical
+# to the pandas kernels (same rows, index, values and dtypes).
+
+
+# function to run string kernels on a column with Arrow
+def _arrow_strings(series: pd.Series, *functions) -> pd.Series:
+    array = pa.array(series, from_pandas=True)
+    if not pa.types.is_string(array.type):
+        array = pc.cast(array, pa.string())  # e.g dictionary (category) columns
+    for function in functions:
+        array = function(array)
+    # same result as the pandas .str accessor: string stays string, else object with NaN
+    values = array.to_numpy(zero_copy_only=False)
+    if isinstance(series.dtype, pd.StringDtype):
+        return pd.Series(values, index=series.index, dtype=series.dtype)
+    values[pc.is_null(array).to_numpy(zero_copy_only=False)] = np.nan
+    return pd.Series(values, index=series.index, dtype=object)
+
+
+# function to mask the rows where every given column is present, with Arrow
+def _arrow_valid(df: pd.DataFrame, columns: list):
+    mask = None
+    for column in columns:
+        valid = pc.is_valid(pa.array(df[column], from_pandas=True))
+        mask = valid if mask is None else pc.and_(mask, valid)
+    return mask.to_numpy(zero_copy_only=False)
+
+
+# function to clean movies with Arrow
+def clean_movies_arrow(df: pd.DataFrame, cutoff) -> pd.DataFrame:
+    """
+    Arrow version of clean_movies. Release dates come in free-form formats,
+    so they are still parsed by pandas.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower()
+
+    df["release_date"] = pd.to_datetime(df["release_date"], errors="coerce")
+    df["release_date"] = df["release_date"].dt.tz_localize("UTC")
+    df = df[df["release_date"] <= cutoff]
+    df = df[_arrow_valid(df, ["item_id", "movie_title"])].copy()
+
+    df["movie_title"] = _arrow_strings(df["movie_title"], pc.utf8_trim_whitespace)
+    df["primary_genre"] = _arrow_strings(
+        df["primary_genre"], pc.utf8_trim_whitespace, pc.utf8_title
+    )
+    df["imdb_url"] = _arrow_strings(df["imdb_url"], pc.utf8_trim_whitespace)
+    return df
+
+
+# function to clean ratings with Arrow
+def clean_ratings_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arrow version of clean_ratings: the epoch seconds are cast to UTC timestamps
+    in one Arrow kernel instead of a parse and a localize.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df = df[_arrow_valid(df, ["user_id", "item_id", "rating"])].copy()
+
+    seconds = pc.cast(pa.array(df["timestamp"], from_pandas=True), pa.int64())
+    timestamps = pc.cast(seconds, pa.timestamp("s", tz="UTC")).to_pandas()
+    # the resolution pandas gives this input dtype, from a zero-row conversion
+    dtype = pd.to_datetime(df["timestamp"].iloc[:0], unit="s").dt.tz_localize("UTC")
+    df["timestamp"] = pd.Series(timestamps, index=df.index).astype(dtype.dtype)
+    return df
+
+
+# function to clean users with Arrow
+def clean_users_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arrow version of clean_users.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df = df[_arrow_valid(df, ["user_id"])].copy()
+
+    df["gender"] = _arrow_strings(df["gender"], pc.utf8_trim_whitespace, pc.utf8_upper)
+    df["occupation"] = _arrow_strings(
+        df["occupation"], pc.utf8_trim_whitespace, pc.utf8_title
+    )
+
+    # astype(str) first, so numbers and missing values are spelled as in pandas
+    df["zip_code"] = _arrow_strings(df["zip_code"].astype(str), pc.utf8_trim_whitespace)
+    return df
+
+
+# kernels whose per-row Python string work outweighs pickling their chunks to a
+# worker process. The others (numeric casts, Arrow compute) always run in process
+POOLED_KERNELS = {"clean_movies", "clean_users"}
+
+# kernels of every engine, see config.SILVER_CONFIG["engine"]
+KERNELS = {
+    "pandas": {"movies": clean_movies, "ratings": clean_ratings, "users": clean_users},
+    "arrow": {
+        "movies": clean_movies_arrow,
+        "ratings": clean_ratings_arrow,
+        "users": clean_users_arrow,
+    },
+}
+
+
+# function to pick the cleaning kernel of a dataset
+def kernel_for(dataset: str):
+    """
+    Returns the cleaning kernel of a dataset for the configured engine.
+    """
+    engine = SILVER_CONFIG["engine"]
+    if engine not in KERNELS:
+        raise ValueError(
+            f"Unknown silver engine '{engine}'. Use one of {list(KERNELS)}."
+        )
+    return KERNELS[engine][dataset]
+
+
+# function to run a kernel, over chunks in worker processes when it pays off
+def run_kernel(
+    kernel, df: pd.DataFrame, chunk_rows: int = None, max_workers: int = None, **kwargs
+) -> pd.DataFrame:
+    """
+    Applies a row-local kernel to a frame, in this process by default. Frames of
+    at least two chunks are split and cleaned in a process pool only when more
+    than one worker is configured and the kernel is in POOLED_KERNELS: for the
+    vectorized kernels, sending the chunks to the workers costs more than the
+    cleaning itself. The timing of the run is logged and kept in kernel_timings.
+
+    Parameters:
+        kernel (callable): module-level kernel e.g clean_ratings
+        df (pd.DataFrame): frame to clean
+        chunk_rows (int): rows per chunk. default: SILVER_CONFIG["kernel_chunk_rows"]
+        max_workers (int): worker processes. default: SILVER_CONFIG["kernel_workers"]
+        **kwargs: passed to the kernel
+
+    Returns:
+        pd.DataFrame: cleaned frame, rows in their original order
+    """
+    chunk_rows = chunk_rows or SILVER_CONFIG["kernel_chunk_rows"]
+    max_workers = max_workers or SILVER_CONFIG["kernel_workers"] or os.cpu_count()
+    chunks = [df.iloc[i : i + chunk_rows] for i in range(0, len(df), chunk_rows)]
+
+    started = time.perf_counter()
+    if max_workers > 1 and len(chunks) > 1 and kernel.__name__ in POOLED_KERNELS:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            futures = [pool.submit(kernel, chunk, **kwargs) for chunk in chunks]
+            result = pd.concat([f.result() for f in futures])
+    else:
+        max_workers = 1
+        result = kernel(df, **kwargs)
+    seconds = time.perf_counter() - started
+
+    kernel_timings[kernel.__name__] = {
+        "rows": len(df),
+        "chunks": max(len(chunks), 1),
+        "workers": max_workers,
+        "seconds": seconds,
+    }
+    logger.info(
+        f"{kernel.__name__}: {len(df)} rows in {seconds:.3f}s "
+        f"({len(chunks)} chunks, {max_workers} workers)"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    # benchmark a kernel on a local bronze file, apart from any network time
+    parser = argparse.ArgumentParser(description="Time a silver cleaning kernel.")
+    parser.add_argument("dataset", choices=["movies", "ratings", "users"])
+    parser.add_argument("path", help="local bronze CSV of the dataset")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--chunk-rows", type=int)
+    parser.add_argument(
+        "--engine", choices=list(KERNELS), nargs="+", default=["pandas"]
+    )
+    args = parser.parse_args()
+
+    frame = read_csv(args.path, args.dataset)
+    kwargs = {"cutoff": pd.Timestamp.max.tz_localize("UTC")}
+    for engine in args.engine:
+        kernel = KERNELS[engine][args.dataset]
+        for workers in args.workers:
+            run_kernel(
+                kernel,
+                frame,
+                chunk_rows=args.chunk_rows,
+                max_workers=workers,
+                **(kwargs if args.dataset == "movies" else {}),
+            )
+            print(engine, workers, kernel_timings[kernel.__name__])
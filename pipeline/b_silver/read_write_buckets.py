@@ -1,37 +1,39 @@
 import pandas as pd
 from io import BytesIO
 from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage
+from pipeline.storage import read_file as read_stored_file
+from pipeline.a_bronze.index import read_window as read_indexed_window
+from pipeline.a_bronze.upload import bronze_object_name
 from utils.logger import get_logger
-from config import S3_BUCKET_BRONZE, S3_BUCKET_SILVER
+from config import S3_BUCKET_SILVER
 
 # Initialize Logger
 logger = get_logger(__name__)
 
 
 #
-def read_file(bucket_name: str, object_name: str) -> pd.DataFrame:
+def read_file(bucket_name: str, object_name: str, columns: list = None) -> pd.DataFrame:
     """
-    Reads a CSV file from the Bronze bucket into a DataFrame.
+    Reads a CSV or Parquet file from the Bronze bucket into a DataFrame.
+    The format is taken from the file extension.
 
     Parameters:
         bucket_name (str): bucket name
         object_name (str): file name
+        columns (list): optional subset of columns to read
 
     Return:
         dataframe (pd.Dataframe): structured content of file
     """
     logger.info(f"Reading {object_name} from {bucket_name} bucket.")
 
-    # Initialize AWS S3 client
-    client = initialize_s3_client()
+    # Initialize storage (AWS S3 client, or a local directory)
+    storage = get_storage(initialize_s3_client)
 
     try:
-        response = client.get_object(Bucket=bucket_name, Key=object_name)
-        data = response["Body"].read()
-        # bytesIO makes it so i dont have to download the file.
-        # get to read the content from memory
-        # masks the binary content and tricks pd.r_csv to think it is a real file
-        df = pd.read_csv(BytesIO(data))
+        # cached, conditional read shared with the bronze and gold readers
+        df = read_stored_file(storage, bucket_name, object_name, columns)
         logger.info(
             f"Successfully read {object_name} into DataFrame. Shape: {df.shape}"
         )
@@ -42,6 +44,32 @@ def read_file(bucket_name: str, object_name: str) -> pd.DataFrame:
         raise
 
 
+def read_window(file: str, start: int = None, end: int = None):
+    """
+    Reads only the rows of a time-indexed Bronze dataset within [start, end],
+    using ranged reads of the blocks that overlap the window.
+
+    Parameters:
+        file (str): dataset name e.g "ratings"
+        start (int): lower bound in epoch seconds, inclusive. None for no bound.
+        end (int): upper bound in epoch seconds, inclusive. None for no bound.
+
+    Return:
+        dataframe (pd.Dataframe): rows of the window, or None if the index is
+        missing, stale or unreadable. Callers then fall back to read_file.
+    """
+    object_name = bronze_object_name(file)
+    logger.info(f"Reading {object_name} window [{start}, {end}] from the index.")
+
+    try:
+        storage = get_storage(initialize_s3_client)
+        return read_indexed_window(storage, file, object_name, start, end)
+
+    except Exception as e:
+        logger.warning(f"Indexed read of {object_name} failed: {str(e)}")
+        return None
+
+
 def write_to_silver(df: pd.DataFrame, object_name: str):
     """
     Uploads a DataFrame as a CSV file into the Silver bucket.
@@ -52,19 +80,20 @@ def write_to_silver(df: pd.DataFrame, object_name: str):
     """
     logger.info(f"Writing {object_name} to {S3_BUCKET_SILVER} bucket.")
 
-    # Initialize AWS S3 client
-    client = initialize_s3_client()
+    # Initialize storage (AWS S3 client, or a local directory)
+    storage = get_storage(initialize_s3_client)
 
     try:
         csv_buffer = BytesIO()
         df.to_csv(csv_buffer, index=False)  # puts content inside buffer
         csv_buffer.seek(0)  # resets buffer pointer to line 1 (beginning)
 
-        client.put_object(
-            Bucket=S3_BUCKET_SILVER,
-            Key=object_name,
-            Body=csv_buffer.getvalue(),
-            ContentType="application/csv",
+        # S3 writes are cached through, so the next read of this partition is a 304
+        storage.put(
+            S3_BUCKET_SILVER,
+            object_name,
+            csv_buffer.getvalue(),
+            content_type="application/csv",
         )
         logger.info(f"Successfully wrote {object_name} to Silver bucket.")
 
@@ -0,0 +1,144 @@
+# importing libraries/modules
+import io
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+from pipeline.schemas import read_csv, apply_dtypes
+from pipeline.partitions import day_partitions
+from utils.logger import get_logger
+
+# initialize logger
+logger = get_logger(__name__)
+
+# rows read first to measure the in-memory size of a row
+SAMPLE_ROWS = 10_000
+
+# copies of a chunk alive at once while it is parsed, cleaned and filtered
+WORKING_COPIES = 4
+
+# bytes fetched per ranged GET when streaming an object
+READ_BUFFER = 8 * 1024 * 1024
+
+
+# function to size chunks from a memory budget
+def chunk_rows_for(budget_bytes: int, row_bytes: float) -> int:
+    """
+    Returns the rows per chunk that keep the working copies of a chunk within
+    the memory budget (never fewer than SAMPLE_ROWS).
+    """
+    return max(int(budget_bytes / (max(row_bytes, 1) * WORKING_COPIES)), SAMPLE_ROWS)
+
+
+# function to stream a bronze object in chunks that fit a memory budget
+def iter_bronze_chunks(storage, bucket_name: str, object_name: str, budget_bytes: int):
+    """
+    Yields a bronze CSV or Parquet object as DataFrame chunks (registry dtypes)
+    sized from the memory budget. Only one chunk is held at a time, and S3 objects
+    are read with ranged GETs instead of being downloaded whole.
+
+    Parameters:
+        storage: storage backend
+        bucket_name (str): bucket name
+        object_name (str): object key e.g "ratings.csv"
+        budget_bytes (int): memory the chunks may use
+    """
+    source = storage.open_ranged(bucket_name, object_name)
+    if isinstance(source, io.RawIOBase):
+        source = io.BufferedReader(source, buffer_size=READ_BUFFER)
+
+    with source:
+        if object_name.endswith(".parquet"):
+            parquet_file = pq.ParquetFile(source)
+            metadata = parquet_file.metadata
+            row_bytes = sum(
+                metadata.row_group(i).total_byte_size
+                for i in range(metadata.num_row_groups)
+            ) / max(metadata.num_rows, 1)
+            batch_size = chunk_rows_for(budget_bytes, row_bytes)
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                yield apply_dtypes(batch.to_pandas(), "ratings")
+            return
+
+        with read_csv(source, "ratings", iterator=True) as reader:
+            chunk = reader.get_chunk(SAMPLE_ROWS)
+            row_bytes = chunk.memory_usage(deep=True).sum() / max(len(chunk), 1)
+            chunk_rows = chunk_rows_for(budget_bytes, row_bytes)
+            logger.info(
+                f"Streaming {object_name} in chunks of {chunk_rows} rows "
+                f"({row_bytes:.0f} bytes per row, budget {budget_bytes} bytes)."
+            )
+            while True:
+                yield chunk
+                try:
+                    chunk = reader.get_chunk(chunk_rows)
+                except StopIteration:
+                    return
+
+
+class PartitionBuffers:
+    """
+    Per-partition spill buffers on local disk. Every chunk of rows is split by
+    daily partition and appended to its partitions as a small Parquet file, so a
+    partition can later be loaded and finalized on its own.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.memory = {}  # partition -> in-memory bytes of its spilled rows
+        self.rows = 0
+        self.max_timestamp = None
+        self._files = 0
+
+    def spill(self, df: pd.DataFrame):
+        """
+        Appends the rows of a chunk to the buffers of their daily partitions.
+        """
+        if df.empty:
+            return
+        for partition, part in df.groupby(day_partitions(df["timestamp"])):
+            path = os.path.join(self.directory, *partition.split("/"))
+            os.makedirs(path, exist_ok=True)
+            part.to_parquet(
+                os.path.join(path, f"{self._files:06d}.parquet"), index=False
+            )
+            self._files += 1
+            self.memory[partition] = self.memory.get(partition, 0) + int(
+                part.memory_usage(deep=True).sum()
+            )
+
+        self.rows += df.shape[0]
+        chunk_max = df["timestamp"].max()
+        if self.max_timestamp is None or chunk_max > self.max_timestamp:
+            self.max_timestamp = chunk_max
+
+    def load(self, partition: str) -> pd.DataFrame:
+        """
+        Reads back every row spilled to a partition, in spill order.
+        """
+        path = os.path.join(self.directory, *partition.split("/"))
+        files = sorted(os.listdir(path))
+        return pd.concat(
+            [pd.read_parquet(os.path.join(path, name)) for name in files],
+            ignore_index=True,
+        )
+
+    def groups(self, budget_bytes: int):
+        """
+        Yields the partitions in order, grouped so that the rows of a group fit
+        the memory budget together. A partition larger than the budget is a
+        group of its own.
+        """
+        group, size = [], 0
+        for partition in sorted(self.memory):
+            partition_bytes = self.memory[partition] * WORKING_COPIES
+            if group and size + partition_bytes > budget_bytes:
+                yield group
+                group, size = [], 0
+            group.append(partition)
+            size += partition_bytes
+        if group:
+            yield group
+
+
+if __name__ == "__main__":
+    pass
@@ -1,16 +1,271 @@
+import math
+import numpy as np
 import pandas as pd
 from io import BytesIO
-from botocore.exceptions import ClientError
+from tempfile import TemporaryDirectory
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage
+from pipeline.partitions import (
+    read_manifest,
+    update_manifest,
+    write_part,
+    new_run_id,
+    adopt_legacy_files,
+    day_partitions,
+)
 from utils.logger import get_logger
-from config import S3_BUCKET_BRONZE, S3_BUCKET_SILVER, expected_columns
-from pipeline.b_silver.watermarks import read_watermarks, update_watermarks
-from pipeline.b_silver.read_write_buckets import read_file, write_to_silver
+from config import S3_BUCKET_BRONZE, S3_BUCKET_SILVER, SILVER_CONFIG
+from pipeline.key_index import (
+    RATINGS_ROW,
+    key_hashes,
+    build_key_index,
+    read_key_index,
+    write_key_index,
+    merge_key_indexes,
+    is_new,
+)
+from pipeline.dimensions import (
+    add_row_hashes,
+    content_hash,
+    read_dimension_hashes,
+    write_dimension_hash,
+)
+from pipeline.b_silver.kernels import run_kernel, kernel_for
+from pipeline.b_silver.spill import (
+    PartitionBuffers,
+    iter_bronze_chunks,
+    WORKING_COPIES,
+)
+from pipeline.b_silver.watermarks import watermark_store, update_watermarks
+from pipeline.b_silver.read_write_buckets import (
+    read_file,
+    read_window,
+    write_to_silver,
+)
+from pipeline.a_bronze.upload import bronze_object_name
 
 # initialize Logger
 logger = get_logger(__name__)
 
 
+# function to append the new rows of one partition
+def append_partition(storage, manifest: dict, partition: str, df, run_id: str) -> dict:
+    """
+    Appends the rows of a partition whose natural key (user_id, item_id, timestamp)
+    is not in the partition yet, or whose rating differs from the committed one.
+    Incoming rows are checked against the partition's sorted key index, so the
+    cost follows the batch size, not the partition size.
+
+    The last row of a key wins, within a batch and across batches: a replaced
+    row stays in its older part file, and readers (gold load, compaction) keep
+    the row of the newest part.
+
+    Returns:
+        dict: {"entry": manifest entry of the part file or None if every row was
+        already there, "index": key of the updated key index or None}
+    """
+    keys = key_hashes(df)
+    rows = key_hashes(df, RATINGS_ROW)
+    last = ~pd.Series(keys).duplicated(keep="last").to_numpy()  # within the batch
+    index = read_key_index(storage, manifest, partition)
+    new = last & is_new(index, keys, rows)
+
+    if not new.any():
+        logger.info(f"No new ratings for {partition}.")
+        return {"entry": None, "index": None}
+
+    entry = write_part(storage, df[new], "ratings", partition, run_id)
+    index = build_key_index(
+        np.concatenate([index[:, 0], keys[new]]),
+        np.concatenate([index[:, 1], rows[new]]),
+    )
+    return {
+        "entry": entry,
+        "index": write_key_index(storage, "ratings", partition, run_id, index),
+    }
+
+
+# function to write the partitions of a batch concurrently
+def write_partitions(
+    storage, manifest: dict, batches: dict, run_id: str, max_workers: int = None
+):
+    """
+    Appends the new rows of every partition on a bounded thread pool. A failing
+    partition does not stop the others; if any fails, the files written by
+    this run are deleted (they were never committed) and an error is raised.
+
+    Parameters:
+        storage: storage backend
+        manifest (dict): ratings manifest the batch is appended to
+        batches (dict): {partition: rows of the partition}
+        run_id (str): id of the run, see new_run_id()
+        max_workers (int): partitions written at the same time
+
+    Returns:
+        tuple: (manifest entries of the written parts in partition order,
+        {partition: key of its new key index})
+    """
+    max_workers = max_workers or SILVER_CONFIG["max_workers"]
+    results, failed = {}, {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                append_partition, storage, manifest, partition, split_df, run_id
+            ): partition
+            for partition, split_df in batches.items()
+        }
+        for future in as_completed(futures):
+            partition = futures[future]
+            try:
+                results[partition] = future.result()
+            except Exception as e:
+                logger.error(f"Writing ratings/{partition} failed: {e}")
+                failed[partition] = e
+
+    written = {p: r for p, r in sorted(results.items()) if r["entry"] is not None}
+    if failed:
+        for result in written.values():
+            storage.delete(S3_BUCKET_SILVER, result["entry"]["key"])
+            storage.delete(S3_BUCKET_SILVER, result["index"])
+        raise RuntimeError(
+            f"{len(failed)} of {len(batches)} ratings partitions failed: {sorted(failed)}"
+        )
+
+    logger.info(f"Wrote {len(written)} ratings partitions with {max_workers} workers.")
+    entries = [result["entry"] for result in written.values()]
+    return entries, {p: result["index"] for p, result in written.items()}
+
+
+# function to commit written partitions to the manifest
+def commit_partitions(storage, manifest: dict, entries: list, indexes: dict):
+    """
+    Lists new part files and key indexes in the manifest, then removes the key
+    indexes they replace. Parts and indexes only become visible once listed.
+    The entries are added to the latest manifest, so runs committing meanwhile
+    (e.g overlapping catchup runs or a compaction) are kept. When such a run
+    committed a partition this run appended to, both key indexes are merged.
+    """
+    base = dict(manifest.get("key_indexes", {}))  # what this run's indexes extend
+    unused = set(indexes.values())  # indexes that may end up in no manifest
+
+    def add(latest):
+        adopt_legacy_files(storage, latest)
+        latest["files"].extend(entries)
+        committed = latest.setdefault("key_indexes", {})
+        for partition, index_key in indexes.items():
+            current = committed.get(partition)
+            if current is not None and current != base.get(partition):
+                # another run committed this partition meanwhile: keep its keys too
+                index_key = merge_key_indexes(
+                    storage,
+                    "ratings",
+                    partition,
+                    new_run_id(),
+                    current,
+                    index_key,
+                    base.get(partition),
+                )
+            if current is not None:
+                unused.add(current)
+            unused.add(index_key)  # merged indexes of a retried attempt
+            committed[partition] = index_key
+
+    manifest.update(update_manifest(storage, "ratings", add))
+    for index_key in unused - set(manifest["key_indexes"].values()):
+        storage.delete(S3_BUCKET_SILVER, index_key)
+
+
+# function to find the latest ratings watermark
+def latest_ratings_watermark():
+    """
+    Returns the latest valid ratings watermark as a naive timestamp, or None when
+    there is none (every rating is then new).
+    """
+    watermark = watermark_store().get("ratings")
+    if watermark is None:
+        logger.warning("No existing watermark for ratings. Proceeding without filter.")
+        return None
+
+    logger.info("Applying watermark filter for ratings..")
+
+    # Safely convert to datetime (handles strings like "1998-04-22 23:10:38")
+    if pd.isna(watermark.timestamp):
+        logger.warning(
+            "No valid datetime values in ratings watermark. Proceeding without filter."
+        )
+        return None
+    return watermark.timestamp
+
+
+# function to get the bronze window a ratings run reads
+def bronze_window(pipeline_start, int_start, int_end) -> tuple:
+    """
+    Returns the (start, end) epoch seconds, inclusive, of the bronze ratings a run
+    of the interval [int_start, int_end) needs. None for no bound.
+    """
+    if int_end <= pipeline_start:
+        return None, math.floor(pipeline_start.timestamp())
+    return math.ceil(int_start.timestamp()), math.ceil(int_end.timestamp()) - 1
+
+
+# function to read a window of the bronze ratings
+def read_bronze_ratings(window: tuple) -> pd.DataFrame:
+    """
+    Reads the bronze ratings of a window (see bronze_window) through the time
+    index, or the whole object when there is no up to date index.
+    """
+    df = read_window("ratings", *window)
+    if df is None:
+        df = read_file(S3_BUCKET_BRONZE, bronze_object_name("ratings"))
+    return df
+
+
+# function to decide whether the initial ratings load runs out of core
+def use_out_of_core(storage) -> bool:
+    """
+    Checks SILVER_CONFIG["out_of_core"]: "true", "false", or "auto" to go out of
+    core when the bronze ratings would not fit the memory budget once parsed.
+    """
+    mode = SILVER_CONFIG["out_of_core"]
+    if mode != "auto":
+        return mode == "true"
+    try:
+        head = storage.head(S3_BUCKET_BRONZE, bronze_object_name("ratings"))
+        size = int(head["ContentLength"])
+    except Exception as e:
+        logger.info(f"Could not size the bronze ratings: {e}")
+        return False  # the in-memory read reports the actual error
+    return size * WORKING_COPIES > SILVER_CONFIG["memory_budget_bytes"]
+
+
+# function to write a dimension to silver unless it is unchanged
+def write_dimension(df: pd.DataFrame, dataset: str) -> bool:
+    """
+    Writes a cleaned dimension to silver with a row_hash column, unless its content
+    hash matches the file already there.
+
+    Returns:
+        bool: True if the file was written, False if it was unchanged
+    """
+    storage = get_storage(initialize_s3_client)
+    df = add_row_hashes(df)
+    digest = content_hash(df, dataset)
+    object_name = f"{dataset}.csv"
+
+    recorded = read_dimension_hashes(storage).get(dataset, {})
+    if recorded.get("content_hash") == digest and storage.exists(
+        S3_BUCKET_SILVER, object_name
+    ):
+        logger.info(f"{dataset} unchanged since the last run. Skipping the write.")
+        return False
+
+    write_to_silver(df, object_name)
+    write_dimension_hash(storage, dataset, digest, df.shape[0])
+    return True
+
+
 # function to tranform movie df
 def prepare_movie_df(pipeline_start, **kwargs: dict):
     """
@@ -31,39 +286,23 @@ def prepare_movie_df(pipeline_start, **kwargs: dict):
         exec_date = kwargs["data_interval_end"]
 
         # read from bronze
-        df = read_file(S3_BUCKET_BRONZE, "movies.csv")
+        df = read_file(S3_BUCKET_BRONZE, bronze_object_name("movies"))
         # print("Executuion date is:", exec_date)
 
-        # standardize column names
-        df.columns = df.columns.str.strip().str.lower()
-
-        # ensure release_date is datetime
-        df["release_date"] = pd.to_datetime(df["release_date"], errors="coerce")
-        df["release_date"] = df["release_date"].dt.tz_localize("UTC")
-
-        # drop duplicates
-        df = df.drop_duplicates()
-
-        # Filter: full load up to execution_date (bounded by resumption_date if needed)
+        # clean (cutoff: full load up to execution_date, bounded by resumption_date)
         cutoff = min(exec_date, pipeline_start)
-        df = df[df["release_date"] <= cutoff]
-        df["release_date"] = pd.to_datetime(df["release_date"], errors="coerce")
-
+        df = run_kernel(kernel_for("movies"), df, cutoff=cutoff)
         logger.info(f"Full load of {df.shape[0]} records up to {cutoff.date()}")
 
-        # drop rows with missing item_id or movie_title
-        df = df.dropna(subset=["item_id", "movie_title"])
-
-        # trim and clean string columns
-        df["movie_title"] = df["movie_title"].str.strip()
-        df["primary_genre"] = df["primary_genre"].str.strip().str.title()
-        df["imdb_url"] = df["imdb_url"].str.strip()
+        # drop duplicates
+        df = df.drop_duplicates()
 
         # final shape logging
         logger.info(f"Movies data cleaned with {df.shape[0]} records")
 
-        # upload to silver
-        write_to_silver(df, "movies.csv")
+        # upload to silver, unless nothing changed since the last run
+        if not write_dimension(df, "movies"):
+            return
 
         # update the watermark with the latest processing record
         if not df.empty:
@@ -82,13 +321,16 @@ def prepare_movie_df(pipeline_start, **kwargs: dict):
 
 
 # function to transform ratings df
-def prepare_ratings_df(pipeline_start, **kwargs: dict):
+def prepare_ratings_df(pipeline_start, bronze_df: pd.DataFrame = None, **kwargs: dict):
     """
     Transforms and ingests ratings data from the bronze layer to the silver layer.
 
     Parameters:
         pipeline_start (datetime.datetime): The cutoff date for initial ingestion. Data beyond this date is excluded until the DAG progresses past it.
 
+        bronze_df (pd.DataFrame): bronze ratings of the run's window already read by
+            the caller (e.g a backfill reading its range once). None to read them.
+
         **kwargs (dict):
             Airflow context dictionary containing:
             - execution_date (datetime): The logical start of the DAG run.
@@ -105,21 +347,18 @@ def prepare_ratings_df(pipeline_start, **kwargs: dict):
         # execution_date/logical_date means start of period not actual time task is running
         # execution date + schedule interval
 
-        # Read and Clean Bronze
-        df = read_file(S3_BUCKET_BRONZE, "ratings.csv")
-        df.columns = (
-            df.columns.str.strip().str.lower().str.replace(" ", "_")
-        )  # standardize column names
+        # Read only the run's window of Bronze (epoch seconds, inclusive bounds)
+        storage = get_storage(initialize_s3_client)
+        if bronze_df is not None:
+            df = bronze_df
+        elif int_end <= pipeline_start and use_out_of_core(storage):
+            return prepare_ratings_out_of_core(storage, pipeline_start)
+        else:
+            df = read_bronze_ratings(bronze_window(pipeline_start, int_start, int_end))
+
+        # Clean Bronze
+        df = run_kernel(kernel_for("ratings"), df)
         df = df.drop_duplicates()  # drop exact duplicates
-        df = df.dropna(
-            subset=["user_id", "item_id", "rating"]
-        )  # Drop rows with missing user_id, item_id or rating
-        df["timestamp"] = pd.to_datetime(
-            df["timestamp"], unit="s"
-        )  # Convert timestamp into proper datetime
-        df["timestamp"] = df["timestamp"].dt.tz_localize(
-            "UTC"
-        )  # localize to ensure parity with **kwargs
 
         # my_test
         logger.info(
@@ -134,7 +373,6 @@ def prepare_ratings_df(pipeline_start, **kwargs: dict):
             logger.info(
                 f"Initial run: filtering {df.shape[0]} rating records up to {pipeline_start.date()}"
             )
-            target_month = pipeline_start.strftime("%Y-%m")  # get write partition
 
         else:
             # Weekly run: ingest only that week's data
@@ -146,38 +384,12 @@ def prepare_ratings_df(pipeline_start, **kwargs: dict):
         df["timestamp"] = df["timestamp"].dt.tz_localize(None)
 
         # incremental filter based on watermark
-        watermarks = read_watermarks()
-        if not watermarks.empty:
-            logger.info("Applying watermark filter for ratings..")
-
-            # Filter only 'ratings' dataset
-            ratings_watermark = watermarks[watermarks["dataset_name"] == "ratings"]
-
-            if not ratings_watermark.empty:
-                # Safely convert to datetime (handles strings like "1998-04-22 23:10:38")
-                ratings_watermark["max_value"] = pd.to_datetime(
-                    ratings_watermark["max_value"], errors="coerce"
-                )
-
-                # Drop invalid or NaT entries
-                ratings_watermark = ratings_watermark.dropna(subset=["max_value"])
-
-                if not ratings_watermark.empty:
-                    latest_watermark = ratings_watermark["max_value"].max()
-                    df = df[df["timestamp"] > latest_watermark]
-                    logger.info(
-                        f"Filtered ratings to {df.shape[0]} new records after watermark {latest_watermark}."
-                    )
-                else:
-                    logger.warning(
-                        "No valid datetime values in ratings watermark. Proceeding without filter."
-                    )
-            else:
-                logger.warning(
-                    "No existing watermark for ratings. Proceeding without filter."
-                )
-        else:
-            logger.warning("No watermark file found. Proceeding without filter.")
+        latest_watermark = latest_ratings_watermark()
+        if latest_watermark is not None:
+            df = df[df["timestamp"] > latest_watermark]
+            logger.info(
+                f"Filtered ratings to {df.shape[0]} new records after watermark {latest_watermark}."
+            )
 
         if df.empty:
             logger.warning(
@@ -185,53 +397,31 @@ def prepare_ratings_df(pipeline_start, **kwargs: dict):
             )
             return
 
-        # write initial load into one partition
-        if int_end <= pipeline_start:
-            try:
-                existing_df = read_file(S3_BUCKET_SILVER, f"ratings/{target_month}.csv")
-            except ClientError as e:
-                if e.response["Error"]["Code"] == "NoSuchKey":
-                    existing_df = pd.DataFrame(columns=expected_columns["ratings"])
-                else:
-                    raise
-
-            combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df = combined_df.drop_duplicates()
-            write_to_silver(combined_df, f"ratings/{target_month}.csv")
-
-        # write subsequent loads into actual monthly partitions (if_exists i.e when a week spans 2 months.)
-        else:
-            # group into monthly partitions
-            monthly_groups = df.groupby(
-                df["timestamp"].dt.to_period("M")
-            )  # pandas groupby obj (acts like a dataframe)
-
-            for period, split_df in monthly_groups:
-
-                month_str = period.strftime("%Y-%m")
-                target_key = f"ratings/{month_str}.csv"
-
-                try:
-                    existing_df = read_file(S3_BUCKET_SILVER, target_key)
-                except ClientError as e:
-                    if e.response["Error"]["Code"] == "NoSuchKey":
-                        existing_df = pd.DataFrame(columns=expected_columns["ratings"])
-                    else:
-                        raise
-
-                # write to partition
-                combined_df = pd.concat([existing_df, split_df], ignore_index=True)
-                combined_df = combined_df.drop_duplicates()
-                write_to_silver(combined_df, target_key)
-                logger.info(f"Wrote {split_df.shape[0]} records to {target_key}")
+        # split the batch into the daily partitions of its rows, so readers
+        # can plan from the manifest exactly which days a window needs
+        batches = {
+            partition: split_df
+            for partition, split_df in df.groupby(day_partitions(df["timestamp"]))
+        }  # a week spans 7-8 partitions, the initial load one per day of history
+
+        # append each batch as a new immutable part file; partitions are never re-read.
+        # duplicates across parts are dropped by the readers
+        manifest = read_manifest(storage, "ratings")
+        adopt_legacy_files(storage, manifest)
+        entries, indexes = write_partitions(storage, manifest, batches, new_run_id())
+        if not entries:
+            logger.warning("Every rating of the batch is already in silver. End")
+            return
 
-        # update the watermark with the new details
+        commit_partitions(storage, manifest, entries, indexes)
+
+        # one watermark update for the whole batch, after every partition is committed
         if not df.empty:
             latest_max_value = df["timestamp"].max()
             data = {
                 "dataset_name": "ratings",
                 "max_value": latest_max_value,
-                "records_loaded": df.shape[0],
+                "records_loaded": sum(entry["rows"] for entry in entries),
                 "processing_time": pd.Timestamp.now(),
             }
 
@@ -242,6 +432,79 @@ def prepare_ratings_df(pipeline_start, **kwargs: dict):
         raise
 
 
+# function to run the initial ratings load within a memory budget
+def prepare_ratings_out_of_core(storage, pipeline_start):
+    """
+    Initial ratings load for histories larger than memory. Bronze is streamed in
+    chunks sized from SILVER_CONFIG["memory_budget_bytes"]; each chunk is cleaned,
+    filtered and spilled to local disk by daily partition. The partitions are
+    then finalized a group at a time (dedup, key index, part file) and committed
+    to the manifest together, with one watermark update.
+
+    Parameters:
+        storage: storage backend
+        pipeline_start (datetime.datetime): cutoff of the initial load
+    """
+    budget = SILVER_CONFIG["memory_budget_bytes"]
+    latest_watermark = latest_ratings_watermark()
+    object_name = bronze_object_name("ratings")
+    logger.info(f"Initial run out of core: {object_name} with a {budget} byte budget.")
+
+    with TemporaryDirectory(dir=SILVER_CONFIG["spill_dir"] or None) as spill_dir:
+        buffers = PartitionBuffers(spill_dir)
+        for chunk in iter_bronze_chunks(storage, S3_BUCKET_BRONZE, object_name, budget):
+            chunk = run_kernel(kernel_for("ratings"), chunk)
+            chunk = chunk[chunk["timestamp"] <= pipeline_start]
+            chunk["timestamp"] = chunk["timestamp"].dt.tz_localize(None)
+            if latest_watermark is not None:
+                chunk = chunk[chunk["timestamp"] > latest_watermark]
+            buffers.spill(chunk)
+
+        logger.info(
+            f"Spilled {buffers.rows} rating records to {len(buffers.memory)} partitions."
+        )
+        if buffers.rows == 0:
+            logger.warning(
+                "No new ratings data to upload after watermark filtering. End"
+            )
+            return
+
+        # finalize: a group of partitions in memory at a time, one commit at the end
+        manifest = read_manifest(storage, "ratings")
+        adopt_legacy_files(storage, manifest)
+        run_id = new_run_id()
+        entries, indexes = [], {}
+        try:
+            for group in buffers.groups(budget):
+                batches = {p: buffers.load(p).drop_duplicates() for p in group}
+                group_entries, group_indexes = write_partitions(
+                    storage, manifest, batches, run_id
+                )
+                entries.extend(group_entries)
+                indexes.update(group_indexes)
+        except Exception:
+            # earlier groups were written but never committed
+            for entry in entries:
+                storage.delete(S3_BUCKET_SILVER, entry["key"])
+            for index_key in indexes.values():
+                storage.delete(S3_BUCKET_SILVER, index_key)
+            raise
+
+    if not entries:
+        logger.warning("Every rating of the batch is already in silver. End")
+        return
+
+    commit_partitions(storage, manifest, entries, indexes)
+    update_watermarks(
+        {
+            "dataset_name": "ratings",
+            "max_value": buffers.max_timestamp,
+            "records_loaded": sum(entry["rows"] for entry in entries),
+            "processing_time": pd.Timestamp.now(),
+        }
+    )
+
+
 # function to transform user df
 def prepare_users_df():
     """
@@ -250,29 +513,20 @@ def prepare_users_df():
 
     try:
         # read from bronze
-        df = read_file(S3_BUCKET_BRONZE, "users.csv")
+        df = read_file(S3_BUCKET_BRONZE, bronze_object_name("users"))
 
         logger.info("Starting transformations for users..")
 
-        # standardize column names
-        df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
-
-        # drop users without user_id
-        df = df.dropna(subset=["user_id"])
-
-        # drop duplicates
+        # clean, then drop duplicates
+        df = run_kernel(kernel_for("users"), df)
         df = df.drop_duplicates()
 
-        # clean string fields: whitespaces and case
-        df["gender"] = df["gender"].str.strip().str.upper()
-        df["occupation"] = df["occupation"].str.strip().str.title()
-        df["zip_code"] = df["zip_code"].astype(str).str.strip()
-
         # final shape logging
         logger.info(f"Users data cleaned with {df.shape[0]} records")
 
-        # upload to silver
-        write_to_silver(df, "users.csv")
+        # upload to silver, unless nothing changed since the last run
+        if not write_dimension(df, "users"):
+            return
 
         # update the watermark with the new details
         if not df.empty:
@@ -0,0 +1,216 @@
+# importing libraries/modules
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage
+from pipeline.partitions import read_manifest
+from pipeline.b_silver.transform import (
+    bronze_window,
+    prepare_ratings_df,
+    read_bronze_ratings,
+    use_out_of_core,
+)
+from pipeline.b_silver.compaction import compact_ratings
+from pipeline.s_gold.load import load_ratings_df
+from utils.logger import get_logger
+from config import pipeline_start as default_pipeline_start, pipeline_schedule
+
+# initialize logger
+logger = get_logger(__name__)
+
+# pandas frequency of every schedule in config.pipeline_schedule
+FREQUENCIES = {"daily": "D", "weekly": "W-{day}"}
+
+
+# function to list the interval boundaries of a backfill
+def backfill_intervals(start, end, schedule: dict = pipeline_schedule):
+    """
+    Returns the boundaries of the scheduled intervals between start and end, as the
+    DAG with catchup would run them: interval i is [boundaries[i], boundaries[i + 1]).
+    A start off the schedule (e.g not a Sunday for a weekly one) opens a partial
+    first interval up to the first scheduled boundary.
+
+    Parameters:
+        start (datetime): first boundary (UTC)
+        end (datetime): last boundary (UTC)
+        schedule (dict): see config.pipeline_schedule
+    """
+    frequency = FREQUENCIES[schedule["frequency"]].format(
+        day=schedule.get("day_of_week", "sunday")[:3].upper()
+    )
+    start = pd.Timestamp(start)
+    boundaries = pd.date_range(start, pd.Timestamp(end), freq=frequency)
+    if len(boundaries) == 0 or boundaries[0] > start:
+        boundaries = boundaries.insert(0, start)
+    return boundaries
+
+
+# function to merge consecutive intervals into the windows a backfill runs
+def backfill_windows(boundaries, pipeline_start) -> list:
+    """
+    Merges consecutive intervals into at most two (start, end) windows: one for
+    the initial intervals (ending by pipeline_start, each of which loads all
+    history up to it) and one for the incremental intervals after them.
+    """
+    initial = boundaries[boundaries <= pipeline_start]
+    windows = []
+    if len(initial) >= 2:
+        windows.append((initial[0], initial[-1]))
+
+    incremental = boundaries[boundaries >= initial[-1]] if len(initial) else boundaries
+    if len(incremental) >= 2:
+        windows.append((incremental[0], incremental[-1]))
+    return windows
+
+
+# function to read the bronze ratings of every window at once
+def read_window_frames(storage, windows: list, pipeline_start) -> list:
+    """
+    Reads the bronze ratings of all the windows of a backfill in one read and
+    splits them into the rows each window's run would have read on its own.
+
+    Returns:
+        list: bronze rows per window. None for an initial window that runs out of
+        core, which streams bronze itself within the memory budget.
+    """
+    bounds = [bronze_window(pipeline_start, *window) for window in windows]
+    read = [
+        i
+        for i, window in enumerate(windows)
+        if window[1] > pipeline_start or not use_out_of_core(storage)
+    ]
+    frames = [None] * len(windows)
+    if not read:
+        return frames
+
+    df = read_bronze_ratings((bounds[read[0]][0], bounds[read[-1]][1]))
+    timestamps = pd.to_numeric(df["timestamp"], errors="coerce")
+    for i in read:
+        low, high = bounds[i]
+        mask = timestamps.notna()
+        if low is not None:
+            mask &= timestamps >= low
+        if high is not None:
+            mask &= timestamps <= high
+        frames[i] = df[mask].reset_index(drop=True)
+    return frames
+
+
+# function to assign timestamps to their intervals
+def interval_positions(timestamps, boundaries) -> np.ndarray:
+    """
+    Returns the interval of every timestamp in one vectorized pass (binary search
+    over the boundaries), -1 for timestamps outside [boundaries[0], boundaries[-1]).
+    """
+    values = pd.to_datetime(pd.Series(timestamps), format="ISO8601").to_numpy(
+        dtype="datetime64[ns]"
+    )
+    edges = boundaries.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    positions = np.searchsorted(edges, values, side="right") - 1
+    positions[(positions < 0) | (positions >= len(edges) - 1)] = -1
+    return positions
+
+
+# function to report the rows a backfill committed to silver per interval
+def interval_report(entries: list, boundaries) -> list:
+    """
+    Counts the committed rows of every interval from the manifest entries of the
+    backfill. Part files hold one day, and a day never straddles two intervals.
+    """
+    positions = interval_positions([e["min_timestamp"] for e in entries], boundaries)
+    rows = np.array([e["rows"] for e in entries], dtype="int64")
+    inside = positions >= 0
+    counts = np.bincount(
+        positions[inside], weights=rows[inside], minlength=len(boundaries) - 1
+    )
+    return [
+        {
+            "interval_start": boundaries[i],
+            "interval_end": boundaries[i + 1],
+            "rows": int(counts[i]),
+        }
+        for i in range(len(boundaries) - 1)
+    ]
+
+
+# function to backfill a range of intervals in one job
+def backfill_ratings(
+    start, end, pipeline_start=default_pipeline_start, layers=("silver", "gold")
+) -> list:
+    """
+    Loads every scheduled interval between start and end in one job, with the same
+    end state as running the intervals one by one. The range is read from bronze
+    once (silver rows are partitioned by day, which never straddles an interval),
+    loaded to gold in one upsert (monthly partitions are ensured from staging) and
+    the watermarks advance to the last interval.
+
+    Movies and users are full loads on every run, so they need no backfill.
+
+    Parameters:
+        start (datetime): start of the first interval (UTC)
+        end (datetime): end of the last interval (UTC)
+        pipeline_start (datetime): see config.pipeline_start
+        layers (tuple): layers to backfill, "silver" and/or "gold"
+
+    Returns:
+        list: silver rows committed per interval (empty without silver)
+    """
+    boundaries = backfill_intervals(start, end)
+    if len(boundaries) < 2:
+        logger.warning(f"No complete interval between {start} and {end}. End")
+        return []
+    windows = backfill_windows(boundaries, pipeline_start)
+    logger.info(
+        f"Backfilling {len(boundaries) - 1} intervals from {boundaries[0].date()} "
+        f"to {boundaries[-1].date()} in {len(windows)} windows."
+    )
+
+    def context(window):
+        return {
+            "data_interval_start": window[0],
+            "data_interval_end": window[1],
+            "logical_date": window[0],
+        }
+
+    report = []
+    if "silver" in layers:
+        storage = get_storage(initialize_s3_client)
+        before = {f["key"] for f in read_manifest(storage, "ratings")["files"]}
+        frames = read_window_frames(storage, windows, pipeline_start)
+        for window, bronze_df in zip(windows, frames):
+            prepare_ratings_df(pipeline_start, bronze_df=bronze_df, **context(window))
+        entries = [
+            f
+            for f in read_manifest(storage, "ratings")["files"]
+            if f["key"] not in before
+        ]
+        report = interval_report(entries, boundaries)
+        compact_ratings()
+
+    if "gold" in layers:
+        for window in windows:
+            load_ratings_df(pipeline_start, **context(window))
+
+    logger.info(f"Backfill complete: {sum(r['rows'] for r in report)} silver rows.")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backfill ratings for a range of scheduled intervals in one job."
+    )
+    parser.add_argument("start", help="start of the first interval e.g 1998-01-04")
+    parser.add_argument("end", help="end of the last interval e.g 1998-06-28")
+    parser.add_argument(
+        "--layers", nargs="+", choices=["silver", "gold"], default=["silver", "gold"]
+    )
+    args = parser.parse_args()
+
+    report = backfill_ratings(
+        pd.Timestamp(args.start, tz="UTC"),
+        pd.Timestamp(args.end, tz="UTC"),
+        layers=tuple(args.layers),
+    )
+    print(json.dumps(report, indent=2, default=str))
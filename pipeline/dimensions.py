@@ -0,0 +1,133 @@
+# importing libraries/modules
+import io
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+from pipeline.storage import update_object
+from utils.logger import get_logger
+from config import S3_BUCKET_SILVER, DIMENSION_HASHES_PATH
+
+# initialize logger
+logger = get_logger(__name__)
+
+# key column of every dimension
+DIMENSION_KEYS = {"movies": "item_id", "users": "user_id"}
+
+# per-row hash column silver adds to the dimension files
+HASH_COLUMN = "row_hash"
+
+
+# function to hash every row of a dimension
+def add_row_hashes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the frame with a row_hash column: an int64 hash of each row's values,
+    so a row's hash only changes when one of its attributes does.
+    """
+    df = df.drop(columns=HASH_COLUMN, errors="ignore")
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+    return df.assign(**{HASH_COLUMN: hashes})
+
+
+# function to hash the content of a dimension
+def content_hash(df: pd.DataFrame, dataset: str) -> str:
+    """
+    Returns a sha256 of the row hashes in key order, so the same rows give the
+    same hash whatever order they were read in.
+    """
+    hashes = df.sort_values(DIMENSION_KEYS[dataset], kind="stable")[HASH_COLUMN]
+    return hashlib.sha256(hashes.to_numpy(dtype=np.int64).tobytes()).hexdigest()
+
+
+# function to read the content hashes of the silver dimensions
+def read_dimension_hashes(storage) -> dict:
+    """
+    Reads {dataset: {"content_hash", "rows", "updated_at"}} of the dimension files
+    last written to silver. Empty if none were recorded yet.
+    """
+    try:
+        return json.loads(storage.get(S3_BUCKET_SILVER, DIMENSION_HASHES_PATH))
+    except ClientError as e:
+        logger.info(f"No dimension hashes found. Initializing them: {e}")
+        return {}
+
+
+# function to record the content hash of a silver dimension
+def write_dimension_hash(storage, dataset: str, digest: str, rows: int):
+    """
+    Records the content hash of a dimension file just written to silver. The
+    movies and users tasks share the file, so it is updated with a conditional write.
+    """
+
+    def record(data):
+        store = json.loads(data) if data is not None else {}
+        store[dataset] = {
+            "content_hash": digest,
+            "rows": rows,
+            "updated_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        }
+        return json.dumps(store, indent=2).encode("utf-8")
+
+    update_object(storage, S3_BUCKET_SILVER, DIMENSION_HASHES_PATH, record)
+
+
+# function to name the row hashes last loaded to gold
+def loaded_hashes_name(dataset: str) -> str:
+    """
+    Returns the silver key of the row hashes last loaded to gold
+    e.g "dimensions/movies.loaded.csv".
+    """
+    return f"{DIMENSION_HASHES_PATH.rsplit('/', 1)[0]}/{dataset}.loaded.csv"
+
+
+# function to read the row hashes last loaded to gold
+def read_loaded_hashes(storage, dataset: str) -> pd.DataFrame:
+    """
+    Returns the (key, row_hash) pairs last loaded to gold. Empty if gold was never
+    loaded with hashes, so every row counts as changed.
+    """
+    columns = [DIMENSION_KEYS[dataset], HASH_COLUMN]
+    try:
+        data = storage.get(S3_BUCKET_SILVER, loaded_hashes_name(dataset))
+        return pd.read_csv(io.BytesIO(data), usecols=columns)
+    except ClientError as e:
+        logger.info(f"No loaded {dataset} hashes found. Loading every row: {e}")
+        return pd.DataFrame(columns=columns)
+
+
+# function to record the row hashes loaded to gold
+def write_loaded_hashes(storage, dataset: str, df: pd.DataFrame):
+    """
+    Records the (key, row_hash) pairs of a dimension after it was loaded to gold.
+    """
+    buffer = io.BytesIO()
+    df[[DIMENSION_KEYS[dataset], HASH_COLUMN]].to_csv(buffer, index=False)
+    storage.put(
+        S3_BUCKET_SILVER,
+        loaded_hashes_name(dataset),
+        buffer.getvalue(),
+        content_type="application/csv",
+    )
+
+
+# function to find the rows that changed since the last load
+def changed_rows(df: pd.DataFrame, loaded: pd.DataFrame, dataset: str) -> pd.DataFrame:
+    """
+    Returns the rows of df that are new or whose hash differs from the loaded one.
+    Frames without a row_hash column (written before hashing) are returned whole.
+    """
+    if HASH_COLUMN not in df.columns:
+        return df
+    key = DIMENSION_KEYS[dataset]
+    pairs = pd.MultiIndex.from_arrays(
+        [df[key].astype("int64"), df[HASH_COLUMN].astype("int64")]
+    )
+    loaded_pairs = pd.MultiIndex.from_arrays(
+        [loaded[key].astype("int64"), loaded[HASH_COLUMN].astype("int64")]
+    )
+    return df[~pairs.isin(loaded_pairs)]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,171 @@
+# importing libraries/modules
+import io
+import numpy as np
+import pandas as pd
+from pipeline.partitions import plan_files, partition_bounds
+from pipeline.storage import read_file
+from utils.logger import get_logger
+from config import S3_BUCKET_SILVER
+
+# initialize logger
+logger = get_logger(__name__)
+
+# natural key of a rating, also the conflict target of prod.ratings
+RATINGS_KEY = ["user_id", "item_id", "timestamp"]
+# columns whose change makes a row with a known key replace the indexed one
+RATINGS_ROW = RATINGS_KEY + ["rating"]
+
+
+# function to hash the natural key of every row
+def key_hashes(df: pd.DataFrame, columns: list = RATINGS_KEY) -> np.ndarray:
+    """
+    Returns one int64 hash per row of its key columns. Ids are cast to int64,
+    ratings to float64 and timestamps to epoch nanoseconds first, so a key hashes
+    the same whether it was parsed from CSV text or Parquet.
+    """
+    keys = pd.DataFrame(
+        {
+            column: (
+                pd.to_datetime(df[column]).astype("int64")
+                if column == "timestamp"
+                else df[column].astype("float64" if column == "rating" else "int64")
+            )
+            for column in columns
+        }
+    )
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy().view(np.int64)
+
+
+# function to name a key index
+def key_index_name(dataset: str, partition: str, run_id: str) -> str:
+    """
+    Returns the key of a partition's key index written by a run
+    e.g "ratings/year=2000/month=01/day=31/_keys-<run_id>.npy".
+    """
+    return f"{dataset}/{partition}/_keys-{run_id}.npy"
+
+
+# function to build a key index
+def build_key_index(keys: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Returns the key index of rows given oldest first: one (key hash, row hash)
+    pair per key, sorted by key. The last row of a key wins, as it does for the
+    readers of the partition.
+    """
+    order = np.argsort(keys, kind="stable")
+    keys, rows = keys[order], rows[order]
+    last = np.append(keys[1:] != keys[:-1], True) if keys.size else keys.astype(bool)
+    return np.column_stack([keys[last], rows[last]])
+
+
+# function to load a key index
+def load_key_index(storage, index_key: str) -> np.ndarray:
+    """
+    Reads a key index. Returns None for an index written before row hashes were
+    kept (a flat array of key hashes).
+    """
+    index = np.load(io.BytesIO(storage.get(S3_BUCKET_SILVER, index_key)))
+    return index if index.ndim == 2 else None
+
+
+# function to read the key index of a partition
+def read_key_index(storage, manifest: dict, partition: str) -> np.ndarray:
+    """
+    Returns the key index of the committed rows of a partition, see
+    build_key_index().
+
+    The index committed in the manifest is used when there is one. Partitions
+    without one (written before key indexes existed, or legacy monthly files) get
+    it built once from the rows of the planned files that fall in the partition.
+    """
+    index_key = manifest.get("key_indexes", {}).get(partition)
+    if index_key is not None:
+        index = load_key_index(storage, index_key)
+        if index is not None:
+            return index
+
+    start, end = partition_bounds(partition)
+    keys, rows = [], []
+    for file_key in plan_files(manifest, start, end):
+        df = read_file(storage, S3_BUCKET_SILVER, file_key, columns=RATINGS_ROW)
+        df = df.dropna(subset=RATINGS_KEY)
+        timestamps = pd.to_datetime(df["timestamp"])
+        df = df[(timestamps >= start) & (timestamps < end)]
+        keys.append(key_hashes(df))
+        rows.append(key_hashes(df, RATINGS_ROW))
+
+    logger.info(f"Built the key index of ratings/{partition} from its files.")
+    if not keys:
+        return np.empty((0, 2), dtype=np.int64)
+    return build_key_index(np.concatenate(keys), np.concatenate(rows))
+
+
+# function to write the key index of a partition
+def write_key_index(
+    storage, dataset: str, partition: str, run_id: str, keys: np.ndarray
+) -> str:
+    """
+    Writes a partition's key index as a .npy file. Like part files, it is only
+    used once the manifest lists it under "key_indexes".
+
+    Returns:
+        str: key of the index
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, keys, allow_pickle=False)
+    index_key = key_index_name(dataset, partition, run_id)
+    storage.put(
+        S3_BUCKET_SILVER,
+        index_key,
+        buffer.getvalue(),
+        content_type="application/octet-stream",
+    )
+    return index_key
+
+
+# function to merge the key indexes of one partition
+def merge_key_indexes(
+    storage,
+    dataset: str,
+    partition: str,
+    run_id: str,
+    committed: str,
+    written: str,
+    base: str = None,
+) -> str:
+    """
+    Writes the key index of a partition two runs appended to concurrently: the
+    index committed by the other run, updated with the rows the written index
+    adds or replaces compared to the base index both runs started from. The
+    written run's part file is listed last, so its rows win.
+
+    Returns:
+        str: key of the merged index
+    """
+    index = load_key_index(storage, committed)
+    ours = load_key_index(storage, written)
+    start = None if base is None else load_key_index(storage, base)
+    if start is not None:
+        ours = ours[is_new(start, ours[:, 0], ours[:, 1])]
+    merged = build_key_index(
+        np.concatenate([index[:, 0], ours[:, 0]]),
+        np.concatenate([index[:, 1], ours[:, 1]]),
+    )
+    return write_key_index(storage, dataset, partition, run_id, merged)
+
+
+# function to find the rows an index does not hold yet
+def is_new(index: np.ndarray, keys: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Returns a mask of the rows whose key is missing from a key index, or indexed
+    with another row (e.g a corrected rating), in O(n log m) for n incoming rows
+    and m indexed ones.
+    """
+    if index.shape[0] == 0:
+        return np.ones(keys.shape, dtype=bool)
+    positions = np.searchsorted(index[:, 0], keys).clip(max=index.shape[0] - 1)
+    return (index[positions, 0] != keys) | (index[positions, 1] != rows)
+
+
+if __name__ == "__main__":
+    pass
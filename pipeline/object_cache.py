@@ -0,0 +1,259 @@
+# importing libraries/modules
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from config import OBJECT_CACHE_CONFIG
+from utils.logger import get_logger
+
+# initialize logger
+logger = get_logger(__name__)
+
+# S3 answers a matching If-None-Match with a 304 error instead of the body
+NOT_MODIFIED_CODES = {"304", "NotModified"}
+
+# objects cached when written, because a later commit of the same process reads
+# them back: manifests, watermarks, fingerprints and dimension hashes. bronze
+# objects and silver part files are read by other tasks, if ever
+WRITE_THROUGH_SUFFIXES = (".json",)
+
+
+class ObjectCache:
+    """
+    Two tier read-through cache of S3 object bytes keyed by (bucket, key).
+
+    Every entry stores the object's ETag so it can be revalidated with a conditional
+    GET: an unchanged object costs a 304 instead of a full download. The memory tier
+    is an LRU bounded by memory_bytes. The optional disk tier survives across runs
+    (e.g catchup runs) and evicts the least recently used files past disk_bytes.
+    Its size is tracked as files are written, the directory is only scanned once.
+    """
+
+    def __init__(self, memory_bytes: int, disk_dir: str = None, disk_bytes: int = 0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (bucket, key) -> (etag, data)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_files = OrderedDict()  # path -> bytes, least recently used first
+        self._disk_size = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def get(self, bucket: str, key: str):
+        """
+        Returns the cached (etag, data) of an object, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            if entry is not None:
+                self._entries.move_to_end((bucket, key))
+                return entry
+
+        entry = self._read_disk(bucket, key)
+        if entry is not None:
+            self._remember(bucket, key, *entry)
+        return entry
+
+    def put(self, bucket: str, key: str, etag: str, data: bytes):
+        """
+        Caches the bytes of an object under its ETag in both tiers.
+        """
+        self._remember(bucket, key, etag, data)
+        self._write_disk(bucket, key, etag, data)
+
+    def invalidate(self, bucket: str, key: str):
+        """
+        Drops an object from both tiers.
+        """
+        with self._lock:
+            entry = self._entries.pop((bucket, key), None)
+            if entry is not None:
+                self._size -= len(entry[1])
+
+        if self.disk_dir:
+            path = self._disk_path(bucket, key)
+            with self._lock:
+                self._disk_size -= self._disk_files.pop(path, 0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """
+        Empties the memory tier. Disk entries are left to be revalidated.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    # memory tier
+    def _remember(self, bucket, key, etag, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((bucket, key), None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[(bucket, key)] = (etag, data)
+            self._size += len(data)
+            while self._size > self.memory_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    # disk tier: one file per object, the ETag on the first line then the bytes
+    def _disk_path(self, bucket, key):
+        name = hashlib.sha1(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, name)
+
+    def _read_disk(self, bucket, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(bucket, key)
+        try:
+            with open(path, "rb") as f:
+                etag = f.readline().rstrip(b"\n").decode("utf-8")
+                data = f.read()
+            with self._lock:
+                if path in self._disk_files:
+                    self._disk_files.move_to_end(path)  # recently used
+            return etag, data
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+
+    def _write_disk(self, bucket, key, etag, data):
+        if not self.disk_dir or len(data) > self.disk_bytes:
+            return
+        path = self._disk_path(bucket, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(etag.encode("utf-8") + b"\n")
+                f.write(data)
+            os.replace(tmp_path, path)  # readers never see a half written file
+        except OSError as e:
+            logger.warning(f"Could not write {key} to the disk cache: {e}")
+            return
+
+        evicted = []
+        with self._lock:
+            self._disk_size -= self._disk_files.pop(path, 0)
+            self._disk_files[path] = len(etag.encode("utf-8")) + 1 + len(data)
+            self._disk_size += self._disk_files[path]
+            while self._disk_size > self.disk_bytes:
+                old_path, size = self._disk_files.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+    def _scan_disk(self):
+        # files left by earlier runs, oldest first
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        for _, size, path in sorted(files):
+            self._disk_files[path] = size
+            self._disk_size += size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# function to get the process-wide cache
+def get_object_cache():
+    """
+    Returns the process-wide object cache built from config.OBJECT_CACHE_CONFIG,
+    or None if caching is disabled.
+    """
+    global _cache
+
+    if not OBJECT_CACHE_CONFIG["enabled"]:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ObjectCache(
+                OBJECT_CACHE_CONFIG["memory_bytes"],
+                OBJECT_CACHE_CONFIG["disk_dir"],
+                OBJECT_CACHE_CONFIG["disk_bytes"],
+            )
+        return _cache
+
+
+# function to read an object through the cache
+def get_object_bytes(client, bucket_name: str, object_name: str) -> bytes:
+    """
+    Reads the bytes of an S3 object, serving them from the cache when S3 confirms
+    (If-None-Match) that the cached ETag is still current.
+
+    Parameters:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        object_name (str): object key
+
+    Returns:
+        bytes: content of the object
+    """
+    cache = get_object_cache()
+    entry = cache.get(bucket_name, object_name) if cache else None
+
+    if entry is None:
+        response = client.get_object(Bucket=bucket_name, Key=object_name)
+    else:
+        try:
+            response = client.get_object(
+                Bucket=bucket_name, Key=object_name, IfNoneMatch=entry[0]
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in NOT_MODIFIED_CODES:
+                cache.hits += 1
+                logger.debug(f"Cache hit for '{object_name}' in '{bucket_name}'.")
+                return entry[1]
+            cache.invalidate(bucket_name, object_name)
+            raise
+
+    data = response["Body"].read()
+    if cache is not None:
+        cache.misses += 1
+        remember_object(bucket_name, object_name, response, data)
+    return data
+
+
+# function to cache an object just written, if it will be read back
+def write_through(bucket_name: str, object_name: str, response, data: bytes):
+    """
+    Caches a put_object response like remember_object, for the objects in
+    WRITE_THROUGH_SUFFIXES only.
+    """
+    if object_name.endswith(WRITE_THROUGH_SUFFIXES):
+        remember_object(bucket_name, object_name, response, data)
+
+
+# function to cache what was just written
+def remember_object(bucket_name: str, object_name: str, response, data: bytes):
+    """
+    Caches an object's bytes under the ETag of a get_object/put_object response,
+    so a write followed by a read of the same key costs a 304 instead of a download.
+    Responses without an ETag are ignored.
+    """
+    cache = get_object_cache()
+    etag = response.get("ETag") if isinstance(response, dict) else None
+    if cache is not None and isinstance(etag, str):
+        cache.put(bucket_name, object_name, etag, bytes(data))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,364 @@
+# importing libraries/modules
+import io
+import re
+import json
+import uuid
+import hashlib
+import pandas as pd
+from botocore.exceptions import ClientError
+from pipeline.storage import update_object
+from config import S3_BUCKET_SILVER
+from utils.logger import get_logger
+
+# initialize logger
+logger = get_logger(__name__)
+
+# hive style daily partitions e.g "year=2000/month=01/day=31"
+PARTITION_FORMAT = "year=%Y/month=%m/day=%d"
+DAY_PARTITION = re.compile(r"^year=(\d{4})/month=(\d{2})/day=(\d{2})$")
+
+# monthly partitions of compacted files e.g "year=2000/month=01"
+MONTH_FORMAT = "year=%Y/month=%m"
+MONTH_PARTITION = re.compile(r"^year=(\d{4})/month=(\d{2})$")
+
+# monthly partition files written before the manifest existed e.g "ratings/2000-01.csv"
+LEGACY_KEY = re.compile(r"^[^/]+/(\d{4}-\d{2})\.csv$")
+
+
+# function to name a dataset's manifest
+def manifest_key(dataset: str) -> str:
+    """
+    Returns the key of a dataset's manifest e.g "ratings/_manifest.json".
+    """
+    return f"{dataset}/_manifest.json"
+
+
+# function to create a run id
+def new_run_id() -> str:
+    """
+    Returns a unique, time ordered id for the part files written by one run.
+    """
+    now = pd.Timestamp.now(tz="UTC").strftime("%Y%m%dT%H%M%S")
+    return f"{now}-{uuid.uuid4().hex[:8]}"
+
+
+# function to name the daily partition of every timestamp
+def day_partitions(timestamps: pd.Series) -> pd.Series:
+    """
+    Returns the daily partition of each timestamp e.g "year=2000/month=01/day=31".
+    """
+    return timestamps.dt.strftime(PARTITION_FORMAT)
+
+
+# function to get the time range a partition covers
+def partition_bounds(partition: str) -> tuple:
+    """
+    Returns the [start, end) range of a daily, monthly or legacy monthly partition
+    as naive UTC timestamps.
+    """
+    match = DAY_PARTITION.match(partition)
+    if match:
+        start = pd.Timestamp(*map(int, match.groups()))
+        return start, start + pd.Timedelta(days=1)
+    match = MONTH_PARTITION.match(partition)
+    if match:
+        start = pd.Timestamp(*map(int, match.groups()), 1)
+    else:
+        start = pd.Timestamp(f"{partition}-01")
+    return start, start + pd.DateOffset(months=1)
+
+
+# function to name the month a partition falls in
+def month_partition(partition: str) -> str:
+    """
+    Returns the monthly partition holding a daily, monthly or legacy monthly
+    partition e.g "year=2000/month=01/day=31" -> "year=2000/month=01".
+    """
+    return partition_bounds(partition)[0].strftime(MONTH_FORMAT)
+
+
+# function to name a part file
+def part_key(dataset: str, partition: str, run_id: str, extension="csv") -> str:
+    """
+    Returns the key of an immutable part file
+    e.g "ratings/year=2000/month=01/day=31/part-<run_id>.csv".
+    """
+    return f"{dataset}/{partition}/part-{run_id}.{extension}"
+
+
+# function to read a dataset manifest
+def read_manifest(storage, dataset: str) -> dict:
+    """
+    Reads the manifest listing every committed part file of a dataset.
+
+    Parameters:
+        storage: storage backend
+        dataset (str): dataset name e.g "ratings"
+
+    Returns:
+        dict: {"dataset", "version", "updated_at", "files": [file entries]}.
+        An empty manifest if none exists yet.
+    """
+    try:
+        data = storage.get(S3_BUCKET_SILVER, manifest_key(dataset))
+        manifest = json.loads(data)
+        logger.info(
+            f"Read {dataset} manifest v{manifest['version']} with {len(manifest['files'])} files."
+        )
+        return manifest
+
+    except ClientError as e:
+        logger.warning(f"No {dataset} manifest found. Initializing one. Details: {e}")
+        return empty_manifest(dataset)
+
+
+# function to create an empty manifest
+def empty_manifest(dataset: str) -> dict:
+    """
+    Returns the manifest of a dataset with no committed files.
+    """
+    return {"dataset": dataset, "version": 0, "updated_at": None, "files": []}
+
+
+# function to commit a dataset manifest
+def write_manifest(storage, manifest: dict):
+    """
+    Writes a dataset manifest. This is the commit point of a run: part files that
+    are not listed in the manifest are invisible to readers.
+    The write is unconditional: use update_manifest when other runs may commit.
+    """
+    manifest["version"] += 1
+    manifest["updated_at"] = pd.Timestamp.now(tz="UTC").isoformat()
+    storage.put(
+        S3_BUCKET_SILVER,
+        manifest_key(manifest["dataset"]),
+        json.dumps(manifest, indent=2, default=str).encode("utf-8"),
+        content_type="application/json",
+    )
+    logger.info(
+        f"Committed {manifest['dataset']} manifest v{manifest['version']} with {len(manifest['files'])} files."
+    )
+
+
+# function to commit a change to the latest dataset manifest
+def update_manifest(storage, dataset: str, change) -> dict:
+    """
+    Applies a change to the latest manifest of a dataset and commits it with a
+    conditional write. If another run committed in between, the manifest is read
+    again and the change re-applied, so neither run's files are lost.
+
+    Parameters:
+        storage: storage backend
+        dataset (str): dataset name e.g "ratings"
+        change (callable): edits a manifest in place. it may run several times.
+
+    Returns:
+        dict: the committed manifest
+    """
+
+    def apply(data):
+        manifest = json.loads(data) if data is not None else empty_manifest(dataset)
+        change(manifest)
+        manifest["version"] += 1
+        manifest["updated_at"] = pd.Timestamp.now(tz="UTC").isoformat()
+        return json.dumps(manifest, indent=2, default=str).encode("utf-8")
+
+    manifest = json.loads(
+        update_object(storage, S3_BUCKET_SILVER, manifest_key(dataset), apply)
+    )
+    logger.info(
+        f"Committed {dataset} manifest v{manifest['version']} with {len(manifest['files'])} files."
+    )
+    return manifest
+
+
+# function to write one immutable part file
+def write_part(
+    storage,
+    df: pd.DataFrame,
+    dataset: str,
+    partition: str,
+    run_id: str,
+    time_column: str = "timestamp",
+    file_format: str = "csv",
+    compression: str = "zstd",
+) -> dict:
+    """
+    Writes a dataframe as a new part file of a partition. Existing files are never
+    read or rewritten, so the cost of a write is proportional to the new rows only.
+
+    Parameters:
+        storage: storage backend
+        df (pd.DataFrame): rows of the partition written by this run
+        dataset (str): dataset name e.g "ratings"
+        partition (str): partition name e.g "2000-01"
+        run_id (str): id of the run, see new_run_id()
+        time_column (str): column whose range is recorded in the manifest
+        file_format (str): "csv" or "parquet"
+        compression (str): parquet compression codec
+
+    Returns:
+        dict: manifest entry of the file (key, partition, rows, bytes, time range, checksum)
+    """
+    key = part_key(dataset, partition, run_id, extension=file_format)
+    if file_format == "parquet":
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False, compression=compression)
+        body = buffer.getvalue()
+    else:
+        body = df.to_csv(index=False).encode("utf-8")
+    storage.put(S3_BUCKET_SILVER, key, body, content_type=f"application/{file_format}")
+
+    entry = {
+        "key": key,
+        "partition": partition,
+        "format": file_format,
+        "rows": int(df.shape[0]),
+        "bytes": len(body),
+        "min_timestamp": None,
+        "max_timestamp": None,
+        "sha256": hashlib.sha256(body).hexdigest(),
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+    }
+    if time_column in df.columns and not df.empty:
+        entry["min_timestamp"] = str(df[time_column].min())
+        entry["max_timestamp"] = str(df[time_column].max())
+
+    logger.info(f"Wrote {entry['rows']} records to {key}")
+    return entry
+
+
+# function to list a partition's committed files
+def partition_files(manifest: dict, partition: str) -> list:
+    """
+    Returns the keys of the committed files of one partition, oldest first.
+    """
+    return [f["key"] for f in manifest["files"] if f["partition"] == partition]
+
+
+# function to make a timestamp comparable with manifest statistics
+def as_naive_utc(timestamp) -> pd.Timestamp:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp
+
+
+# function to plan the files a time range needs
+def plan_files(manifest: dict, start=None, end=None) -> list:
+    """
+    Picks the committed files holding rows in [start, end) from the per-file time
+    statistics of the manifest, so readers fetch exactly those files: no guessed
+    keys, no failed GETs. Files without statistics (legacy monthly files) are
+    planned from the range of their partition.
+
+    Parameters:
+        manifest (dict): dataset manifest, see read_manifest()
+        start: inclusive lower bound. None for no bound.
+        end: exclusive upper bound. None for no bound.
+
+    Returns:
+        list: keys of the files to read, oldest first
+    """
+    start = None if start is None else as_naive_utc(start)
+    end = None if end is None else as_naive_utc(end)
+
+    keys = []
+    for entry in manifest["files"]:
+        if entry.get("min_timestamp") is not None:
+            low = pd.Timestamp(entry["min_timestamp"])
+            high = pd.Timestamp(entry["max_timestamp"])
+        elif entry.get("rows") == 0:
+            continue
+        else:
+            low, high = partition_bounds(entry["partition"])
+            high -= pd.Timedelta(1, "ns")
+
+        if (start is None or high >= start) and (end is None or low < end):
+            keys.append(entry["key"])
+    return keys
+
+
+# function to find pre-manifest partition files
+def legacy_files(storage, manifest: dict) -> list:
+    """
+    Lists the legacy monthly files of a dataset (e.g "ratings/2000-01.csv",
+    written before the manifest existed) that the manifest does not list yet.
+    They sit at the top of the dataset, so only that level is listed, and not
+    at all once the manifest records they were adopted.
+
+    Returns:
+        list: manifest entries of those files, flagged "legacy"
+    """
+    if manifest.get("legacy_adopted"):
+        return []
+
+    listed = {f["key"] for f in manifest["files"]}
+    entries = []
+    for key in storage.list(S3_BUCKET_SILVER, f"{manifest['dataset']}/", delimiter="/"):
+        match = LEGACY_KEY.match(key)
+        if match and key not in listed:
+            entries.append(
+                {
+                    "key": key,
+                    "partition": match.group(1),
+                    "format": "csv",
+                    "rows": None,
+                    "bytes": storage.head(S3_BUCKET_SILVER, key)["ContentLength"],
+                    "legacy": True,
+                }
+            )
+    return entries
+
+
+# function to register pre-manifest partition files
+def adopt_legacy_files(storage, manifest: dict) -> int:
+    """
+    Adds the legacy monthly files of a dataset to its manifest, so they stay
+    visible to readers that plan from the manifest only. The manifest records the
+    adoption, so once committed the dataset is never listed for them again.
+
+    Returns:
+        int: number of files adopted
+    """
+    entries = legacy_files(storage, manifest)
+    manifest["files"].extend(entries)
+    manifest["legacy_adopted"] = True
+    for entry in entries:
+        logger.info(f"Adopted legacy partition file {entry['key']} into the manifest.")
+    return len(entries)
+
+
+# function to replace files in the manifest in one commit
+def replace_files(storage, dataset: str, removed: list, added: list) -> dict:
+    """
+    Swaps manifest entries in a single manifest write: readers see either every
+    removed file or every added one, never a mix.
+    The swap is applied to the latest manifest so parts appended meanwhile are kept.
+    Added files take the place of the first removed one, so those parts stay
+    listed after them and their rows still win over the replaced ones.
+
+    Parameters:
+        storage: storage backend
+        dataset (str): dataset name e.g "ratings"
+        removed (list): keys of the files being replaced
+        added (list): manifest entries of the replacement files
+
+    Returns:
+        dict: the committed manifest
+    """
+    removed = set(removed)
+
+    def swap(manifest):
+        files = manifest["files"]
+        position = next(
+            (i for i, f in enumerate(files) if f["key"] in removed), len(files)
+        )
+        rest = [f for f in files[position:] if f["key"] not in removed]
+        manifest["files"] = files[:position] + list(added) + rest
+
+    return update_manifest(storage, dataset, swap)
+
+
+if __name__ == "__main__":
+    pass
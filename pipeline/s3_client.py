@@ -1,19 +1,81 @@
+import io
+import os
+import threading
 import boto3
-import pandas as pd
+import botocore
 from io import BytesIO
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
+from config import S3_BUCKET_BRONZE, S3_CLIENT_CONFIG
+from pipeline.schemas import read_object
+from pipeline.object_cache import get_object_bytes
 from utils.logger import get_logger
 
 # Initialize Logger
 logger = get_logger(__name__)
 
 _client = None  # Global cache. everytime below is called, check if one already exists
+# guards creation when pool workers ask at the same time
+_client_lock = threading.Lock()
+
+
+def get_client_config() -> Config:
+    """
+    Builds the botocore configuration of the S3 client from config.S3_CLIENT_CONFIG.
+    """
+    return Config(
+        region_name=AWS_REGION,
+        max_pool_connections=S3_CLIENT_CONFIG["max_pool_connections"],
+        retries={
+            "mode": S3_CLIENT_CONFIG["retry_mode"],
+            "total_max_attempts": S3_CLIENT_CONFIG["max_attempts"],
+        },
+        tcp_keepalive=S3_CLIENT_CONFIG["tcp_keepalive"],
+        connect_timeout=S3_CLIENT_CONFIG["connect_timeout"],
+        read_timeout=S3_CLIENT_CONFIG["read_timeout"],
+    )
+
+
+def check_conditional_writes(client):
+    """
+    Fails fast if the installed botocore cannot send conditional PutObject requests
+    (IfMatch / IfNoneMatch). Watermark, manifest and dimension hash writes rely on
+    them, and older releases reject the parameters on every such write.
+    """
+    members = client.meta.service_model.operation_model("PutObject").input_shape.members
+    missing = [name for name in ("IfMatch", "IfNoneMatch") if name not in members]
+    if missing:
+        raise RuntimeError(
+            f"botocore {botocore.__version__} does not support conditional S3 writes "
+            f"(PutObject {', '.join(missing)}). Install boto3>=1.36.0, see requirements.txt."
+        )
+
+
+def create_s3_client():
+    """
+    Create a new, tuned boto3 S3 client on its own session.
+    Sessions are not thread-safe, so each client gets a private one.
+    """
+    session = boto3.session.Session()
+    client = session.client(
+        "s3",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION,
+        config=get_client_config(),
+    )
+    check_conditional_writes(client)
+    return client
 
 
 def initialize_s3_client():
     """
-    Initialize and return a boto3 S3 client instance.
+    Initialize and return the process-wide boto3 S3 client instance.
+
+    The client is created once, under a lock, and can then be shared by every thread
+    of a pool: boto3 clients are thread-safe and the connection pool is sized by
+    S3_CLIENT_CONFIG["max_pool_connections"].
     """
     global _client
 
@@ -21,22 +83,34 @@ def initialize_s3_client():
         # Already initialized — reuse existing client
         return _client
 
-    try:
-        _client = boto3.client(
-            "s3",
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION,
-        )
-        logger.info("Successfully initialized S3 client.")
-        return _client
+    with _client_lock:
+        if _client is not None:
+            return _client
 
-    except ClientError as e:
-        logger.error(f"AWS ClientError during S3 initialization: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Failed to initialize S3 client: {str(e)}")
-        raise
+        try:
+            _client = create_s3_client()
+            logger.info("Successfully initialized S3 client.")
+            return _client
+
+        except ClientError as e:
+            logger.error(f"AWS ClientError during S3 initialization: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to initialize S3 client: {str(e)}")
+            raise
+
+
+def _reset_client():
+    """
+    Drops the cached client in a forked child. A client's connection pool must not
+    be shared across processes, so process-pool workers build their own.
+    """
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client)
 
 
 def create_bucket_if_not_exists(client, bucket_name):
@@ -90,19 +164,20 @@ def download_file(client, bucket_name, object_name, file_path):
         raise
 
 
-def read_file(client, bucket_name, object_name):
+def read_file(client, bucket_name, object_name, columns=None):
     """
     Read a file (CSV/Parquet) from S3 bucket into a DataFrame.
+
+    This is the one reader shared by every layer. Bytes go through the object cache,
+    so a re-read of an unchanged object is a 304 or a local hit instead of a download.
     """
     try:
-        response = client.get_object(Bucket=bucket_name, Key=object_name)
+        data = get_object_bytes(client, bucket_name, object_name)
         logger.info(f"Reading file '{object_name}' from bucket '{bucket_name}'.")
 
-        # Guess file type from extension
-        if object_name.endswith(".parquet"):
-            df = pd.read_parquet(BytesIO(response["Body"].read()))
-        else:
-            df = pd.read_csv(BytesIO(response["Body"].read()))
+        # file type is guessed from the extension
+        layer = "bronze" if bucket_name == S3_BUCKET_BRONZE else "silver"
+        df = read_object(BytesIO(data), object_name, layer, columns)
 
         logger.info(f"File '{object_name}' successfully read into DataFrame.")
         return df
@@ -112,6 +187,126 @@ def read_file(client, bucket_name, object_name):
         raise
 
 
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects non-final parts smaller than 5 MiB
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """
+    Writable file-like object that streams its content to S3 as a multipart upload.
+
+    Bytes are buffered until a part is full, so memory stays bounded by the part size.
+    Objects smaller than one part are sent with a single put_object call.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket_name,
+        object_name,
+        part_size=MIN_PART_SIZE,
+        content_type="application/csv",
+    ):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.content_type = content_type
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._aborted = False
+        self.etag = None  # ETag of the committed object
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.bytes_written
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed MultipartUploadWriter")
+        self._buffer += data
+        self.bytes_written += len(data)
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def _upload_part(self):
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.object_name,
+                ContentType=self.content_type,
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.object_name,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=bytes(self._buffer),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer = bytearray()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                if self._upload_id is None:
+                    # small object: one request is cheaper than a multipart upload
+                    response = self.client.put_object(
+                        Bucket=self.bucket_name,
+                        Key=self.object_name,
+                        Body=bytes(self._buffer),
+                        ContentType=self.content_type,
+                    )
+                else:
+                    if self._buffer:
+                        self._upload_part()
+                    response = self.client.complete_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=self.object_name,
+                        UploadId=self._upload_id,
+                        MultipartUpload={"Parts": self._parts},
+                    )
+                self.etag = response.get("ETag")
+                logger.info(
+                    f"Streamed {self.bytes_written} bytes to '{self.object_name}' in bucket '{self.bucket_name}'."
+                )
+        finally:
+            self._buffer = bytearray()
+            super().close()
+
+    def abort(self):
+        """
+        Discards the upload so no partial object or orphaned parts are left behind.
+        """
+        self._aborted = True
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.object_name,
+                    UploadId=self._upload_id,
+                )
+            except ClientError as e:
+                logger.error(f"Abort multipart upload error: {str(e)}")
+        self.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+
 if __name__ == "__main__":
     # Only runs if you execute s3_client.py directly
     initialize_s3_client
@@ -1,31 +1,80 @@
+import io
+import os
+import time
 import logging
+import threading
 import pandas as pd
-from config import POSTGRES_CONFIG
+from config import POSTGRES_CONFIG, POSTGRES_LOAD_CONFIG
 from sqlalchemy import create_engine, text
+from pipeline.s_gold.sql.schema import read_watermark, advance_watermark
 
 # initializing logger
 logger = logging.getLogger(__name__)
 
+_engines = {}  # process-wide engines by database URL, each with its connection pool
+# guards creation when threads ask at the same time
+_engines_lock = threading.Lock()
+
+
+# function to drop the engines inherited from a parent process
+def _reset_engines():
+    # a forked child must not reuse its parent's pooled connections, nor a lock
+    # another parent thread held at fork time
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+os.register_at_fork(after_in_child=_reset_engines)
+
 
 # function to connect to database
 def get_db_connection():
     """
-    Establishes a SQLAlchemy engine connection to a PostgreSQL database using credentials from config.
+    Returns the process-wide SQLAlchemy engine of the PostgreSQL database in config.
+
+    The engine is created once, under a lock, and its connection pool is then shared
+    by every statement of the process. Pool size, pre-ping, recycling and timeouts
+    come from POSTGRES_CONFIG.
 
     Returns:
         sqlalchemy.engine.Engine: a SQLAlchemy engine instance connected to the specified database.
     """
-    try:
-        engine = create_engine(
-            f"postgresql+psycopg2://{POSTGRES_CONFIG['user']}:{POSTGRES_CONFIG['password']}@"
-            f"{POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
-        )
-        logger.info("Successfully connected to Postgres.")
+    url = (
+        f"postgresql+psycopg2://{POSTGRES_CONFIG['user']}:{POSTGRES_CONFIG['password']}@"
+        f"{POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
+    )
+    engine = _engines.get(url)
+    if engine is not None:
         return engine
 
-    except Exception as e:
-        logger.error(f"PostgreSQL connection error: {str(e)}")
-        raise
+    with _engines_lock:
+        if url in _engines:
+            return _engines[url]
+
+        try:
+            connect_args = {"connect_timeout": POSTGRES_CONFIG["connect_timeout"]}
+            if POSTGRES_CONFIG["statement_timeout_ms"] > 0:
+                connect_args["options"] = (
+                    f"-c statement_timeout={POSTGRES_CONFIG['statement_timeout_ms']}"
+                )
+            engine = create_engine(
+                url,
+                pool_size=POSTGRES_CONFIG["pool_size"],
+                max_overflow=POSTGRES_CONFIG["max_overflow"],
+                pool_pre_ping=POSTGRES_CONFIG["pool_pre_ping"],
+                pool_recycle=POSTGRES_CONFIG["pool_recycle"],
+                connect_args=connect_args,
+            )
+            _engines[url] = engine
+            logger.info("Successfully connected to Postgres.")
+            return engine
+
+        except Exception as e:
+            logger.error(f"PostgreSQL connection error: {str(e)}")
+            raise
 
 
 # function to create table
@@ -50,13 +99,72 @@ def execute_sql(sql: str, text_name: str):
         raise
 
 
+class CSVStream(io.RawIOBase):
+    """
+    Readable file of a DataFrame as header-less CSV, rendered a chunk of rows at a
+    time as COPY reads it, so the whole CSV is never held in memory.
+    """
+
+    def __init__(self, df: pd.DataFrame, chunk_rows: int):
+        self.df = df
+        self.chunk_rows = chunk_rows
+        self._next_row = 0
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and self._next_row < len(self.df):
+            chunk = self.df.iloc[self._next_row : self._next_row + self.chunk_rows]
+            self._buffer = memoryview(
+                chunk.to_csv(index=False, header=False).encode("utf-8")
+            )
+            self._next_row += self.chunk_rows
+        n = min(len(buffer), len(self._buffer))
+        buffer[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+# function to bulk load a dataframe with COPY
+def copy_to_postgres(df: pd.DataFrame, table_name: str, schema: str = "stg"):
+    """
+    Appends a DataFrame to a PostgreSQL table with COPY ... FROM STDIN (CSV),
+    streamed in chunks of POSTGRES_LOAD_CONFIG["copy_chunk_rows"] rows.
+    The rows are committed together, or not at all.
+
+    Parameters:
+        df (pd.DataFrame): the DataFrame to be written. its columns name the table's.
+        table_name (str): target table name in the database.
+        schema (str): schema to insert into. default is staging.
+    """
+    columns = ", ".join(f'"{column}"' for column in df.columns)
+    sql = f"COPY {schema}.{table_name} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    engine = get_db_connection()
+    conn = engine.raw_connection()  # the psycopg2 connection, for copy_expert
+    try:
+        with conn.cursor() as cursor:
+            cursor.copy_expert(
+                sql, CSVStream(df, POSTGRES_LOAD_CONFIG["copy_chunk_rows"])
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 # function to upload to postgres
 def write_to_postgres(
     df: pd.DataFrame, table_name: str, mode: str = "append", schema: str = "stg"
 ):
     # append but table is always truncated so its clean. "replace" and to_sql cause type issues
     """
-    Writes a pandas DataFrame to a PostgreSQL table.
+    Writes a pandas DataFrame to a PostgreSQL table. Appends are bulk loaded with
+    COPY when POSTGRES_LOAD_CONFIG["method"] is "copy", falling back to to_sql.
 
     Parameters:
         df (pd.DataFrame): the DataFrame to be written.
@@ -66,6 +174,22 @@ def write_to_postgres(
     """
 
     logger.info(f"Writing {df.shape[0]} {table_name} records to Postgres..")
+    started = time.perf_counter()
+
+    # COPY only appends: the other modes go through to_sql
+    if POSTGRES_LOAD_CONFIG["method"] == "copy" and mode == "append":
+        try:
+            copy_to_postgres(df, table_name, schema)
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            logger.info(
+                f"Copied {len(df)} records into {table_name} in {elapsed:.2f}s ({len(df) / elapsed:,.0f} rows/s)."
+            )
+            return
+        except Exception as e:
+            logger.warning(
+                f"COPY into {table_name} failed, falling back to to_sql: {str(e)}"
+            )
+            started = time.perf_counter()
 
     try:
         engine = get_db_connection()
@@ -80,11 +204,66 @@ def write_to_postgres(
             chunksize=1000,
         )
 
-        logger.info(f"Successfully inserted {len(df)} records into {table_name}.")
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        logger.info(
+            f"Successfully inserted {len(df)} records into {table_name} in {elapsed:.2f}s ({len(df) / elapsed:,.0f} rows/s)."
+        )
     except Exception as e:
         logger.exception(f"Error during df.to_sql for {table_name}: {str(e)}")
         raise
 
 
+# function to read a watermark committed in postgres
+def read_db_watermark(dataset: str):
+    """
+    Reads a dataset's watermark from prod.pipeline_watermarks.
+
+    Parameters:
+        dataset (str): dataset name e.g "ratings"
+
+    Returns:
+        pd.Timestamp: the committed watermark, or None if the dataset has none yet
+    """
+    engine = get_db_connection()
+    with engine.connect() as conn:  # a pooled connection, returned on exit
+        value = conn.execute(text(read_watermark), {"dataset_name": dataset}).scalar()
+    return None if value is None else pd.Timestamp(value)
+
+
+# function to run sql and advance a watermark in one transaction
+def execute_with_watermark(sql: str, text_name: str, watermark: dict):
+    """
+    Executes SQL and advances a watermark in prod.pipeline_watermarks in the same
+    transaction: either both are committed or neither is.
+
+    Parameters:
+        sql (str): SQL statement e.g an upsert
+        text_name (str): name of the statement, for logs
+        watermark (dict): {"dataset_name", "max_value", "records_loaded", "processing_time"}
+    """
+    try:
+        engine = get_db_connection()
+        with engine.begin() as conn:
+            conn.execute(text(sql))
+            conn.execute(
+                text(advance_watermark),
+                {
+                    "dataset_name": watermark["dataset_name"],
+                    "max_value": pd.Timestamp(watermark["max_value"]).to_pydatetime(),
+                    "records_loaded": int(watermark["records_loaded"]),
+                    "processing_time": pd.Timestamp(
+                        watermark["processing_time"]
+                    ).to_pydatetime(),
+                },
+            )
+        logger.info(
+            f"Committed '{text_name}' with the {watermark['dataset_name']} watermark."
+        )
+
+    except Exception as e:
+        logger.error(f"Error executing '{text_name}': {str(e)}")
+        raise
+
+
 if __name__ == "__main__":
     pass
@@ -2,14 +2,29 @@ import pandas as pd
 from io import BytesIO
 from sqlalchemy import text
 from utils.logger import get_logger
-from pipeline.s_gold.read_bucket import read_silver_file
-from pipeline.s_gold.connection import write_to_postgres, get_db_connection, execute_sql
+from pipeline.s_gold.read_bucket import (
+    read_silver_file,
+    read_silver_manifest,
+    read_gold_hashes,
+    write_gold_hashes,
+)
+from pipeline.partitions import plan_files
+from pipeline.key_index import RATINGS_KEY
+from pipeline.dimensions import HASH_COLUMN, changed_rows
+from pipeline.s_gold.connection import (
+    write_to_postgres,
+    get_db_connection,
+    execute_sql,
+    read_db_watermark,
+    execute_with_watermark,
+)
 from pipeline.s_gold.silver_watermarks import (
-    read_silver_watermarks,
+    silver_watermark_store,
     update_silver_watermarks,
 )
 from pipeline.s_gold.sql.schema import *
 from pipeline.s_gold.sql.ratings_partition import partition_functions
+from config import GOLD_CONFIG
 
 
 # initialize Logger
@@ -39,6 +54,8 @@ def check_tables():
             "stg_ratings": staging_ratings_sql,
             "ratings": ratings_sql,
         }
+        if GOLD_CONFIG["db_watermarks"]:
+            table_dict["pipeline_watermarks"] = pipeline_watermarks_sql
 
         for table_name, sql_str in table_dict.items():
             execute_sql(sql_str, table_name)
@@ -54,6 +71,21 @@ def check_tables():
         logger.error(f"{str(e)}", exc_info=True)
 
 
+# function to keep the dimension rows that changed since the last load
+def rows_to_stage(df: pd.DataFrame, dataset: str) -> pd.DataFrame:
+    """
+    Returns the rows of a silver dimension to stage: only those new or changed since
+    the last gold load (by row hash), or every row of files written without hashes.
+    """
+    if HASH_COLUMN not in df.columns:
+        return df
+    changed = changed_rows(df, read_gold_hashes(dataset), dataset)
+    logger.info(
+        f"{changed.shape[0]} of {df.shape[0]} {dataset} records changed since the last load."
+    )
+    return changed.drop(columns=HASH_COLUMN)
+
+
 # function to load movie df
 def load_movie_df():
     """
@@ -72,9 +104,15 @@ def load_movie_df():
         df["release_date"], errors="coerce"
     ).dt.tz_localize(None)
 
+    # stage only the changed movies, none if silver did not change
+    staged = rows_to_stage(df, "movies")
+    if staged.empty:
+        logger.info("No changed movies to load. End")
+        return
+
     # upload to staging
     try:
-        write_to_postgres(df, "stg_movies")
+        write_to_postgres(staged, "stg_movies")
     except Exception as e:
         logger.error(f"Write to stg_movies failed: {str(e)}")
         raise
@@ -94,13 +132,17 @@ def load_movie_df():
         logger.error(f"Upsert failed: {str(e)}", exc_info=True)
         raise
 
+    # what gold holds now, so the next load only stages what changes
+    if HASH_COLUMN in df.columns:
+        write_gold_hashes("movies", df)
+
     # update the watermark with the latest processing record
     if not df.empty:
         latest_max_value = df["release_date"].max()
         data = {
             "dataset_name": "movies",
             "max_value": latest_max_value,
-            "records_loaded": df.shape[0],
+            "records_loaded": staged.shape[0],
             "processing_time": pd.Timestamp.now(),
         }
 
@@ -127,35 +169,28 @@ def load_ratings_df(pipeline_start, **kwargs: dict):
 
     # determine read scope
     if int_end <= pipeline_start:
-        start_month = (pipeline_start - pd.DateOffset(months=2)).replace(
-            day=1
-        )  # first day of that month
-        end_month = pipeline_start
+        # initial load: the whole history up to pipeline_start, every daily partition
+        start = None
+        end = pipeline_start + pd.Timedelta(1, "ns")  # up to pipeline_start inclusive
     else:
-        start_month = int_start
-        end_month = int_end
-
-    target_months = sorted(
-        set(
-            pd.date_range(start=start_month, end=end_month, freq="MS").strftime("%Y-%m")
-        )
+        start = int_start
+        end = int_end  # the window end is exclusive
+
+    # plan the files holding rows in the read scope from the manifest statistics
+    manifest = read_silver_manifest("ratings")
+    paths = plan_files(manifest, start, end)
+    logger.info(
+        f"Planned {len(paths)} of {len(manifest['files'])} ratings files to read."
     )
-    logger.info(f"Target parttitions to read: {target_months}")
 
-    # read monthly partitions
     dfs = []
-    for month in target_months:
-        path = f"ratings/{month}.csv"
+    for path in paths:
         try:
-            df_month = read_silver_file(path)
-            dfs.append(df_month)
+            dfs.append(read_silver_file(path))
         except Exception as e:
-            if "NoSuchKey" in str(e):
-                logger.warning(f"Partition {path} not found. Skipping.")
-                continue
-            else:
-                logger.error(f"Unexpected error reading {path}: {e}")
-                raise
+            # committed files always exist: a failure here is a real error
+            logger.error(f"Unexpected error reading {path}: {e}")
+            raise
 
     if not dfs:
         logger.warning("No ratings data found in selected partitions. Skipping load.")
@@ -184,21 +219,25 @@ def load_ratings_df(pipeline_start, **kwargs: dict):
     # remove timezone for watermark compatibility
     df["timestamp"] = df["timestamp"].dt.tz_localize(None)
 
-    # incremental filter based on watermark
-    watermarks = read_silver_watermarks()
-
-    if not watermarks.empty:
-        logger.info("Applying watermark filter for ratings..")
+    # incremental filter based on the watermark committed with the last upsert
+    if GOLD_CONFIG["db_watermarks"]:
+        latest_watermark = read_db_watermark("ratings")
+        if latest_watermark is not None:
+            df = df[df["timestamp"] > latest_watermark]
+            logger.info(
+                f"Filtered ratings to {df.shape[0]} new records after watermark {latest_watermark}."
+            )
+        else:
+            logger.warning(
+                "No committed watermark for ratings. Proceeding without filter."
+            )
 
-        # Filter only 'ratings' dataset
-        ratings_watermark = watermarks[watermarks["dataset_name"] == "ratings"]
+    else:
+        # incremental filter based on the ratings watermark in the silver bucket
+        watermark = silver_watermark_store().get("ratings")
+        latest_watermark = None if watermark is None else watermark.timestamp
 
-        if not ratings_watermark.empty:
-            # Safely convert to datetime
-            ratings_watermark["max_value"] = pd.to_datetime(
-                ratings_watermark["max_value"], errors="coerce"
-            )
-            latest_watermark = ratings_watermark["max_value"].max()
+        if latest_watermark is not None and not pd.isna(latest_watermark):
             df = df[df["timestamp"] > latest_watermark]
             logger.info(
                 f"Filtered ratings to {df.shape[0]} new records after watermark {latest_watermark}."
@@ -207,18 +246,19 @@ def load_ratings_df(pipeline_start, **kwargs: dict):
             logger.warning(
                 "No valid/existing watermark for ratings. Proceeding without filter."
             )
-    else:
-        logger.warning("No watermark file found. Proceeding without filter.")
 
     if df.empty:
         logger.warning("No new ratings data to upload after watermark filtering. End")
         return
 
-    # drop duplicates
-    df = df.drop_duplicates()
+    # one row per natural key (the upsert's conflict target), the latest part wins
+    df = df.drop_duplicates(subset=RATINGS_KEY, keep="last")
 
     # upload to staging table
     try:
+        if GOLD_CONFIG["db_watermarks"]:
+            # leftovers of a failed run must not be upserted with this one
+            execute_sql(clear_staging_ratings, "clear stg_ratings")
         write_to_postgres(df, "stg_ratings")
     except Exception as e:
         logger.error(f"Write to stg_ratings failed: {str(e)}")
@@ -231,9 +271,21 @@ def load_ratings_df(pipeline_start, **kwargs: dict):
     except Exception as e:
         logger.error(f"Partition creation failed: {str(e)}", exc_info=True)
 
+    # the watermark of this load
+    data = {
+        "dataset_name": "ratings",
+        "max_value": df["timestamp"].max(),
+        "records_loaded": df.shape[0],
+        "processing_time": pd.Timestamp.now(),
+    }
+
     # upsert into gold
     try:
-        execute_sql(upsert_ratings, "upsert ratings")
+        if GOLD_CONFIG["db_watermarks"]:
+            # the upsert and the watermark commit together, or not at all
+            execute_with_watermark(upsert_ratings, "upsert ratings", data)
+        else:
+            execute_sql(upsert_ratings, "upsert ratings")
         logger.info("Ratings upsert complete. New records successfully loaded.")
 
     except Exception as e:
@@ -241,15 +293,13 @@ def load_ratings_df(pipeline_start, **kwargs: dict):
         raise
 
     # update the watermark with the new details
-    if not df.empty:
-        latest_max_value = df["timestamp"].max()
-        data = {
-            "dataset_name": "ratings",
-            "max_value": latest_max_value,
-            "records_loaded": df.shape[0],
-            "processing_time": pd.Timestamp.now(),
-        }
-
+    if GOLD_CONFIG["db_watermarks"]:
+        # a copy for readers of the bucket; postgres holds the committed one
+        try:
+            update_silver_watermarks(data)
+        except Exception as e:
+            logger.warning(f"Could not mirror the ratings watermark to S3: {e}")
+    else:
         update_silver_watermarks(data)
 
 
@@ -264,9 +314,15 @@ def load_users_df():
 
     logger.info("Starting load for users..")
 
+    # stage only the changed users, none if silver did not change
+    staged = rows_to_stage(df, "users")
+    if staged.empty:
+        logger.info("No changed users to load. End")
+        return
+
     # upload to postgres
     try:
-        write_to_postgres(df, "stg_users")
+        write_to_postgres(staged, "stg_users")
     except Exception as e:
         logger.error(f"Write to stg_users failed: {str(e)}")
         raise
@@ -284,13 +340,17 @@ def load_users_df():
         logger.error(f"CDC upsert failed: {str(e)}", exc_info=True)
         raise
 
+    # what gold holds now, so the next load only stages what changes
+    if HASH_COLUMN in df.columns:
+        write_gold_hashes("users", df)
+
     # update the watermark with the new details
     if not df.empty:
         latest_max_value = df["user_id"].max()
         data = {
             "dataset_name": "users",
             "max_value": latest_max_value,
-            "records_loaded": df.shape[0],
+            "records_loaded": staged.shape[0],
             "processing_time": pd.Timestamp.now(),
         }
 
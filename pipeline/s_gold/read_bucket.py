@@ -1,10 +1,11 @@
 import pandas as pd
-from io import BytesIO
 from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage, read_file
+from pipeline.partitions import read_manifest, legacy_files
+from pipeline.dimensions import read_loaded_hashes, write_loaded_hashes
 from utils.logger import get_logger
 from config import S3_BUCKET_SILVER
 
-
 # initialize Logger
 logger = get_logger(__name__)
 
@@ -21,15 +22,13 @@ def read_silver_file(object_name: str) -> pd.DataFrame:
         pd.DataFrame: a DataFrame containing the contents of the CSV file.
     """
 
-    # initialize s3 Client
-    client = initialize_s3_client()
+    # initialize storage (s3 Client, or a local directory)
+    storage = get_storage(initialize_s3_client)
 
     logger.info(f"Reading {object_name} from {S3_BUCKET_SILVER} bucket.")
 
     try:
-        response = client.get_object(Bucket=S3_BUCKET_SILVER, Key=object_name)
-        data = response["Body"].read()
-        df = pd.read_csv(BytesIO(data))
+        df = read_file(storage, S3_BUCKET_SILVER, object_name)
         logger.info(
             f"Successfully read {object_name} into DataFrame. Shape: {df.shape}"
         )
@@ -40,5 +39,49 @@ def read_silver_file(object_name: str) -> pd.DataFrame:
         raise
 
 
+# function to read a silver dataset manifest
+def read_silver_manifest(dataset: str) -> dict:
+    """
+    Reads the manifest of the part files committed to a Silver dataset.
+    Legacy monthly files not adopted by silver yet are listed alongside.
+
+    Parameters:
+        dataset (str): dataset name e.g "ratings"
+
+    Returns:
+        dict: the manifest. Its "files" list is empty if none exists yet.
+    """
+    storage = get_storage(initialize_s3_client)
+    manifest = read_manifest(storage, dataset)
+    manifest["files"].extend(legacy_files(storage, manifest))
+    return manifest
+
+
+# function to read the row hashes of a dimension last loaded to gold
+def read_gold_hashes(dataset: str) -> pd.DataFrame:
+    """
+    Reads the (key, row_hash) pairs of a dimension as last loaded to gold.
+
+    Parameters:
+        dataset (str): dimension name e.g "movies"
+    """
+    storage = get_storage(initialize_s3_client)
+    return read_loaded_hashes(storage, dataset)
+
+
+# function to record the row hashes of a dimension loaded to gold
+def write_gold_hashes(dataset: str, df: pd.DataFrame):
+    """
+    Records the (key, row_hash) pairs of a dimension just loaded to gold.
+
+    Parameters:
+        dataset (str): dimension name e.g "movies"
+        df (pd.DataFrame): the silver dimension, with its row_hash column
+    """
+    storage = get_storage(initialize_s3_client)
+    write_loaded_hashes(storage, dataset, df)
+    logger.info(f"Recorded the row hashes of {dataset} loaded to gold.")
+
+
 if __name__ == "__main__":
     pass
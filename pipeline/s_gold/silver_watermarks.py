@@ -1,86 +1,52 @@
 import pandas as pd
-from io import BytesIO
 from pipeline.s3_client import initialize_s3_client
-from config import S3_BUCKET_SILVER, WATERMARKS_PATH
+from pipeline.storage import get_storage
+from pipeline.watermark_store import WatermarkStore, WATERMARK_COLUMNS
+from config import S3_BUCKET_SILVER
 from utils.logger import get_logger
-from datetime import datetime
-
 
 # initialize logger
 logger = get_logger(__name__)
 
 
+# function to open the gold watermark store
+def silver_watermark_store() -> WatermarkStore:
+    """
+    Returns the store of the watermarks of gold loads, kept in the Silver bucket.
+    """
+    # initialize s3 Client (or a local directory)
+    return WatermarkStore(get_storage(initialize_s3_client), S3_BUCKET_SILVER)
+
+
 # function to read watermarks
 def read_silver_watermarks():
     """
-    Reads the existing watermarks from S3.
+    Reads the current watermark of every dataset from S3.
 
     Return:
-       dataframe (pd.DataFrame): watermark file content as a dataframe. A structured but empty DataFrame if no watermark file exists.
+       dataframe (pd.DataFrame): one row per dataset. A structured but empty DataFrame if no watermark exists.
     """
-
-    # initialize s3 Client
-    client = initialize_s3_client()
-
     try:
         logger.info("Reading watermarks from s3..")
-        response = client.get_object(Bucket=S3_BUCKET_SILVER, Key=WATERMARKS_PATH)
-        watermarks_df = pd.read_csv(BytesIO(response["Body"].read()))
-        return watermarks_df
+        return silver_watermark_store().frame()
 
     except Exception as e:
         logger.warning(f"Watermarks not found. Initializing One. Details: {e}")
-        columns = ["dataset_name", "max_value", "records_loaded", "processing_time"]
-        return pd.DataFrame(columns=columns)
+        return pd.DataFrame(columns=WATERMARK_COLUMNS)
 
 
 # function to write to watermarks
 def update_silver_watermarks(new_watermark: dict):
     """
-    Updates the watermarks table after an incremental load.
+    Advances a dataset's watermark after an incremental load.
 
     Parameters:
-         new_watermark (dict): {field_name: watermark_value}
+         new_watermark (dict): {"dataset_name", "max_value", "records_loaded", "processing_time"}
     """
-
-    # initialize s3 Client
-    client = initialize_s3_client()
-
     try:
-        # read old watermarks if available
-        try:
-            old_watermarks = read_silver_watermarks()
-        except Exception:
-            logger.warning("No existing watermark file. Creating a new one.")
-            old_watermarks = pd.DataFrame(
-                columns=[
-                    "dataset_name",
-                    "max_value",
-                    "records_loaded",
-                    "processing_time",
-                ]
-            )
-
         logger.info("Updating watermarks in S3...")
-
-        # add the new row
-        new_row = pd.DataFrame([new_watermark])
-        # helps with not appending empty dfs
-        if old_watermarks.empty:
-            updated_watermark = new_row
-        else:
-            updated_watermark = pd.concat([old_watermarks, new_row], ignore_index=True)
-
-        # write back to S3
-        buffer = BytesIO()
-        updated_watermark.to_csv(buffer, index=False)
-        buffer.seek(0)
-
-        client.put_object(
-            Bucket=S3_BUCKET_SILVER,
-            Key=WATERMARKS_PATH,
-            Body=buffer.getvalue(),
-            ContentType="application/csv",
+        silver_watermark_store().advance(
+            new_watermark["dataset_name"], new_watermark["max_value"], new_watermark
         )
         logger.info("Watermarks updated successfully in S3.")
 
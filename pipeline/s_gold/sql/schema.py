@@ -78,6 +78,15 @@ CREATE TABLE IF NOT EXISTS prod.ratings (
 PARTITION BY RANGE (timestamp);
 """
 
+pipeline_watermarks_sql = """
+CREATE TABLE IF NOT EXISTS prod.pipeline_watermarks (
+    dataset_name TEXT PRIMARY KEY,
+    max_value TIMESTAMP NOT NULL,
+    records_loaded INT,
+    processing_time TIMESTAMP
+);
+"""
+
 # upserts
 upsert_movies = """
 -- upsert
@@ -155,6 +164,26 @@ create_ratings_partition = """
 SELECT prod.ensure_partitions_for_staging();
 """
 
+# watermarks committed with the gold upserts
+read_watermark = """
+SELECT max_value FROM prod.pipeline_watermarks WHERE dataset_name = :dataset_name;
+"""
+
+advance_watermark = """
+-- only moves forward, like the watermark store
+INSERT INTO prod.pipeline_watermarks (dataset_name, max_value, records_loaded, processing_time)
+VALUES (:dataset_name, :max_value, :records_loaded, :processing_time)
+ON CONFLICT (dataset_name)
+DO UPDATE SET
+    max_value = GREATEST(prod.pipeline_watermarks.max_value, EXCLUDED.max_value),
+    records_loaded = EXCLUDED.records_loaded,
+    processing_time = EXCLUDED.processing_time;
+"""
+
+clear_staging_ratings = """
+TRUNCATE table stg.stg_ratings;
+"""
+
 # question. to detect changes in SCDs or dimensions generally early on, do you do an upsert before even lifting from the initial database(actual raw before bronze/staging)
 # the reason being. if it isn't a full load everytime for the dimensions
 # you will only append with  watermarkks based on ids that havent beene loaded before
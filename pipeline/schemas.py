@@ -0,0 +1,116 @@
+import pandas as pd
+from config import expected_columns, date_columns
+
+# compact dtypes for every dataset column in config.expected_columns
+# ids use nullable ints so rows with missing ids still parse (they are dropped in silver)
+column_dtypes = {
+    "movies": {
+        "item_id": "Int32",
+        "movie_title": "string",
+        "release_date": "string",
+        "IMDb_URL": "string",
+        "primary_genre": "category",
+    },
+    "ratings": {
+        "user_id": "Int32",
+        "item_id": "Int32",
+        "rating": "float32",
+        "timestamp": "Int64",  # epoch seconds in bronze
+    },
+    "users": {
+        "user_id": "Int32",
+        "age": "Int16",
+        "gender": "category",
+        "occupation": "category",
+        "zip_code": "string",  # keeps leading zeros e.g 02139
+    },
+}
+
+
+# function to get the dtypes of a dataset
+def get_dtypes(dataset: str, layer: str = "bronze") -> dict:
+    """
+    Returns the dtype mapping of a dataset for a given layer.
+
+    Bronze keeps raw column names and epoch timestamps. From silver on, column names
+    are lower case and date columns are datetime strings, so those are left to the
+    transforms to parse.
+
+    Parameters:
+        dataset (str): dataset name e.g "ratings"
+        layer (str): "bronze", "silver" or "gold"
+
+    Returns:
+        dict: {column name: dtype}. Empty for unknown datasets.
+    """
+    if dataset not in expected_columns:
+        return {}
+
+    dtypes = dict(column_dtypes[dataset])
+    if layer != "bronze":
+        dtypes.pop(date_columns.get(dataset), None)
+        dtypes = {column.lower(): dtype for column, dtype in dtypes.items()}
+    return dtypes
+
+
+# function to work out which dataset an object holds
+def dataset_for(object_name: str):
+    """
+    Maps an object key to its dataset, e.g "ratings/2000-01.csv" -> "ratings".
+
+    Returns:
+        str: dataset name, or None if the key is not a known dataset
+    """
+    name = object_name.split("/")[0].split(".")[0]
+    return name if name in expected_columns else None
+
+
+# function to read a csv with the registry dtypes
+def read_csv(source, dataset: str, layer: str = "bronze", **kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv with the dataset's compact dtypes applied while parsing.
+
+    Parameters:
+        source: path, url or buffer accepted by pd.read_csv
+        dataset (str): dataset name. unknown datasets fall back to type inference.
+        layer (str): "bronze", "silver" or "gold"
+        **kwargs: passed through to pd.read_csv
+    """
+    dtypes = get_dtypes(dataset, layer)
+    if dtypes:
+        kwargs.setdefault("dtype", dtypes)
+    return pd.read_csv(source, **kwargs)
+
+
+# function to cast an already loaded frame to the registry dtypes
+def apply_dtypes(df: pd.DataFrame, dataset: str, layer: str = "bronze") -> pd.DataFrame:
+    """
+    Casts the columns of a frame that appear in the registry, e.g after a parquet read.
+    """
+    dtypes = {
+        column: dtype
+        for column, dtype in get_dtypes(dataset, layer).items()
+        if column in df.columns
+    }
+    return df.astype(dtypes) if dtypes else df
+
+
+# function to read an object's content with the registry dtypes
+def read_object(
+    source, object_name: str, layer: str = "bronze", columns: list = None
+) -> pd.DataFrame:
+    """
+    Reads a CSV or Parquet object into a dataframe. The format is taken from the
+    object's extension and the dataset from its key.
+
+    Parameters:
+        source: path or binary file (BytesIO, mmap ...) holding the object
+        object_name (str): object key e.g "ratings/2000-01.csv"
+        layer (str): "bronze", "silver" or "gold"
+        columns (list): optional subset of columns to read
+    """
+    dataset = dataset_for(object_name)
+    if object_name.endswith(".parquet"):
+        df = pd.read_parquet(source, columns=columns)
+        return apply_dtypes(df, dataset, layer)
+    return read_csv(source, dataset, layer, usecols=columns)
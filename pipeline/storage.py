@@ -0,0 +1,635 @@
+# importing libraries/modules
+import io
+import os
+import mmap
+import hashlib
+import time
+import fcntl
+import random
+import threading
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from pipeline.s3_client import (
+    initialize_s3_client,
+    create_bucket_if_not_exists as create_s3_bucket,
+    MultipartUploadWriter,
+    MIN_PART_SIZE,
+)
+from pipeline.object_cache import get_object_bytes, remember_object, write_through
+from pipeline.schemas import read_object
+from config import STORAGE_CONFIG, S3_BUCKET_BRONZE
+from utils.logger import get_logger
+
+# initialize logger
+logger = get_logger(__name__)
+
+# error codes of a conditional write whose precondition no longer holds
+PRECONDITION_FAILED_CODES = {"PreconditionFailed", "412", "ConditionalRequestConflict"}
+NOT_FOUND_CODES = {"NoSuchKey", "404", "NotFound"}
+
+
+class StorageBackend:
+    """
+    Object storage used by every layer. Buckets and keys keep their S3 meaning.
+
+    Missing objects raise botocore's ClientError (NoSuchKey / 404) on every backend,
+    so callers handle "not found" the same way whatever is configured.
+    """
+
+    def get(self, bucket_name: str, object_name: str) -> bytes:
+        """Returns the content of an object."""
+        raise NotImplementedError
+
+    def open(self, bucket_name: str, object_name: str):
+        """Returns a readable, seekable binary file of an object. Close it after use."""
+        return io.BytesIO(self.get(bucket_name, object_name))
+
+    def get_with_etag(self, bucket_name: str, object_name: str) -> tuple:
+        """Returns the (content, ETag) of an object, both of the same version."""
+        raise NotImplementedError
+
+    def put(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: bytes,
+        content_type=None,
+        if_match: str = None,
+        if_none_match: str = None,
+    ) -> dict:
+        """
+        Writes an object and returns a response holding its "ETag".
+
+        With if_match the write only happens if the object's ETag is still if_match,
+        with if_none_match="*" only if the object does not exist. Otherwise a
+        ClientError with code "PreconditionFailed" is raised.
+        """
+        raise NotImplementedError
+
+    def get_range(self, bucket_name: str, object_name: str, start: int, end: int):
+        """Returns the bytes start..end (inclusive) of an object."""
+        raise NotImplementedError
+
+    def open_ranged(self, bucket_name: str, object_name: str):
+        """
+        Returns a seekable binary file of an object that only fetches the byte ranges
+        that are read, e.g for pyarrow to read a few parquet row groups.
+        """
+        return RangeFile(self, bucket_name, object_name)
+
+    def head(self, bucket_name: str, object_name: str) -> dict:
+        """Returns the "ETag", "LastModified" and "ContentLength" of an object."""
+        raise NotImplementedError
+
+    def exists(self, bucket_name: str, object_name: str) -> bool:
+        """Checks that an object is present."""
+        try:
+            self.head(bucket_name, object_name)
+            return True
+        except ClientError:
+            return False
+
+    def list(self, bucket_name: str, prefix: str = "", delimiter: str = None) -> list:
+        """
+        Returns the sorted keys of a bucket that start with prefix. With delimiter
+        "/", only the keys directly under the prefix's "directory" are listed.
+        """
+        raise NotImplementedError
+
+    def delete(self, bucket_name: str, object_name: str):
+        """Removes an object. Missing objects are ignored."""
+        raise NotImplementedError
+
+    def open_write(
+        self,
+        bucket_name: str,
+        object_name: str,
+        part_size: int = MIN_PART_SIZE,
+        content_type: str = "application/csv",
+    ):
+        """
+        Returns a writable file that commits the object on close and discards it on
+        abort() or on an exception inside a with block.
+        """
+        raise NotImplementedError
+
+    def create_bucket(self, bucket_name: str):
+        """Creates a bucket if it does not exist already."""
+        raise NotImplementedError
+
+
+class S3Storage(StorageBackend):
+    """
+    Storage on S3 through a boto3 client. Reads go through the object cache.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, bucket_name, object_name):
+        return get_object_bytes(self.client, bucket_name, object_name)
+
+    def get_with_etag(self, bucket_name, object_name):
+        # not through the cache: the ETag must be the one S3 holds now
+        response = self.client.get_object(Bucket=bucket_name, Key=object_name)
+        data = response["Body"].read()
+        remember_object(bucket_name, object_name, response, data)
+        return data, response["ETag"]
+
+    def put(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        content_type=None,
+        if_match=None,
+        if_none_match=None,
+    ):
+        kwargs = {"ContentType": content_type} if content_type else {}
+        if if_match:
+            kwargs["IfMatch"] = if_match
+        if if_none_match:
+            kwargs["IfNoneMatch"] = if_none_match
+        response = self.client.put_object(
+            Bucket=bucket_name, Key=object_name, Body=data, **kwargs
+        )
+        # write-through of metadata: the next read of this object is a 304
+        write_through(bucket_name, object_name, response, data)
+        return response
+
+    def get_range(self, bucket_name, object_name, start, end):
+        response = self.client.get_object(
+            Bucket=bucket_name, Key=object_name, Range=f"bytes={start}-{end}"
+        )
+        return response["Body"].read()
+
+    def head(self, bucket_name, object_name):
+        return self.client.head_object(Bucket=bucket_name, Key=object_name)
+
+    def list(self, bucket_name, prefix="", delimiter=None):
+        keys = []
+        params = {"Bucket": bucket_name, "Prefix": prefix}
+        if delimiter is not None:
+            params["Delimiter"] = delimiter
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**params):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return sorted(keys)
+
+    def delete(self, bucket_name, object_name):
+        self.client.delete_object(Bucket=bucket_name, Key=object_name)
+
+    def open_write(
+        self,
+        bucket_name,
+        object_name,
+        part_size=MIN_PART_SIZE,
+        content_type="application/csv",
+    ):
+        return MultipartUploadWriter(
+            self.client,
+            bucket_name,
+            object_name,
+            part_size=part_size,
+            content_type=content_type,
+        )
+
+    def create_bucket(self, bucket_name):
+        create_s3_bucket(self.client, bucket_name)
+
+
+class LocalFileWriter(io.RawIOBase):
+    """
+    Writable file that lands at its path only when closed, so readers never see a
+    partial object. Mirrors MultipartUploadWriter for the local backend.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.bytes_written = 0
+        self._tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._aborted = False
+        self.etag = None  # ETag of the committed file
+        self._md5 = hashlib.md5()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.bytes_written
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed LocalFileWriter")
+        n = self._file.write(data)
+        self._md5.update(memoryview(data)[:n])
+        self.bytes_written += n
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._file.close()
+            if self._aborted:
+                os.remove(self._tmp_path)
+            else:
+                os.replace(self._tmp_path, self.path)
+                self.etag = f'"{self._md5.hexdigest()}"'
+                LocalStorage.remember_etag(self.path, self.etag)
+                logger.info(f"Wrote {self.bytes_written} bytes to '{self.path}'.")
+        finally:
+            super().close()
+
+    def abort(self):
+        """
+        Discards the file so no partial object is left behind.
+        """
+        self._aborted = True
+        self.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+
+class LocalStorage(StorageBackend):
+    """
+    Storage in a local directory: <root>/<bucket>/<key>. Reads are memory-mapped.
+
+    Lets the whole pipeline run on one machine, with no S3 or moto in the way,
+    e.g to profile the compute cost of each stage.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket_name, object_name):
+        if not bucket_name:
+            raise ValueError("A bucket name is required.")
+        return os.path.join(self.root, bucket_name, *object_name.split("/"))
+
+    @staticmethod
+    def _not_found(operation, path, code="NoSuchKey"):
+        return ClientError(
+            {"Error": {"Code": code, "Message": f"{path} does not exist."}}, operation
+        )
+
+    @staticmethod
+    def _precondition_failed(path):
+        return ClientError(
+            {
+                "Error": {
+                    "Code": "PreconditionFailed",
+                    "Message": f"{path} changed since it was read.",
+                }
+            },
+            "PutObject",
+        )
+
+    def get(self, bucket_name, object_name):
+        with self.open(bucket_name, object_name) as f:
+            return f.read()
+
+    def get_with_etag(self, bucket_name, object_name):
+        path = self._path(bucket_name, object_name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise self._not_found("GetObject", path)
+        return data, self.etag_of(data)
+
+    def open(self, bucket_name, object_name):
+        path = self._path(bucket_name, object_name)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return io.BytesIO()  # empty files cannot be mapped
+                # the map stays valid after the descriptor is closed
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise self._not_found("GetObject", path)
+
+    def get_range(self, bucket_name, object_name, start, end):
+        with self.open(bucket_name, object_name) as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def open_ranged(self, bucket_name, object_name):
+        return self.open(bucket_name, object_name)  # a memory map is already lazy
+
+    # path -> (stat signature, ETag) of the files hashed by this process
+    _etags = {}
+    _etags_lock = threading.Lock()
+
+    @staticmethod
+    def etag_of(data: bytes) -> str:
+        # the MD5 of the content, like S3 for single part objects: two writes of
+        # the same size within one mtime tick still get different ETags
+        return f'"{hashlib.md5(data).hexdigest()}"'
+
+    @staticmethod
+    def _signature(stat) -> tuple:
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+
+    @classmethod
+    def remember_etag(cls, path: str, etag: str):
+        """Records the ETag of a file just written, so head() need not hash it."""
+        try:
+            signature = cls._signature(os.stat(path))
+        except FileNotFoundError:
+            return
+        with cls._etags_lock:
+            cls._etags[path] = (signature, etag)
+
+    def _file_etag(self, path: str, stat) -> str:
+        # head() only: hashing a large file once per change, not once per call.
+        # conditional writes always hash the content they compare
+        signature = self._signature(stat)
+        with self._etags_lock:
+            cached = self._etags.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                md5.update(block)
+        etag = f'"{md5.hexdigest()}"'
+        with self._etags_lock:
+            self._etags[path] = (signature, etag)
+        return etag
+
+    def put(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        content_type=None,
+        if_match=None,
+        if_none_match=None,
+    ):
+        if not (if_match or if_none_match):
+            with LocalFileWriter(self._path(bucket_name, object_name)) as writer:
+                writer.write(data)
+            return {"ETag": writer.etag}
+
+        path = self._path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # conditional writes to a directory take turns: the check and the write
+        # happen under one lock, across threads and processes
+        lock = os.open(os.path.dirname(path), os.O_RDONLY)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path, "rb") as f:
+                    etag = self.etag_of(f.read())
+            except FileNotFoundError:
+                etag = None
+            if (if_none_match == "*" and etag is not None) or (
+                if_match and etag != if_match
+            ):
+                raise self._precondition_failed(path)
+            with LocalFileWriter(path) as writer:
+                writer.write(data)
+            return {"ETag": writer.etag}
+        finally:
+            os.close(lock)  # releases the lock
+
+    def head(self, bucket_name, object_name):
+        path = self._path(bucket_name, object_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise self._not_found("HeadObject", path, code="404")
+        return {
+            "ETag": self._file_etag(path, stat),
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            "ContentLength": stat.st_size,
+        }
+
+    def list(self, bucket_name, prefix="", delimiter=None):
+        bucket_dir = self._path(bucket_name, "")
+        keys = []
+        if delimiter == "/":
+            # one level: the files of the prefix's directory only
+            parent = prefix.rpartition("/")[0]
+            directory = os.path.join(bucket_dir, *parent.split("/"))
+            try:
+                names = os.listdir(directory)
+            except FileNotFoundError:
+                return []
+            for name in names:
+                key = f"{parent}/{name}" if parent else name
+                if (
+                    key.startswith(prefix)
+                    and not name.endswith(".tmp")
+                    and os.path.isfile(os.path.join(directory, name))
+                ):
+                    keys.append(key)
+            return sorted(keys)
+
+        for directory, _, files in os.walk(bucket_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, bucket_dir).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, bucket_name, object_name):
+        try:
+            os.remove(self._path(bucket_name, object_name))
+        except FileNotFoundError:
+            pass
+
+    def open_write(
+        self,
+        bucket_name,
+        object_name,
+        part_size=MIN_PART_SIZE,
+        content_type="application/csv",
+    ):
+        return LocalFileWriter(self._path(bucket_name, object_name))
+
+    def create_bucket(self, bucket_name):
+        os.makedirs(self._path(bucket_name, ""), exist_ok=True)
+        logger.info(f"Bucket '{bucket_name}' ready under {self.root}.")
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable view of a stored object where every read is a ranged GET.
+    """
+
+    def __init__(self, storage, bucket_name, object_name):
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.size = storage.head(bucket_name, object_name)["ContentLength"]
+        self.requests = 0
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.size - self._pos)
+        if n <= 0:
+            return 0
+        data = self.storage.get_range(
+            self.bucket_name, self.object_name, self._pos, self._pos + n - 1
+        )
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        self.requests += 1
+        return len(data)
+
+
+# function to check an error is a failed conditional write
+def is_precondition_failed(error: Exception) -> bool:
+    """
+    Checks that a ClientError means a conditional write lost to another writer.
+    """
+    return (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") in PRECONDITION_FAILED_CODES
+    )
+
+
+# function to read-modify-write an object without losing concurrent updates
+def update_object(
+    storage,
+    bucket_name: str,
+    object_name: str,
+    update,
+    content_type: str = "application/json",
+    attempts: int = None,
+):
+    """
+    Applies update to the latest content of an object and writes the result only
+    if nobody wrote the object in between (ETag compare-and-swap). On a conflict
+    the object is read again and update re-applied, with a jittered backoff.
+
+    Parameters:
+        storage: storage backend
+        bucket_name (str): bucket name
+        object_name (str): object key
+        update (callable): takes the current bytes (None if the object does not
+            exist) and returns the bytes to write, or None to leave it unchanged.
+            it may run several times, so it must not have other side effects.
+        content_type (str): content type of the object
+        attempts (int): writes to try, STORAGE_CONFIG["cas_attempts"] by default
+
+    Returns:
+        bytes: what was written, or None if update left the object unchanged
+    """
+    attempts = attempts or STORAGE_CONFIG["cas_attempts"]
+    for attempt in range(1, attempts + 1):
+        try:
+            current, etag = storage.get_with_etag(bucket_name, object_name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in NOT_FOUND_CODES:
+                raise
+            current, etag = None, None
+
+        data = update(current)
+        if data is None:
+            return None
+
+        try:
+            if etag is None:
+                storage.put(
+                    bucket_name, object_name, data, content_type, if_none_match="*"
+                )
+            else:
+                storage.put(bucket_name, object_name, data, content_type, if_match=etag)
+            return data
+        except ClientError as e:
+            if not is_precondition_failed(e) or attempt == attempts:
+                raise
+            delay = STORAGE_CONFIG["cas_backoff_seconds"] * 2 ** (attempt - 1)
+            logger.info(
+                f"'{object_name}' changed while updating it. Retrying ({attempt}/{attempts})."
+            )
+            time.sleep(random.uniform(0, delay))
+
+
+# function to get the configured storage
+def get_storage(client_factory=None) -> StorageBackend:
+    """
+    Returns the storage backend chosen by config.STORAGE_CONFIG["backend"].
+
+    Parameters:
+        client_factory (callable): returns the S3 client for the S3 backend.
+            modules pass their own initialize_s3_client. not called for local storage.
+    """
+    if STORAGE_CONFIG["backend"] == "local":
+        return LocalStorage(STORAGE_CONFIG["local_root"])
+    return S3Storage((client_factory or initialize_s3_client)())
+
+
+# function to accept either a storage backend or a raw boto3 client
+def as_storage(client) -> StorageBackend:
+    """
+    Wraps a boto3 client in S3Storage. Storage backends are returned unchanged.
+    """
+    return client if isinstance(client, StorageBackend) else S3Storage(client)
+
+
+# function to create a bucket on any backend
+def create_bucket_if_not_exists(client, bucket_name: str):
+    """
+    Creates a bucket if it doesn't exist already, on the configured backend.
+
+    Parameters:
+        client: storage backend or boto3 S3 client
+        bucket_name (str): bucket name
+    """
+    as_storage(client).create_bucket(bucket_name)
+
+
+# function to read an object into a dataframe on any backend
+def read_file(client, bucket_name: str, object_name: str, columns: list = None):
+    """
+    Reads a CSV or Parquet object into a DataFrame with the registry dtypes.
+    Local objects are parsed straight from a memory map.
+
+    Parameters:
+        client: storage backend or boto3 S3 client
+        bucket_name (str): bucket name
+        object_name (str): object key
+        columns (list): optional subset of columns to read
+
+    Returns:
+        pd.DataFrame: content of the object
+    """
+    layer = "bronze" if bucket_name == S3_BUCKET_BRONZE else "silver"
+    with as_storage(client).open(bucket_name, object_name) as source:
+        return read_object(source, object_name, layer, columns)
+
+
+if __name__ == "__main__":
+    pass
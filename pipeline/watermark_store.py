@@ -0,0 +1,289 @@
+# importing libraries/modules
+import io
+import json
+import uuid
+import pandas as pd
+from datetime import datetime
+from dataclasses import dataclass, asdict
+from botocore.exceptions import ClientError
+from pipeline.storage import update_object
+from utils.logger import get_logger
+from config import WATERMARKS_PATH, WATERMARK_CONFIG
+
+# initialize logger
+logger = get_logger(__name__)
+
+# columns of the legacy watermarks.csv and of watermark frames
+WATERMARK_COLUMNS = ["dataset_name", "max_value", "records_loaded", "processing_time"]
+
+
+@dataclass
+class Watermark:
+    """
+    Watermark of one dataset: the highest value loaded so far and the stats of
+    the run that last advanced it.
+    """
+
+    dataset_name: str
+    max_value: object  # timestamp string e.g "1998-04-22 23:10:38", or an id
+    records_loaded: int = 0
+    processing_time: str = None
+
+    @property
+    def timestamp(self):
+        """max_value as a naive pd.Timestamp, NaT if it is not a date."""
+        return pd.to_datetime(self.max_value, errors="coerce")
+
+
+# function to turn numpy and pandas scalars into JSON values
+def _plain(value):
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return str(value)  # same spelling as the legacy CSV
+    if hasattr(value, "item"):
+        return value.item()  # numpy scalars
+    return value
+
+
+# function to compare two watermark values
+def _is_ahead(value, current) -> bool:
+    if isinstance(value, (int, float)) and isinstance(current, (int, float)):
+        return value >= current
+    return pd.to_datetime(str(value)) >= pd.to_datetime(str(current))
+
+
+# function to find the max of a legacy max_value column
+def _legacy_max(values: pd.Series):
+    numbers = pd.to_numeric(values, errors="coerce")
+    if numbers.notna().all():
+        return _plain(numbers.max())
+    dates = pd.to_datetime(values, errors="coerce").dropna()
+    return str(dates.max()) if not dates.empty else None
+
+
+class WatermarkStore:
+    """
+    Watermarks of a bucket, one small "current" record per dataset plus an
+    append-only history:
+
+        watermarks/current/<dataset>.json        read and written once per run
+        watermarks/history/<dataset>/<ts>-<id>.json   one record per advance
+        watermarks/history/<dataset>/<ts>-<id>.csv    compacted records up to <ts>
+
+    Reading a watermark is one GET whatever the number of past runs. History
+    records are folded into a segment every WATERMARK_CONFIG["compact_every"]
+    advances. The legacy watermarks.csv is still read for datasets without a
+    current record, and migrated on the first advance.
+
+    Current records are only written with conditional (ETag) writes, so tasks and
+    overlapping runs can advance watermarks concurrently without losing updates.
+    """
+
+    def __init__(self, storage, bucket_name: str, prefix: str = None):
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.prefix = prefix or WATERMARKS_PATH.rsplit("/", 1)[0]
+
+    def _current_key(self, dataset: str) -> str:
+        return f"{self.prefix}/current/{dataset}.json"
+
+    def _history_prefix(self, dataset: str) -> str:
+        return f"{self.prefix}/history/{dataset}/"
+
+    def _read_current(self, dataset: str) -> dict:
+        try:
+            return json.loads(
+                self.storage.get(self.bucket_name, self._current_key(dataset))
+            )
+        except ClientError:
+            return None
+
+    def _read_legacy(self) -> pd.DataFrame:
+        try:
+            data = self.storage.get(self.bucket_name, WATERMARKS_PATH)
+        except ClientError as e:
+            logger.warning(f"Watermarks not found. Initializing new ones. Details: {e}")
+            return pd.DataFrame(columns=WATERMARK_COLUMNS)
+        return pd.read_csv(io.BytesIO(data))
+
+    def _update_current(self, dataset: str, update) -> dict:
+        # update takes the current record (None if missing) and returns the new one
+        def apply(data):
+            record = update(json.loads(data) if data is not None else None)
+            return None if record is None else json.dumps(record, default=str).encode()
+
+        data = update_object(
+            self.storage, self.bucket_name, self._current_key(dataset), apply
+        )
+        return None if data is None else json.loads(data)
+
+    def get(self, dataset: str) -> Watermark:
+        """
+        Returns the watermark of a dataset, or None if it was never advanced.
+        """
+        record = self._read_current(dataset)
+        if record is not None:
+            record.pop("pending", None)
+            return Watermark(**record)
+
+        legacy = self._read_legacy()
+        rows = legacy[legacy["dataset_name"] == dataset]
+        max_value = _legacy_max(rows["max_value"]) if not rows.empty else None
+        if max_value is None:
+            return None
+        last = rows.iloc[-1]
+        return Watermark(
+            dataset,
+            max_value,
+            int(last["records_loaded"]),
+            str(last["processing_time"]),
+        )
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Returns the current watermark of every dataset as a frame with the legacy
+        columns, one row per dataset. Falls back to the legacy watermarks.csv
+        until the store holds a current record.
+        """
+        keys = self.storage.list(self.bucket_name, f"{self.prefix}/current/")
+        if not keys:
+            return self._read_legacy()
+
+        records = []
+        for key in keys:
+            record = json.loads(self.storage.get(self.bucket_name, key))
+            records.append({column: record.get(column) for column in WATERMARK_COLUMNS})
+        return pd.DataFrame(records, columns=WATERMARK_COLUMNS)
+
+    def advance(self, dataset: str, value, stats: dict = None) -> Watermark:
+        """
+        Records a run that loaded a dataset up to value. The current watermark
+        only moves forward; the run is appended to the history either way.
+
+        Parameters:
+            dataset (str): dataset name e.g "ratings"
+            value: highest value the run loaded (timestamp or id)
+            stats (dict): "records_loaded" and "processing_time" of the run
+
+        Returns:
+            Watermark: the current watermark after the run
+        """
+        stats = stats or {}
+        run = {
+            "dataset_name": dataset,
+            "max_value": _plain(value),
+            "records_loaded": int(stats.get("records_loaded", 0)),
+            "processing_time": str(stats.get("processing_time") or pd.Timestamp.now()),
+        }
+
+        if self._read_current(dataset) is None:
+            self._migrate_legacy()
+
+        # history first: a crash in between leaves the run logged, not lost
+        history_key = (
+            f"{self._history_prefix(dataset)}"
+            f"{pd.Timestamp.now(tz='UTC'):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.json"
+        )
+        self.storage.put(
+            self.bucket_name,
+            history_key,
+            json.dumps(run).encode("utf-8"),
+            content_type="application/json",
+        )
+
+        def advance_current(current):
+            record = dict(run)
+            if current is not None and not _is_ahead(
+                run["max_value"], current["max_value"]
+            ):
+                record["max_value"] = current["max_value"]
+            record["pending"] = (current or {}).get("pending", 0) + 1
+            return record
+
+        record = self._update_current(dataset, advance_current)
+        logger.info(f"Advanced the {dataset} watermark to {record['max_value']}.")
+
+        # exactly one concurrent advance reaches each multiple
+        if record["pending"] % WATERMARK_CONFIG["compact_every"] == 0:
+            self.compact(dataset)
+
+        record.pop("pending")
+        return Watermark(**record)
+
+    def history(self, dataset: str) -> pd.DataFrame:
+        """
+        Returns every recorded run of a dataset in order, legacy rows first.
+        """
+        legacy = self._read_legacy()
+        frames = [legacy[legacy["dataset_name"] == dataset]]
+        records = []
+        for key in self.storage.list(self.bucket_name, self._history_prefix(dataset)):
+            data = self.storage.get(self.bucket_name, key)
+            if key.endswith(".csv"):
+                frames.append(pd.read_csv(io.BytesIO(data)))
+            else:
+                records.append(json.loads(data))
+        frames.append(pd.DataFrame(records, columns=WATERMARK_COLUMNS))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=WATERMARK_COLUMNS)
+        return pd.concat(frames, ignore_index=True)[WATERMARK_COLUMNS]
+
+    def compact(self, dataset: str):
+        """
+        Folds the loose history records of a dataset into one CSV segment.
+        Advances may run meanwhile, but not another compaction of the dataset.
+        """
+        keys = [
+            key
+            for key in self.storage.list(
+                self.bucket_name, self._history_prefix(dataset)
+            )
+            if key.endswith(".json")
+        ]
+        if keys:
+            records = [json.loads(self.storage.get(self.bucket_name, k)) for k in keys]
+            buffer = io.BytesIO()
+            pd.DataFrame(records, columns=WATERMARK_COLUMNS).to_csv(buffer, index=False)
+            # named after its last record, so segments and records list in run order
+            self.storage.put(
+                self.bucket_name,
+                keys[-1][: -len(".json")] + ".csv",
+                buffer.getvalue(),
+                content_type="application/csv",
+            )
+            for key in keys:
+                self.storage.delete(self.bucket_name, key)
+
+        def fold(current):
+            if current is None:
+                return None
+            # records appended during the compaction stay pending
+            current["pending"] = max(current.get("pending", 0) - len(keys), 0)
+            return current
+
+        self._update_current(dataset, fold)
+        logger.info(f"Compacted {len(keys)} {dataset} watermark records.")
+
+    def _migrate_legacy(self):
+        """
+        Writes a current record for every dataset of the legacy watermarks.csv
+        that has none yet. The CSV is left in place as the oldest history.
+        """
+        legacy = self._read_legacy()
+        for dataset in legacy["dataset_name"].dropna().unique():
+            if self._read_current(dataset) is not None:
+                continue
+            watermark = self.get(dataset)
+            if watermark is not None:
+                # only created if missing: a concurrent advance may have won
+                self._update_current(
+                    dataset,
+                    lambda current: (
+                        {**asdict(watermark), "pending": 0} if current is None else None
+                    ),
+                )
+                logger.info(f"Migrated the {dataset} watermark from {WATERMARKS_PATH}.")
+
+
+if __name__ == "__main__":
+    pass
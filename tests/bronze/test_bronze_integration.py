@@ -1,10 +1,12 @@
 # General
+import io
+import json
 import pandas as pd
 import pytest
 from unittest.mock import patch, MagicMock
 from moto import mock_aws
 import boto3
-from pipeline.a_bronze.upload import upload_to_bronze
+from pipeline.a_bronze.upload import upload_to_bronze, stream_to_bronze
 from pipeline.a_bronze.orchestration import source_to_bronze
 
 
@@ -30,6 +32,59 @@ def test_upload_to_bronze_integration():
     assert "Contents" in result  # bucket contains at least an object
 
 
+@pytest.mark.integration
+@mock_aws
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_stream_to_bronze_integration():
+    """Test streaming dataframe chunks into a single object in a mocked S3 bucket."""
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="movie-pipeline-bronze")
+
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    chunks = [
+        pd.DataFrame(
+            [[1, 101, 4.0, 946598400], [2, 102, 5.0, 946624800]], columns=columns
+        ),
+        pd.DataFrame([[3, 103, 3.0, 946651200]], columns=columns),
+    ]
+
+    # Run function
+    rows = stream_to_bronze(s3, "ratings", iter(chunks), {"ratings": columns})
+
+    # Assert one header and every row landed in one object
+    body = s3.get_object(Bucket="movie-pipeline-bronze", Key="ratings.csv")["Body"]
+    result = pd.read_csv(body)
+    assert rows == 3
+    assert list(result.columns) == columns
+    assert result.shape == (3, 4)
+
+
+@pytest.mark.integration
+@mock_aws
+@patch.dict("pipeline.a_bronze.upload.BRONZE_CONFIG", {"format": "parquet"})
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_stream_to_bronze_parquet_integration():
+    """Test streaming chunks into one Parquet object, one row group per chunk."""
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="movie-pipeline-bronze")
+
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    chunks = [
+        pd.DataFrame([[1, 101, 4.0, 946598400]], columns=columns),
+        pd.DataFrame([[2, 102, 5.0, 946624800]], columns=columns),
+    ]
+
+    # Run function
+    rows = stream_to_bronze(s3, "ratings", iter(chunks), {"ratings": columns})
+
+    # Assert
+    body = s3.get_object(Bucket="movie-pipeline-bronze", Key="ratings.parquet")["Body"]
+    result = pd.read_parquet(io.BytesIO(body.read()))
+    assert rows == 2
+    assert list(result.columns) == columns
+    assert result["item_id"].tolist() == [101, 102]
+
+
 # -----------------
 # Source_to_Bronze()
 # ------------------
@@ -38,9 +93,11 @@ def test_upload_to_bronze_integration():
 # source_to_bronze success
 @pytest.mark.integration
 # patch order matters: bottom to top - reverse of parameter order
+@patch("pipeline.a_bronze.orchestration.probe_source", return_value={})
+@patch("pipeline.a_bronze.orchestration.stream_to_bronze")
+@patch("pipeline.a_bronze.orchestration.read_source_chunks")
 @patch("pipeline.a_bronze.orchestration.read_files")
-@patch("pipeline.a_bronze.orchestration.validate_columns")
-@patch("pipeline.a_bronze.orchestration.validate_nulls")
+@patch("pipeline.a_bronze.orchestration.validate_dataframes")
 @patch("pipeline.a_bronze.orchestration.create_bucket_if_not_exists")
 @patch("pipeline.a_bronze.orchestration.upload_to_bronze")
 @patch("pipeline.a_bronze.orchestration.initialize_s3_client")
@@ -48,9 +105,11 @@ def test_source_to_bronze_success(
     mock_init_client,
     mock_upload,
     mock_create_bucket,
-    mock_validate_nulls,
-    mock_validate_columns,
+    mock_validate,
     mock_read_files,
+    mock_read_chunks,
+    mock_stream,
+    mock_probe,
 ):
     """
     Ensure full bronze pipeline executes all key steps in order.
@@ -83,17 +142,24 @@ def test_source_to_bronze_success(
     # Assertions
     mock_init_client.assert_called_once()
     mock_read_files.assert_called_once()
-    mock_validate_columns.assert_called_once()
-    mock_validate_nulls.assert_called_once()
+    mock_validate.assert_called_once()
     mock_create_bucket.assert_called_once()
     mock_upload.assert_called_once()
 
+    # ratings is streamed rather than read into memory
+    assert "ratings" not in mock_read_files.call_args[0][0]
+    mock_stream.assert_called_once()
+    assert mock_stream.call_args[0][1] == "ratings"
+
 
 # source_to_bronze failure
 @pytest.mark.integration
+@patch("pipeline.a_bronze.orchestration.probe_source", return_value={})
 @patch("pipeline.a_bronze.orchestration.read_files")  # bottom-most patch
 @patch("pipeline.a_bronze.orchestration.initialize_s3_client")  # top-most patch
-def test_source_to_bronze_failure(mock_init_client, mock_read_files, caplog):
+def test_source_to_bronze_failure(
+    mock_init_client, mock_read_files, mock_probe, caplog
+):
     """
     Ensure pipeline logs and raises exception when data ingestion fails.
     """
@@ -110,3 +176,52 @@ def test_source_to_bronze_failure(mock_init_client, mock_read_files, caplog):
 
     # Confirm the error message was logged
     assert "Pipeline execution failed. Error: Error Type" in caplog.text
+
+
+# source_to_bronze skips unchanged sources
+@pytest.mark.integration
+@mock_aws
+@patch.dict("pipeline.a_bronze.orchestration.INGEST_CONFIG", {"stream_sources": []})
+@patch("pipeline.a_bronze.orchestration.urls", {"users": "https://x/d/abc/view"})
+@patch("pipeline.a_bronze.orchestration.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+@patch("pipeline.a_bronze.fingerprints.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+@patch("pipeline.a_bronze.orchestration.probe_source")
+@patch("pipeline.a_bronze.orchestration.read_files")
+@patch("pipeline.a_bronze.orchestration.initialize_s3_client")
+def test_source_to_bronze_fingerprint_skip(
+    mock_init_client, mock_read_files, mock_probe
+):
+    """
+    Ensure a second run with an unchanged ETag neither downloads nor re-uploads,
+    and that the skip is recorded in the fingerprint store.
+    """
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="movie-pipeline-bronze")
+    mock_init_client.return_value = s3
+    mock_probe.return_value = {"etag": '"v1"'}
+    mock_read_files.return_value = {
+        "users": pd.DataFrame(
+            [[1, 24, "M", "student", "10001"]],
+            columns=["user_id", "age", "gender", "occupation", "zip_code"],
+        )
+    }
+
+    # first run uploads and fingerprints the source
+    source_to_bronze()
+    first = s3.head_object(Bucket="movie-pipeline-bronze", Key="users.csv")
+
+    # second run sees the same etag
+    source_to_bronze()
+    second = s3.head_object(Bucket="movie-pipeline-bronze", Key="users.csv")
+
+    assert mock_read_files.call_args_list[1][0][0] == {}
+    assert first["ETag"] == second["ETag"]
+
+    body = s3.get_object(
+        Bucket="movie-pipeline-bronze", Key="fingerprints/sources.json"
+    )
+    store = json.loads(body["Body"].read())
+    assert store["users"]["etag"] == '"v1"'
+    assert store["users"]["skipped"] is True
+    assert store["users"]["verified_at"] > store["users"]["uploaded_at"]
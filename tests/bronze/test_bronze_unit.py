@@ -1,9 +1,22 @@
+import os
+import json
 import pandas as pd
 import pytest
+from io import BytesIO
 from unittest.mock import patch, MagicMock
 from pipeline.a_bronze.ingest import read_files
-from pipeline.a_bronze.upload import upload_to_bronze
-
+from pipeline.a_bronze.upload import upload_to_bronze, stream_to_bronze
+from pipeline.a_bronze.index import read_window
+from pipeline.a_bronze.fingerprints import frame_digest, is_unchanged
+from pipeline.schemas import get_dtypes, dataset_for
+from pipeline.a_bronze.validation import DataValidator, validate_dataframes
+from pipeline.s3_client import initialize_s3_client, read_file, check_conditional_writes
+from pipeline.object_cache import ObjectCache
+from pipeline.storage import LocalStorage, S3Storage
+from pipeline.storage import read_file as read_stored_file
+from moto import mock_aws
+import boto3
+from concurrent.futures import ThreadPoolExecutor
 
 # ------------
 # read_files()
@@ -71,6 +84,102 @@ def test_read_files_partial_failure(mock_read_csv):
     assert result["users"].shape[0] == 1
 
 
+@pytest.mark.unit
+@patch("pipeline.a_bronze.ingest.urlopen")
+def test_read_files_concurrent_success(mock_urlopen, caplog):
+    """
+    Test that concurrent mode streams every source into a dataframe and reports throughput.
+    """
+    urls = {
+        "users": "https://drive.google.com/file/d/abc123/view?usp=sharing",
+        "ratings": "https://drive.google.com/file/d/xyz456/view?usp=sharing",
+    }
+
+    # each call gets its own stream, as a real http response would
+    mock_urlopen.side_effect = lambda url, timeout: BytesIO(b"id,name\n1,A\n2,B\n")
+
+    with caplog.at_level("INFO"):
+        result = read_files(urls, concurrent=True)
+
+    assert set(result.keys()) == {"users", "ratings"}
+    for df in result.values():
+        assert df.shape == (2, 2)
+    assert mock_urlopen.call_count == 2
+    assert "MB/s" in caplog.text
+
+
+@pytest.mark.unit
+@patch("pipeline.a_bronze.ingest.urlopen")
+def test_read_files_concurrent_partial_failure(mock_urlopen, caplog):
+    """
+    Test that one failed download does not stop the other sources in concurrent mode.
+    """
+    urls = {
+        "users": "https://drive.google.com/file/d/abc123/view?usp=sharing",
+        "ratings": "https://drive.google.com/file/d/xyz456/view?usp=sharing",
+    }
+
+    def side_effect(url, timeout):
+        if "abc123" in url:
+            return BytesIO(b"id,name\n1,Alice\n")
+        raise Exception("Simulated read failure")
+
+    mock_urlopen.side_effect = side_effect
+
+    result = read_files(urls, concurrent=True)
+
+    assert list(result.keys()) == ["users"]
+    assert "Failed to read ratings" in caplog.text
+
+
+@pytest.mark.unit
+@patch("pipeline.a_bronze.ingest.urlopen")
+def test_read_files_applies_schema(mock_urlopen):
+    """
+    Test that sources are parsed with the compact dtypes of the schema registry.
+    """
+    urls = {
+        "ratings": "https://drive.google.com/file/d/xyz456/view?usp=sharing",
+        "users": "https://drive.google.com/file/d/abc123/view?usp=sharing",
+    }
+
+    def side_effect(url, timeout):
+        if "xyz456" in url:
+            return BytesIO(
+                b"user_id,item_id,rating,timestamp\n1,101,4.0,946598400\n6,,3.5,946670000\n"
+            )
+        return BytesIO(
+            b"user_id,age,gender,occupation,zip_code\n1,38,F,teacher,02139\n"
+        )
+
+    mock_urlopen.side_effect = side_effect
+
+    result = read_files(urls, concurrent=True)
+    ratings, users = result["ratings"], result["users"]
+
+    assert str(ratings["user_id"].dtype) == "Int32"
+    assert str(ratings["rating"].dtype) == "float32"
+    assert str(ratings["timestamp"].dtype) == "Int64"
+    assert ratings["item_id"].isna().sum() == 1
+    assert str(users["gender"].dtype) == "category"
+    assert users.loc[0, "zip_code"] == "02139"
+
+
+@pytest.mark.unit
+def test_schema_registry_layers():
+    """
+    Test that silver dtypes use lower case names and leave date columns to the transforms.
+    """
+    assert "IMDb_URL" in get_dtypes("movies")
+    assert "imdb_url" in get_dtypes("movies", "silver")
+    assert "timestamp" not in get_dtypes("ratings", "silver")
+    assert get_dtypes("watermarks") == {}
+
+    assert dataset_for("ratings/2000-01.csv") == "ratings"
+    assert dataset_for("movies.parquet") == "movies"
+    assert dataset_for("watermarks/watermarks.csv") is None
+
+
 # ------------
 # upload_to_bronze()
 # ------------
@@ -104,6 +213,30 @@ def test_upload_to_bronze_success():
     assert isinstance(kwargs["Body"], bytes)  # Body should be byte stream
 
 
+@pytest.mark.unit
+@patch.dict(
+    "pipeline.a_bronze.upload.BRONZE_CONFIG",
+    {"format": "parquet", "compression": "snappy"},
+)
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_upload_to_bronze_parquet():
+    """
+    Test that the parquet bronze format writes a .parquet object in config column order.
+    """
+    mock_client = MagicMock()
+
+    # columns deliberately out of config order
+    df = pd.DataFrame({"zip_code": ["10001"], "user_id": [1], "age": [24]})
+    uploaded = upload_to_bronze(mock_client, {"users": df})
+
+    args, kwargs = mock_client.put_object.call_args
+    assert uploaded == ["users"]
+    assert kwargs["Key"] == "users.parquet"
+
+    result = pd.read_parquet(BytesIO(kwargs["Body"]))
+    assert list(result.columns) == ["user_id", "age", "zip_code"]
+
+
 # Failure path
 @pytest.mark.unit
 @patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
@@ -162,3 +295,464 @@ def test_upload_to_bronze_partial(caplog):
     # Assert that success and failure logs are both present
     assert "Successfully uploaded users.csv" in caplog.text
     assert "Failed to upload ratings" in caplog.text
+
+
+# ------------
+# stream_to_bronze()
+# ------------
+
+
+@pytest.mark.unit
+@patch("pipeline.s3_client.MIN_PART_SIZE", 1)
+@patch.dict("pipeline.a_bronze.upload.INGEST_CONFIG", {"part_size": 16})
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_stream_to_bronze_multipart():
+    """
+    Test that chunks larger than a part are sent as a multipart upload.
+    """
+    mock_client = MagicMock()
+    mock_client.create_multipart_upload.return_value = {"UploadId": "abc"}
+    mock_client.upload_part.return_value = {"ETag": "etag"}
+
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    chunks = [
+        pd.DataFrame([[i, 100 + i, 4.0, 946598400]], columns=columns) for i in range(3)
+    ]
+
+    rows = stream_to_bronze(mock_client, "ratings", iter(chunks), {"ratings": columns})
+
+    assert rows == 3
+    mock_client.create_multipart_upload.assert_called_once()
+    assert mock_client.upload_part.call_count >= 2
+    mock_client.complete_multipart_upload.assert_called_once()
+
+    # the only single-part write is the time index, after the object
+    args, kwargs = mock_client.put_object.call_args
+    mock_client.put_object.assert_called_once()
+    assert kwargs["Key"] == "ratings.index.json"
+
+
+@pytest.mark.unit
+@patch("pipeline.s3_client.MIN_PART_SIZE", 1)
+@patch.dict("pipeline.a_bronze.upload.INGEST_CONFIG", {"part_size": 16})
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_stream_to_bronze_aborts_on_invalid_chunk():
+    """
+    Test that a chunk failing validation aborts the multipart upload.
+    """
+    mock_client = MagicMock()
+    mock_client.create_multipart_upload.return_value = {"UploadId": "abc"}
+    mock_client.upload_part.return_value = {"ETag": "etag"}
+
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    chunks = [
+        pd.DataFrame([[1, 101, 4.0, 946598400]], columns=columns),
+        pd.DataFrame([[2, 102, 5.0]], columns=columns[:3]),  # missing timestamp
+    ]
+
+    with pytest.raises(ValueError, match="Missing columns"):
+        stream_to_bronze(mock_client, "ratings", iter(chunks), {"ratings": columns})
+
+    mock_client.abort_multipart_upload.assert_called_once()
+    mock_client.complete_multipart_upload.assert_not_called()
+
+
+@pytest.mark.unit
+@patch.dict("pipeline.a_bronze.upload.BRONZE_CONFIG", {"format": "parquet"})
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_stream_to_bronze_local_storage(tmp_path):
+    """
+    Test that streaming to the local backend writes one readable object and
+    that an aborted stream leaves nothing behind.
+    """
+    storage = LocalStorage(str(tmp_path))
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    chunks = [
+        pd.DataFrame([[i, 100 + i, 4.0, 946598400]], columns=columns) for i in range(3)
+    ]
+
+    rows = stream_to_bronze(storage, "ratings", iter(chunks), {"ratings": columns})
+    df = read_stored_file(storage, "movie-pipeline-bronze", "ratings.parquet")
+
+    assert rows == 3
+    assert list(df["user_id"]) == [0, 1, 2]
+
+    bad = [pd.DataFrame([[1, 101, 4.0]], columns=columns[:3])]
+    with pytest.raises(ValueError, match="Missing columns"):
+        stream_to_bronze(storage, "users", iter(bad), {"users": columns})
+    assert storage.list("movie-pipeline-bronze") == [
+        "ratings.index.json",
+        "ratings.parquet",
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+@patch.dict("pipeline.a_bronze.upload.INGEST_CONFIG", {"index_block_rows": 2})
+@patch("pipeline.a_bronze.index.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_read_window_reads_overlapping_blocks_only(tmp_path, file_format):
+    """
+    Test that bronze ratings are stored sorted by time and that a window read
+    returns exactly the window's rows from the blocks overlapping it.
+    """
+    storage = LocalStorage(str(tmp_path))
+    timestamps = [946598400 + 3600 * i for i in range(10)]
+    df = pd.DataFrame(
+        {
+            "user_id": range(10),
+            "item_id": range(100, 110),
+            "rating": [4.0] * 10,
+            "timestamp": timestamps[::-1],  # arrives newest first
+        }
+    )
+
+    with patch.dict("pipeline.a_bronze.upload.BRONZE_CONFIG", {"format": file_format}):
+        assert upload_to_bronze(storage, {"ratings": df}) == ["ratings"]
+        object_name = f"ratings.{file_format}"
+
+        stored = read_stored_file(storage, "movie-pipeline-bronze", object_name)
+        assert stored["timestamp"].tolist() == timestamps
+
+        with patch.object(storage, "get_range", wraps=storage.get_range) as spy:
+            window = read_window(
+                storage, "ratings", object_name, timestamps[3], timestamps[5]
+            )
+
+    assert window["timestamp"].tolist() == timestamps[3:6]
+    assert window["user_id"].tolist() == [6, 5, 4]
+    if file_format == "csv":
+        # blocks [2, 3], [4, 5] are contiguous: one ranged read
+        spy.assert_called_once()
+
+    # rewriting the object without its index makes the index stale
+    storage.put("movie-pipeline-bronze", object_name, b"rewritten")
+    assert read_window(storage, "ratings", object_name, None, None) is None
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+@patch.dict(
+    "pipeline.a_bronze.upload.INGEST_CONFIG", {"index_block_rows": 3, "chunk_rows": 4}
+)
+@patch("pipeline.a_bronze.index.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+@patch("pipeline.a_bronze.upload.S3_BUCKET_BRONZE", "movie-pipeline-bronze")
+def test_stream_to_bronze_merges_chunks_in_time_order(tmp_path, file_format):
+    """
+    Test that streamed chunks arriving out of time order are merged into one
+    time sorted object whose index blocks do not overlap.
+    """
+    storage = LocalStorage(str(tmp_path / "storage"))
+    timestamps = [946598400 + 3600 * i for i in range(12)]
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    # interleaved chunks: every chunk spans most of the time range
+    chunks = [
+        pd.DataFrame(
+            [[t, 100 + t % 7, 4.0, timestamps[t]] for t in range(offset, 12, 3)],
+            columns=columns,
+        )
+        for offset in (2, 0, 1)
+    ]
+    chunks[1].loc[0, "timestamp"] = None  # nulls go last
+
+    with patch.dict(
+        "pipeline.a_bronze.upload.BRONZE_CONFIG", {"format": file_format}
+    ), patch.dict(
+        "pipeline.a_bronze.upload.INGEST_CONFIG", {"sort_dir": str(tmp_path)}
+    ):
+        rows = stream_to_bronze(storage, "ratings", iter(chunks), {"ratings": columns})
+        object_name = f"ratings.{file_format}"
+        stored = read_stored_file(storage, "movie-pipeline-bronze", object_name)
+        window = read_window(
+            storage, "ratings", object_name, timestamps[4], timestamps[5]
+        )
+
+    index = json.loads(storage.get("movie-pipeline-bronze", "ratings.index.json"))
+    assert rows == 12
+    assert stored["timestamp"].tolist()[:11] == timestamps[1:]
+    assert pd.isna(stored["timestamp"].iloc[-1])
+    assert index["sorted"]
+    assert [b["rows"] for b in index["blocks"]] == [3, 3, 3, 3]
+    assert window["user_id"].tolist() == [4, 5]
+    # the spilled runs are removed
+    assert sorted(os.listdir(tmp_path)) == ["storage"]
+
+
+# ------------
+# fingerprints
+# ------------
+
+
+@pytest.mark.unit
+def test_frame_digest_is_chunk_invariant():
+    """
+    Test that hashing a frame chunk by chunk matches hashing it whole.
+    """
+    df = pd.DataFrame({"user_id": range(10), "rating": [4.0] * 10})
+
+    digest = frame_digest(df.iloc[:3])
+    frame_digest(df.iloc[3:], digest)
+
+    assert digest.hexdigest() == frame_digest(df).hexdigest()
+    assert frame_digest(df.iloc[1:]).hexdigest() != frame_digest(df).hexdigest()
+
+
+@pytest.mark.unit
+def test_is_unchanged_precedence():
+    """
+    Test that ETag beats Last-Modified and the content hash is the fallback.
+    """
+    record = {"etag": '"a"', "last_modified": "Mon", "sha256": "abc"}
+
+    assert is_unchanged(record, {"etag": '"a"', "last_modified": "Tue"})
+    assert not is_unchanged(record, {"etag": '"b"'}, sha256="abc")
+    assert is_unchanged(record, {"last_modified": "Mon"})
+    assert is_unchanged(record, {}, sha256="abc")
+    assert not is_unchanged(record, {}, sha256="xyz")
+    assert not is_unchanged({}, {"etag": '"a"'})
+
+
+# ------------
+# DataValidator
+# ------------
+
+
+@pytest.mark.unit
+def test_data_validator_single_pass_report(caplog):
+    """
+    Test that one pass collects nulls, dtype, range and duplicate-key results.
+    """
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    df = pd.DataFrame(
+        [
+            [1, 101, 4.0, 946598400],
+            [1, 101, 4.0, 946598400],  # duplicate key
+            [2, None, 7.0, 946624800],  # null item_id, rating out of range
+            [3, 103, 3.0, 10],  # implausible timestamp
+        ],
+        columns=columns,
+    )
+
+    reports = validate_dataframes({"ratings": df}, {"ratings": columns})
+    report = reports["ratings"]
+
+    assert report["rows"] == 4
+    assert report["null_counts"] == {"item_id": 1}
+    assert report["range_violations"] == {"rating": 1, "timestamp": 1}
+    assert report["duplicate_keys"] == 1
+    assert report["dtype_mismatches"]["user_id"] == "int64"
+    assert "duplicate keys" in caplog.text
+
+
+@pytest.mark.unit
+def test_data_validator_incremental_matches_whole():
+    """
+    Test that validating chunk by chunk gives the same report as the whole frame,
+    including duplicates that straddle chunk boundaries.
+    """
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    df = pd.DataFrame(
+        [[i % 3, 100 + i % 3, 4.0, 946598400] for i in range(9)], columns=columns
+    )
+
+    whole = DataValidator("ratings", columns)
+    whole.update(df)
+
+    chunked = DataValidator("ratings", columns)
+    for start in range(0, 9, 2):
+        chunked.update(df.iloc[start : start + 2])
+
+    assert chunked.report() == whole.report()
+    assert whole.report()["duplicate_keys"] == 6
+
+
+@pytest.mark.unit
+@patch.dict("pipeline.a_bronze.validation.INGEST_CONFIG", {"key_filter_bytes": 4096})
+def test_data_validator_bounded_key_state():
+    """
+    Test that the cross-chunk duplicate state keeps its size however many keys are
+    streamed, that a single frame is counted exactly without it, and that the
+    duplicate check can be turned off.
+    """
+    columns = ["user_id", "item_id", "rating", "timestamp"]
+    frame = pd.DataFrame(
+        [[i % 300, i % 300, 4.0, 946598400] for i in range(1000)], columns=columns
+    )
+    single = DataValidator("ratings", columns)
+    single.update(frame)
+    assert single._key_filter is None
+    assert single.report()["duplicate_keys"] == 700
+
+    validator = DataValidator("ratings", columns)
+    for start in range(0, 2000, 500):
+        chunk = pd.DataFrame(
+            [[i, i, 4.0, 946598400] for i in range(start, start + 500)],
+            columns=columns,
+        )
+        validator.update(chunk)
+    validator.update(chunk.head(10))  # repeats keys of the previous chunk
+
+    assert validator._key_filter.bits.nbytes == 4096
+    assert validator.report()["duplicate_keys"] >= 10
+
+    with patch.dict(
+        "pipeline.a_bronze.validation.INGEST_CONFIG", {"duplicate_check": False}
+    ):
+        skipped = DataValidator("ratings", columns)
+        skipped.update(pd.concat([chunk, chunk]))
+    assert skipped.report()["duplicate_keys"] == 0
+
+
+@pytest.mark.unit
+def test_data_validator_missing_columns():
+    """
+    Test that a chunk missing expected columns raises.
+    """
+    validator = DataValidator("users", ["user_id", "age"])
+
+    with pytest.raises(ValueError, match="Missing columns in users"):
+        validator.update(pd.DataFrame({"user_id": [1]}))
+
+
+# ------------
+# initialize_s3_client()
+# ------------
+
+
+@pytest.mark.unit
+@patch("pipeline.s3_client._client", None)
+@patch.dict(
+    "pipeline.s3_client.S3_CLIENT_CONFIG",
+    {"max_pool_connections": 32, "retry_mode": "adaptive", "max_attempts": 7},
+)
+def test_initialize_s3_client_shared_and_tuned():
+    """
+    Test that pool workers racing for a client all get one tuned instance.
+    """
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: initialize_s3_client(), range(16)))
+
+    assert all(client is clients[0] for client in clients)
+
+    config = clients[0].meta.config
+    assert config.max_pool_connections == 32
+    assert config.retries["mode"] == "adaptive"
+    assert config.retries["total_max_attempts"] == 7
+    assert config.tcp_keepalive is True
+
+
+@pytest.mark.unit
+def test_check_conditional_writes():
+    """
+    Test that a botocore release without conditional PutObject parameters is
+    rejected when the client is created, not on the first watermark write.
+    """
+    client = boto3.client("s3", region_name="us-east-1")
+    check_conditional_writes(client)  # the installed release supports them
+
+    # a release from before conditional writes
+    members = client.meta.service_model.operation_model("PutObject").input_shape.members
+    old_client = MagicMock()
+    old_client.meta.service_model.operation_model.return_value.input_shape.members = {
+        k: v for k, v in members.items() if k not in ("IfMatch", "IfNoneMatch")
+    }
+    with pytest.raises(RuntimeError, match="IfMatch, IfNoneMatch"):
+        check_conditional_writes(old_client)
+
+
+# ------------
+# object cache
+# ------------
+
+
+@pytest.mark.unit
+def test_read_file_revalidates_cached_object(object_cache):
+    """
+    Test that a re-read of an unchanged object is served from the cache after a 304,
+    and that a changed object is downloaded again.
+    """
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="test-bucket")
+        s3.put_object(
+            Bucket="test-bucket", Key="users.csv", Body=b"user_id,age\n1,24\n"
+        )
+
+        first = read_file(s3, "test-bucket", "users.csv")
+        second = read_file(s3, "test-bucket", "users.csv")
+        assert object_cache.misses == 1
+        assert object_cache.hits == 1
+        pd.testing.assert_frame_equal(first, second)
+
+        s3.put_object(
+            Bucket="test-bucket", Key="users.csv", Body=b"user_id,age\n1,24\n2,35\n"
+        )
+        third = read_file(s3, "test-bucket", "users.csv")
+        assert object_cache.misses == 2
+        assert third.shape == (2, 2)
+
+
+@pytest.mark.unit
+def test_object_cache_lru_and_disk_tier(tmp_path):
+    """
+    Test that the memory tier evicts the least recently used object and that
+    evicted objects are still found on disk.
+    """
+    cache = ObjectCache(memory_bytes=10, disk_dir=str(tmp_path), disk_bytes=1024)
+    cache.put("b", "a.csv", '"etag-a"', b"aaaa")
+    cache.put("b", "b.csv", '"etag-b"', b"bbbb")
+    cache.get("b", "a.csv")  # a is now the most recently used
+    cache.put("b", "c.csv", '"etag-c"', b"cccc")
+
+    assert ("b", "b.csv") not in cache._entries
+    assert ("b", "a.csv") in cache._entries
+    assert cache.get("b", "b.csv") == ('"etag-b"', b"bbbb")
+
+    # a new process starts with an empty memory tier
+    fresh = ObjectCache(memory_bytes=10, disk_dir=str(tmp_path), disk_bytes=1024)
+    assert fresh.get("b", "c.csv") == ('"etag-c"', b"cccc")
+
+
+@pytest.mark.unit
+def test_object_cache_disk_tier_tracks_size(tmp_path):
+    """
+    Test that the disk tier evicts by its tracked size, scanning the directory only
+    when the cache is created.
+    """
+    # every entry is 8 bytes of etag, a newline and 4 bytes of data: 13 bytes
+    cache = ObjectCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=30)
+    with patch("pipeline.object_cache.os.scandir") as scandir:
+        cache.put("b", "a.csv", '"etag-a"', b"aaaa")
+        cache.put("b", "b.csv", '"etag-b"', b"bbbb")
+        cache.get("b", "a.csv")  # a is now the most recently used
+        cache.put("b", "c.csv", '"etag-c"', b"cccc")
+    scandir.assert_not_called()
+
+    assert cache._disk_size == 26
+    assert cache.get("b", "b.csv") is None
+    assert cache.get("b", "a.csv") == ('"etag-a"', b"aaaa")
+    assert len(os.listdir(tmp_path)) == 2
+
+    # a new process picks the size up from the directory
+    fresh = ObjectCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=30)
+    assert fresh._disk_size == 26
+
+
+@pytest.mark.unit
+@mock_aws
+def test_s3_put_writes_through_metadata_only(object_cache):
+    """
+    Test that a put caches manifests and other json metadata, but not data files
+    the process does not read back.
+    """
+    client = boto3.client("s3", region_name="us-east-1")
+    client.create_bucket(Bucket="silver-bucket")
+    storage = S3Storage(client)
+    storage.put("silver-bucket", "ratings/_manifest.json", b"{}")
+    storage.put("silver-bucket", "ratings/date=2024-01-01/part-0.parquet", b"x")
+
+    assert object_cache.get("silver-bucket", "ratings/_manifest.json") is not None
+    assert (
+        object_cache.get("silver-bucket", "ratings/date=2024-01-01/part-0.parquet")
+        is None
+    )
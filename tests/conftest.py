@@ -2,12 +2,32 @@ import pytest
 import boto3
 from moto import mock_aws
 import pandas as pd
+from unittest.mock import patch
+from pipeline.object_cache import ObjectCache
+
+
+@pytest.fixture(autouse=True)
+def object_cache():
+    """Gives every test an empty, memory-only object cache."""
+    cache = ObjectCache(memory_bytes=64 * 1024 * 1024)
+    with patch("pipeline.object_cache._cache", cache):
+        yield cache
+
 
 # -------------
 # Silver Fixtures
 # ------------
 
 
+@pytest.fixture(params=["pandas", "arrow"])
+def silver_engine(request):
+    """Runs a silver test once per cleaning engine, which must give identical output."""
+    with patch.dict(
+        "pipeline.b_silver.kernels.SILVER_CONFIG", {"engine": request.param}
+    ):
+        yield request.param
+
+
 @pytest.fixture
 def movie_data():
     """Simulated Bronze CSV movie dataset."""
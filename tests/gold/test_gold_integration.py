@@ -4,8 +4,14 @@ import boto3
 import io
 import pandas as pd
 from unittest.mock import patch, MagicMock
-from pipeline.s_gold.silver_watermarks import update_silver_watermarks
+from pipeline.s_gold.silver_watermarks import (
+    update_silver_watermarks,
+    read_silver_watermarks,
+    silver_watermark_store,
+)
 from pipeline.s_gold.load import load_movie_df, load_ratings_df, load_users_df
+from pipeline.dimensions import add_row_hashes
+from pipeline.watermark_store import Watermark
 from config import S3_BUCKET_SILVER, WATERMARKS_PATH
 from pipeline.s_gold.sql.schema import create_ratings_partition, upsert_ratings
 
@@ -49,19 +55,25 @@ def test_silver_watermarks_success(mock_init_client, sample_watermarks):
 
         update_silver_watermarks(new_data)
 
-        # Load the CSV from mock S3 directly into a DataFrame to validate
-        response = s3.get_object(
-            Bucket="movie-pipeline-silver", Key="watermarks/watermarks.csv"
-        )
-        df_result = pd.read_csv(io.BytesIO(response["Body"].read()))
-
-        # Validate Resutt
-        assert df_result.shape[0] == 4
+        # Validate Result: the legacy datasets migrated, ratings advanced
+        df_result = read_silver_watermarks()
+        assert df_result.shape[0] == 3
 
         assert "ratings" in df_result["dataset_name"].values
         assert "users" in df_result["dataset_name"].values
         assert "2025-11-01T00:00:00" in df_result["max_value"].values
 
+        store = silver_watermark_store()
+        assert store.get("ratings").records_loaded == 2000
+        assert store.get("users").max_value == 10023
+        assert store.history("ratings").shape[0] == 2  # legacy row + this run
+
+        # the legacy log is kept as the oldest history, untouched
+        response = s3.get_object(
+            Bucket="movie-pipeline-silver", Key="watermarks/watermarks.csv"
+        )
+        assert pd.read_csv(io.BytesIO(response["Body"].read())).shape[0] == 3
+
 
 # -------------
 # load_movie_df
@@ -144,6 +156,54 @@ def test_prepare_movie_df_failure(mock_read_file, caplog):
     assert "Simulated read failure" in caplog.text
 
 
+# Only changed rows are staged
+@pytest.mark.integration
+@patch("pipeline.s_gold.load.write_gold_hashes")
+@patch("pipeline.s_gold.load.read_gold_hashes")
+@patch("pipeline.s_gold.load.update_silver_watermarks")
+@patch("pipeline.s_gold.load.get_db_connection")
+@patch("pipeline.s_gold.load.write_to_postgres")
+@patch("pipeline.s_gold.load.read_silver_file")
+def test_load_movie_df_stages_changed_rows(
+    mock_read_silver_file,
+    mock_write_to_postgres,
+    mock_get_conn,
+    mock_update_watermarks,
+    mock_read_hashes,
+    mock_write_hashes,
+    movie_data,
+):
+    """
+    Integration test for load_movie_df with hashed silver movies: only rows whose
+    hash differs from the last load are staged, and nothing is loaded when every
+    hash matches.
+    """
+    df = add_row_hashes(pd.read_csv(io.StringIO(movie_data)))
+    mock_read_silver_file.side_effect = lambda name: df.copy()
+
+    # one movie changed since the last load
+    loaded = df[["item_id", "row_hash"]].copy()
+    loaded.loc[0, "row_hash"] += 1
+    mock_read_hashes.return_value = loaded
+
+    load_movie_df()
+
+    staged = mock_write_to_postgres.call_args[0][0]
+    assert list(staged["item_id"]) == [df.loc[0, "item_id"]]
+    assert "row_hash" not in staged.columns
+    mock_write_hashes.assert_called_once()
+    assert mock_update_watermarks.call_args[0][0]["records_loaded"] == 1
+
+    # nothing changed
+    mock_write_to_postgres.reset_mock()
+    mock_read_hashes.return_value = df[["item_id", "row_hash"]]
+
+    load_movie_df()
+
+    mock_write_to_postgres.assert_not_called()
+    mock_update_watermarks.assert_called_once()
+
+
 # -------------
 # load_user_df
 # ------------
@@ -234,31 +294,33 @@ def test_load_user_failure(
 
 # Success path
 @pytest.mark.integration
+@patch(
+    "pipeline.s_gold.load.read_silver_manifest",
+    lambda dataset: {"files": [{"key": "ratings/1999-12.csv", "partition": "1999-12"}]},
+)
 @patch("pipeline.s_gold.load.update_silver_watermarks")
 @patch("pipeline.s_gold.load.execute_sql")
 @patch("pipeline.s_gold.load.write_to_postgres")
-@patch("pipeline.s_gold.load.read_silver_watermarks")
+@patch("pipeline.s_gold.load.silver_watermark_store")
 @patch("pipeline.s_gold.load.read_silver_file")
 def test_load_rating_df_success(
     mock_read_silver_file,
-    mock_read_watermarks,
+    mock_watermark_store,
     mock_write_to_postgres,
     mock_execute_sql,
     mock_update_watermarks,
     rating_data,
-    sample_watermarks_n,
 ):
     """
     Integration test for load_ratings_df
 
     Parameters:
         mock_read_silver_file (MagicMock): Mocked function to simulate reading monthly ratings partitions from the silver layer.
-        mock_read_watermarks (MagicMock): Mocked function to simulate reading watermark metadata.
+        mock_watermark_store (MagicMock): Mocked store of the gold watermarks in the silver bucket.
         mock_write_to_postgres (MagicMock): Mocked function to simulate writing filtered ratings data to the staging table.
         mock_execute_sql (MagicMock): Mocked function to simulate SQL execution for partition creation and upsert.
         mock_update_watermarks (MagicMock): Mocked function to simulate updating watermark metadata.
         rating_data (pytest Fixture): Sample ratings data as a CSV string, defined in conftest.py.
-        sample_watermarks_n (pytest Fixture): Sample watermark metadata as a CSV string, defined in conftest.py.
     """
     # Parse data into DataFrames
     df = pd.read_csv(io.StringIO(rating_data))
@@ -266,7 +328,9 @@ def test_load_rating_df_success(
 
     # Mock functions
     mock_read_silver_file.return_value = df
-    mock_read_watermarks.return_value = pd.read_csv(io.StringIO(sample_watermarks_n))
+    mock_watermark_store.return_value.get.return_value = Watermark(
+        "ratings", "1999-12-16T12:00:00", 100
+    )
 
     # Run function under test
     pipeline_start = pd.Timestamp("2000-01-01", tz="UTC")
@@ -304,19 +368,22 @@ def test_load_rating_df_success(
 
 # Failure path
 @pytest.mark.integration
+@patch(
+    "pipeline.s_gold.load.read_silver_manifest",
+    lambda dataset: {"files": [{"key": "ratings/1999-12.csv", "partition": "1999-12"}]},
+)
 @patch("pipeline.s_gold.load.update_silver_watermarks")
 @patch("pipeline.s_gold.load.execute_sql")
 @patch("pipeline.s_gold.load.write_to_postgres")
-@patch("pipeline.s_gold.load.read_silver_watermarks")
+@patch("pipeline.s_gold.load.silver_watermark_store")
 @patch("pipeline.s_gold.load.read_silver_file")
 def test_load_ratings_df_failure(
     mock_read_silver_file,
-    mock_read_watermarks,
+    mock_watermark_store,
     mock_write_to_postgres,
     mock_execute_sql,
     mock_update_watermarks,
     rating_data,
-    sample_watermarks_n,
     caplog,
 ):
     """
@@ -325,12 +392,11 @@ def test_load_ratings_df_failure(
     Parameters:
 
         mock_read_silver_file (MagicMock): Mocked function to simulate reading monthly ratings partitions from the silver layer.
-        mock_read_watermarks (MagicMock): Mocked function to simulate reading watermark metadata.
+        mock_watermark_store (MagicMock): Mocked store of the gold watermarks in the silver bucket.
         mock_write_to_postgres (MagicMock): Mocked function that raises an exception to simulate a write failure.
         mock_execute_sql (MagicMock): Mocked function to simulate SQL execution for partition creation and upsert.
         mock_update_watermarks (MagicMock): Mocked function to simulate updating watermark metadata.
         rating_data (pytest Fixture): Sample ratings data as a CSV string, defined in conftest.py.
-        sample_watermarks_n (pytest Fixture): Sample watermark metadata as a CSV string, defined in conftest.py.
         caplog (pytest.LogCaptureFixture): Captures log output for assertion.
     """
 
@@ -339,9 +405,9 @@ def test_load_ratings_df_failure(
     ratings_df["timestamp"] = pd.to_datetime(ratings_df["timestamp"], unit="s")
     mock_read_silver_file.return_value = ratings_df
 
-    # Parse watermark CSV into DataFrame
-    watermark_df = pd.read_csv(io.StringIO(sample_watermarks_n))
-    mock_read_watermarks.return_value = watermark_df
+    mock_watermark_store.return_value.get.return_value = Watermark(
+        "ratings", "1999-12-16T12:00:00", 100
+    )
 
     # Simulate failure in write_to_postgres
     mock_write_to_postgres.side_effect = Exception("Simulated write failure")
@@ -361,3 +427,198 @@ def test_load_ratings_df_failure(
 
     mock_execute_sql.assert_not_called()
     mock_update_watermarks.assert_not_called()
+
+
+# initial load reads the whole history
+@pytest.mark.integration
+@patch("pipeline.s_gold.load.update_silver_watermarks")
+@patch("pipeline.s_gold.load.execute_sql")
+@patch("pipeline.s_gold.load.write_to_postgres")
+@patch("pipeline.s_gold.load.silver_watermark_store")
+@patch("pipeline.s_gold.load.read_silver_manifest")
+@patch("pipeline.s_gold.load.read_silver_file")
+def test_load_ratings_df_initial_reads_full_history(
+    mock_read_silver_file,
+    mock_read_manifest,
+    mock_watermark_store,
+    mock_write_to_postgres,
+    mock_execute_sql,
+    mock_update_watermarks,
+):
+    """
+    Integration test for the initial load_ratings_df: daily partitions older than
+    two months before pipeline_start are loaded too.
+    """
+    days = pd.to_datetime(["1997-01-05 10:00", "1999-06-01 08:00", "1999-12-30 12:00"])
+    files = {}
+    for i, ts in enumerate(days):
+        partition = ts.strftime("year=%Y/month=%m/day=%d")
+        files[f"ratings/{partition}/part-a.csv"] = pd.DataFrame(
+            {"user_id": [i], "item_id": [i], "rating": [4], "timestamp": [ts]}
+        )
+    mock_read_manifest.return_value = {
+        "files": [
+            {
+                "key": key,
+                "partition": key.split("/", 1)[1].rsplit("/", 1)[0],
+                "min_timestamp": str(df["timestamp"].min()),
+                "max_timestamp": str(df["timestamp"].max()),
+            }
+            for key, df in files.items()
+        ]
+    }
+    mock_read_silver_file.side_effect = lambda key: files[key]
+    mock_watermark_store.return_value.get.return_value = None
+
+    pipeline_start = pd.Timestamp("2000-01-01", tz="UTC")
+    kwargs = {
+        "data_interval_start": pd.Timestamp("1999-12-25", tz="UTC"),
+        "data_interval_end": pd.Timestamp("2000-01-01", tz="UTC"),
+    }
+    load_ratings_df(pipeline_start, **kwargs)
+
+    assert mock_read_silver_file.call_count == 3
+    written_df = mock_write_to_postgres.call_args[0][0]
+    assert sorted(written_df["timestamp"]) == list(days)
+
+
+# watermark committed in postgres with the upsert
+@pytest.mark.integration
+@patch(
+    "pipeline.s_gold.load.read_silver_manifest",
+    lambda dataset: {"files": [{"key": "ratings/1999-12.csv", "partition": "1999-12"}]},
+)
+@patch.dict("pipeline.s_gold.load.GOLD_CONFIG", {"db_watermarks": True})
+@patch("pipeline.s_gold.load.update_silver_watermarks")
+@patch("pipeline.s_gold.connection.get_db_connection")
+@patch("pipeline.s_gold.load.execute_sql")
+@patch("pipeline.s_gold.load.write_to_postgres")
+@patch("pipeline.s_gold.load.silver_watermark_store")
+@patch("pipeline.s_gold.load.read_silver_file")
+def test_load_ratings_df_db_watermark(
+    mock_read_silver_file,
+    mock_watermark_store,
+    mock_write_to_postgres,
+    mock_execute_sql,
+    mock_get_conn,
+    mock_update_watermarks,
+    rating_data,
+):
+    """
+    Integration test for load_ratings_df with GOLD_CONFIG["db_watermarks"]: the
+    watermark is read from postgres, and the upsert and the watermark advance run
+    in one transaction.
+    """
+    df = pd.read_csv(io.StringIO(rating_data))
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+    mock_read_silver_file.return_value = df
+
+    mock_engine = MagicMock()
+    mock_conn = MagicMock()
+    mock_get_conn.return_value = mock_engine
+    mock_engine.connect.return_value.__enter__.return_value.execute.return_value.scalar.return_value = pd.Timestamp(
+        "1999-12-16 12:00:00"
+    ).to_pydatetime()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+
+    # the S3 mirror failing must not fail a committed load
+    mock_update_watermarks.side_effect = Exception("Simulated S3 failure")
+
+    pipeline_start = pd.Timestamp("2000-01-01", tz="UTC")
+    kwargs = {
+        "data_interval_start": pd.Timestamp("1999-12-20", tz="UTC"),
+        "data_interval_end": pd.Timestamp("1999-12-27", tz="UTC"),
+    }
+    load_ratings_df(pipeline_start, **kwargs)
+
+    expected = df[df["timestamp"] > pd.Timestamp("1999-12-16 12:00:00")]
+    written_df = mock_write_to_postgres.call_args[0][0]
+    assert written_df.shape[0] == expected.shape[0]
+    mock_watermark_store.assert_not_called()
+
+    # upsert and watermark in the same begin() block
+    mock_engine.begin.assert_called_once()
+    assert mock_conn.execute.call_count == 2
+    watermark = mock_conn.execute.call_args_list[1][0][1]
+    assert watermark["dataset_name"] == "ratings"
+    assert watermark["records_loaded"] == expected.shape[0]
+    assert watermark["max_value"] == expected["timestamp"].max().to_pydatetime()
+
+    # the upsert no longer goes through execute_sql
+    mock_execute_sql.assert_any_call(create_ratings_partition, "ratings_partitions")
+    assert upsert_ratings not in [c[0][0] for c in mock_execute_sql.call_args_list]
+    mock_update_watermarks.assert_called_once()
+
+
+# reads the part files listed in the manifest
+@pytest.mark.integration
+@patch("pipeline.s_gold.load.update_silver_watermarks")
+@patch("pipeline.s_gold.load.execute_sql")
+@patch("pipeline.s_gold.load.write_to_postgres")
+@patch("pipeline.s_gold.load.silver_watermark_store")
+@patch("pipeline.s_gold.load.read_silver_manifest")
+@patch("pipeline.s_gold.load.read_silver_file")
+def test_load_ratings_df_reads_manifest_parts(
+    mock_read_silver_file,
+    mock_read_manifest,
+    mock_watermark_store,
+    mock_write_to_postgres,
+    mock_execute_sql,
+    mock_update_watermarks,
+    rating_data,
+):
+    """
+    Integration test for load_ratings_df reading only the part files whose time
+    range overlaps the window, with rows repeated across parts loaded once.
+    """
+    df = pd.read_csv(io.StringIO(rating_data))
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+
+    day = "year=1999/month=12/day=25"
+    mock_read_manifest.return_value = {
+        "files": [
+            {
+                "key": "ratings/year=1999/month=12/day=24/part-a.csv",
+                "partition": "year=1999/month=12/day=24",
+                "min_timestamp": "1999-12-24 00:00:00",
+                "max_timestamp": "1999-12-24 23:00:00",
+            },
+            {
+                "key": f"ratings/{day}/part-a.csv",
+                "partition": day,
+                "min_timestamp": "1999-12-25 00:00:00",
+                "max_timestamp": "1999-12-25 21:00:00",
+            },
+            {
+                "key": f"ratings/{day}/part-b.csv",
+                "partition": day,
+                "min_timestamp": "1999-12-25 14:00:00",
+                "max_timestamp": "1999-12-25 21:00:00",
+            },
+            {
+                "key": "ratings/year=2000/month=01/day=01/part-c.csv",
+                "partition": "year=2000/month=01/day=01",
+                "min_timestamp": "2000-01-01 00:00:00",
+                "max_timestamp": "2000-01-01 03:00:00",
+            },
+        ]
+    }
+    mock_read_silver_file.side_effect = [df.iloc[:4], df.iloc[2:]]
+    mock_watermark_store.return_value.get.return_value = None
+
+    # weekly run starting mid-month and ending at the month boundary
+    pipeline_start = pd.Timestamp("1999-12-01", tz="UTC")
+    kwargs = {
+        "data_interval_start": pd.Timestamp("1999-12-25", tz="UTC"),
+        "data_interval_end": pd.Timestamp("2000-01-01", tz="UTC"),
+    }
+    load_ratings_df(pipeline_start, **kwargs)
+
+    read_paths = [c.args[0] for c in mock_read_silver_file.call_args_list]
+    assert read_paths == [
+        "ratings/year=1999/month=12/day=25/part-a.csv",
+        "ratings/year=1999/month=12/day=25/part-b.csv",
+    ]
+
+    written_df = mock_write_to_postgres.call_args[0][0]
+    assert written_df.shape[0] == df.shape[0]
@@ -81,7 +81,7 @@ def test_read_silver_file_success(mock_init_client, caplog):
 
 
 @pytest.mark.unit
-@patch(
+@patch.dict(
     "pipeline.s_gold.connection.POSTGRES_CONFIG",
     {
         "user": "test_user",
@@ -101,6 +101,26 @@ def test_get_db_connection_success():
     assert "postgresql" in str(engine.url)
 
 
+@pytest.mark.unit
+@patch.dict(
+    "pipeline.s_gold.connection.POSTGRES_CONFIG",
+    {"database": "pooled_db", "pool_size": 3, "statement_timeout_ms": 60000},
+)
+@patch("pipeline.s_gold.connection.create_engine")
+def test_get_db_connection_reuses_engine(mock_create_engine):
+    """Test that one pooled engine per database is created and then reused"""
+
+    first = get_db_connection()
+    second = get_db_connection()
+
+    assert first is second
+    mock_create_engine.assert_called_once()
+    _, kwargs = mock_create_engine.call_args
+    assert kwargs["pool_size"] == 3
+    assert kwargs["pool_pre_ping"] is True
+    assert kwargs["connect_args"]["options"] == "-c statement_timeout=60000"
+
+
 # -------------
 # execute_sql
 # ------------
@@ -158,13 +178,13 @@ def test_execute_sql_failure(mock_get_conn, caplog):
 
 import logging
 
-
 # -------------
 # write_to_postgres
 # ------------
 
 
 @pytest.mark.unit
+@patch.dict("pipeline.s_gold.connection.POSTGRES_LOAD_CONFIG", {"method": "insert"})
 @patch("pipeline.s_gold.connection.get_db_connection")
 def test_write_to_postgres_success(mock_get_engine, sample_df, caplog):
     """✅ Test successful write with mocked engine"""
@@ -188,3 +208,48 @@ def test_write_to_postgres_success(mock_get_engine, sample_df, caplog):
         chunksize=1000,
     )
     assert "Successfully inserted" in caplog.text
+
+
+@pytest.mark.unit
+@patch.dict(
+    "pipeline.s_gold.connection.POSTGRES_LOAD_CONFIG",
+    {"method": "copy", "copy_chunk_rows": 1},
+)
+@patch("pipeline.s_gold.connection.get_db_connection")
+def test_write_to_postgres_copy(mock_get_engine, sample_df, caplog):
+    """Test that appends are streamed with COPY, in chunks, and committed once"""
+
+    caplog.set_level(logging.INFO)
+
+    mock_conn = mock_get_engine.return_value.raw_connection.return_value
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    copied = []
+    mock_cursor.copy_expert.side_effect = lambda sql, f: copied.append(f.read())
+
+    with patch.object(sample_df, "to_sql") as mock_to_sql:
+        write_to_postgres(sample_df, "stg_ratings")
+
+    sql = mock_cursor.copy_expert.call_args[0][0]
+    assert sql.startswith('COPY stg.stg_ratings ("user_id", "rating", "movie_id")')
+    assert copied == [b"1,5.0,42\n2,4.0,37\n"]
+    mock_conn.commit.assert_called_once()
+    mock_to_sql.assert_not_called()
+    assert "rows/s" in caplog.text
+
+
+@pytest.mark.unit
+@patch.dict("pipeline.s_gold.connection.POSTGRES_LOAD_CONFIG", {"method": "copy"})
+@patch("pipeline.s_gold.connection.get_db_connection")
+def test_write_to_postgres_copy_falls_back(mock_get_engine, sample_df, caplog):
+    """Test that a failed COPY is rolled back and the rows written with to_sql"""
+
+    mock_conn = mock_get_engine.return_value.raw_connection.return_value
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.copy_expert.side_effect = Exception("Simulated COPY failure")
+
+    with patch.object(sample_df, "to_sql") as mock_to_sql:
+        write_to_postgres(sample_df, "stg_ratings")
+
+    mock_conn.rollback.assert_called_once()
+    mock_to_sql.assert_called_once()
+    assert "falling back to to_sql" in caplog.text
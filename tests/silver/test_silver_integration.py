@@ -2,20 +2,34 @@ import pytest
 from moto import mock_aws
 import boto3
 import io
+import json
 import pandas as pd
 from unittest.mock import patch
 from pipeline.b_silver.transform import (
     prepare_movie_df,
     prepare_users_df,
     prepare_ratings_df,
+    read_bronze_ratings,
 )
+from pipeline.b_silver.compaction import compact_ratings
+from pipeline.partitions import (
+    read_manifest,
+    write_manifest,
+    write_part,
+    partition_files,
+    plan_files,
+)
+from pipeline.backfill import backfill_ratings, backfill_intervals
+from pipeline.b_silver.watermarks import watermark_store
+from pipeline.storage import get_storage
+from pipeline.storage import read_file as read_stored_file
 
 
 # test prepare_movie_df success
 @pytest.mark.integration
 @mock_aws
 @patch("pipeline.b_silver.transform.initialize_s3_client")
-def test_prepare_movie_df_success(mock_init_client, movie_data):
+def test_prepare_movie_df_success(mock_init_client, movie_data, silver_engine):
     """
     Integration test for prepare_movie_df() that reads movie data from the bronze bucket,
     transforms it, and writes the result to the silver bucket.
@@ -55,6 +69,36 @@ def test_prepare_movie_df_success(mock_init_client, movie_data):
         assert "Action" not in df_result["primary_genre"].values
 
 
+# test prepare_users_df skips unchanged users
+@pytest.mark.integration
+@mock_aws
+@patch("pipeline.b_silver.transform.initialize_s3_client")
+def test_prepare_users_df_skips_unchanged(mock_init_client, user_data):
+    """
+    Integration test for prepare_users_df(): a second run over the same bronze users
+    neither rewrites users.csv nor updates the watermark.
+    """
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="movie-pipeline-silver")
+    s3.create_bucket(Bucket="movie-pipeline-bronze")
+    s3.put_object(Bucket="movie-pipeline-bronze", Key="users.csv", Body=user_data)
+    mock_init_client.return_value = s3
+
+    with patch("config.WATERMARKS_PATH", "watermarks/watermarks.csv"):
+        prepare_users_df()
+        first = s3.head_object(Bucket="movie-pipeline-silver", Key="users.csv")
+        prepare_users_df()
+        second = s3.head_object(Bucket="movie-pipeline-silver", Key="users.csv")
+
+        assert first["LastModified"] == second["LastModified"]
+        assert watermark_store().history("users").shape[0] == 1
+
+        # every row carries its hash
+        response = s3.get_object(Bucket="movie-pipeline-silver", Key="users.csv")
+        df_result = pd.read_csv(io.BytesIO(response["Body"].read()))
+        assert df_result["row_hash"].notna().all()
+
+
 # test prepare_movie_df failure
 @pytest.mark.integration
 @mock_aws
@@ -93,7 +137,7 @@ def test_prepare_movie_df_read_failure(mock_init_client, mock_read_file, caplog)
 @pytest.mark.integration
 @mock_aws
 @patch("pipeline.b_silver.transform.initialize_s3_client")
-def test_prepare_users_df_success(mock_init_client, user_data):
+def test_prepare_users_df_success(mock_init_client, user_data, silver_engine):
     """
     Integration test for prepare_users_df() that reads user data from the bronze bucket,
     transforms it, and writes the result to the silver bucket.
@@ -172,7 +216,7 @@ def test_prepare_movie_df_write_failure(
 @pytest.mark.integration
 @mock_aws
 @patch("pipeline.b_silver.transform.initialize_s3_client")
-def test_prepare_ratings_df_success(mock_init_client, rating_data):
+def test_prepare_ratings_df_success(mock_init_client, rating_data, silver_engine):
     """
     Integration test for prepare_movie_df() that reads movie data from the bronze bucket,
     transforms it, and writes the result to the silver bucket.
@@ -205,10 +249,20 @@ def test_prepare_ratings_df_success(mock_init_client, rating_data):
 
         prepare_ratings_df(pipeline_start, **kwargs)
 
-        # Load the CSV from mock S3 directly into a DataFrame
+        # The manifest lists the part file written by the run
         response = s3.get_object(
-            Bucket="movie-pipeline-silver", Key="ratings/2000-01.csv"
+            Bucket="movie-pipeline-silver", Key="ratings/_manifest.json"
         )
+        manifest = json.loads(response["Body"].read())
+        assert len(manifest["files"]) == 1
+        part = manifest["files"][0]
+        assert part["partition"] == "year=1999/month=12/day=31"
+        assert part["key"].startswith("ratings/year=1999/month=12/day=31/part-")
+        assert part["min_timestamp"] == "1999-12-31 00:00:00"
+        assert part["rows"] == 5
+
+        # Load the CSV from mock S3 directly into a DataFrame
+        response = s3.get_object(Bucket="movie-pipeline-silver", Key=part["key"])
         df_result = pd.read_csv(io.BytesIO(response["Body"].read()))
 
         # Validate Resutt
@@ -220,6 +274,65 @@ def test_prepare_ratings_df_success(mock_init_client, rating_data):
         assert 6 not in df_result["user_id"].values
 
 
+# test prepare_ratings_df out of core
+@pytest.mark.integration
+@mock_aws
+@patch("pipeline.b_silver.transform.initialize_s3_client")
+def test_prepare_ratings_df_out_of_core(mock_init_client, rating_data):
+    """
+    Integration test for the out-of-core initial load: bronze is streamed in chunks
+    of two rows, spilled by day and finalized one partition at a time, with the
+    same result as the in-memory load.
+    """
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="movie-pipeline-silver")
+    s3.create_bucket(Bucket="movie-pipeline-bronze")
+
+    # one more day, and a row repeated in a later chunk
+    rating_data += "7,107,1.0,946512000\n" "1,101,4.0,946598400\n"
+    s3.put_object(Bucket="movie-pipeline-bronze", Key="ratings.csv", Body=rating_data)
+    mock_init_client.return_value = s3
+
+    with patch("config.S3_BUCKET_BRONZE", "movie-pipeline-bronze"), patch(
+        "config.S3_BUCKET_SILVER", "movie-pipeline-silver"
+    ), patch("config.WATERMARKS_PATH", "watermarks/watermarks.csv"), patch.dict(
+        "config.SILVER_CONFIG", {"out_of_core": "true", "memory_budget_bytes": 1}
+    ), patch(
+        "pipeline.b_silver.spill.SAMPLE_ROWS", 2
+    ):
+        pipeline_start = pd.Timestamp("2000-01-01", tz="UTC")
+        kwargs = {
+            "data_interval_start": pd.Timestamp("1999-12-25", tz="UTC"),
+            "data_interval_end": pd.Timestamp("2000-01-01", tz="UTC"),
+            "logical_date": pd.Timestamp("2000-01-01", tz="UTC"),
+        }
+        prepare_ratings_df(pipeline_start, **kwargs)
+
+        response = s3.get_object(
+            Bucket="movie-pipeline-silver", Key="ratings/_manifest.json"
+        )
+        manifest = json.loads(response["Body"].read())
+        assert [f["partition"] for f in manifest["files"]] == [
+            "year=1999/month=12/day=30",
+            "year=1999/month=12/day=31",
+        ]
+        assert [f["rows"] for f in manifest["files"]] == [1, 5]
+        assert sorted(manifest["key_indexes"]) == [
+            "year=1999/month=12/day=30",
+            "year=1999/month=12/day=31",
+        ]
+
+        response = s3.get_object(
+            Bucket="movie-pipeline-silver", Key=manifest["files"][1]["key"]
+        )
+        df_result = pd.read_csv(io.BytesIO(response["Body"].read()))
+        assert sorted(df_result["user_id"]) == [1, 2, 3, 4, 5]
+
+        # one watermark for the whole load
+        assert watermark_store().history("ratings").shape[0] == 1
+        assert watermark_store().get("ratings").records_loaded == 6
+
+
 # test prepare_ratings_df for failure path
 @pytest.mark.integration
 @patch("pipeline.b_silver.transform.update_watermarks")
@@ -259,3 +372,279 @@ def test_prepare_ratings_df_write_failure(
 
         # Validate log
         assert "Simulated update_watermark failure" in caplog.text
+
+
+# test compact_ratings merges small parts and legacy files
+@pytest.mark.integration
+def test_compact_ratings(tmp_path):
+    """
+    Integration test for compact_ratings() on the local storage backend: small part
+    files and a legacy monthly CSV become sorted, deduplicated parquet files that
+    replace their inputs in the manifest, one per month.
+    """
+    with patch.dict(
+        "pipeline.storage.STORAGE_CONFIG",
+        {"backend": "local", "local_root": str(tmp_path)},
+    ):
+        storage = get_storage()
+        manifest = read_manifest(storage, "ratings")
+        day = "year=1999/month=12/day=01"
+        rows = [
+            [1, 101, 4.0, "1999-12-01 05:00:00"],
+            [2, 102, 5.0, "1999-12-01 01:00:00"],
+            [3, 103, 3.0, "1999-12-01 03:00:00"],
+        ]
+        for i, row in enumerate(rows + [rows[0]]):  # the last part repeats a row
+            df = pd.DataFrame(
+                [row], columns=["user_id", "item_id", "rating", "timestamp"]
+            )
+            manifest["files"].append(write_part(storage, df, "ratings", day, f"r{i}"))
+        write_manifest(storage, manifest)
+        storage.put(
+            "movie-pipeline-silver",
+            "ratings/1999-11.csv",
+            b"user_id,item_id,rating,timestamp\n4,104,2.0,1999-11-20 00:00:00\n",
+        )
+
+        # dry run reports without writing
+        planned = compact_ratings(dry_run=True)
+        assert [r["partition"] for r in planned] == [
+            "year=1999/month=11",
+            "year=1999/month=12",
+        ]
+        assert read_manifest(storage, "ratings")["version"] == 1
+
+        reports = compact_ratings(max_workers=2)
+        manifest = read_manifest(storage, "ratings")
+
+        assert [r["status"] for r in reports] == ["compacted", "compacted"]
+        assert reports[1]["duplicates_dropped"] == 1
+        assert all(f["format"] == "parquet" for f in manifest["files"])
+        assert len(partition_files(manifest, "year=1999/month=12")) == 1
+        assert partition_files(manifest, "year=1999/month=11")
+        assert not storage.exists("movie-pipeline-silver", "ratings/1999-11.csv")
+
+        df = read_stored_file(
+            storage,
+            "movie-pipeline-silver",
+            partition_files(manifest, "year=1999/month=12")[0],
+        )
+        assert list(df["user_id"]) == [2, 3, 1]
+
+
+# test compact_ratings merges the single-file days of a month
+@pytest.mark.integration
+def test_compact_ratings_daily_partitions(tmp_path):
+    """
+    Integration test for compact_ratings() on daily partitions holding one small
+    part each, as an initial load writes them: every day of a month is merged into
+    one sorted file that readers still plan by time.
+    """
+    with patch.dict(
+        "pipeline.storage.STORAGE_CONFIG",
+        {"backend": "local", "local_root": str(tmp_path)},
+    ):
+        storage = get_storage()
+        manifest = read_manifest(storage, "ratings")
+        days = pd.date_range("2000-01-01 06:00", "2000-02-10 06:00", freq="D")
+        for i, ts in enumerate(days):
+            df = pd.DataFrame(
+                [[i, 100 + i, 4.0, ts]],
+                columns=["user_id", "item_id", "rating", "timestamp"],
+            )
+            manifest["files"].append(
+                write_part(
+                    storage, df, "ratings", ts.strftime("year=%Y/month=%m/day=%d"), "r0"
+                )
+            )
+        write_manifest(storage, manifest)
+
+        reports = compact_ratings()
+        manifest = read_manifest(storage, "ratings")
+
+        assert [(r["partition"], r["input_files"]) for r in reports] == [
+            ("year=2000/month=01", 31),
+            ("year=2000/month=02", 10),
+        ]
+        assert len(manifest["files"]) == 2
+        assert {f["partition"] for f in manifest["files"]} == {
+            "year=2000/month=01",
+            "year=2000/month=02",
+        }
+
+        # a weekly window still plans the monthly file from its statistics
+        keys = plan_files(
+            manifest, pd.Timestamp("2000-01-10"), pd.Timestamp("2000-01-17")
+        )
+        assert keys == partition_files(manifest, "year=2000/month=01")
+        df = read_stored_file(storage, "movie-pipeline-silver", keys[0])
+        assert df.shape[0] == 31
+        assert df["timestamp"].is_monotonic_increasing
+
+
+# test compact_ratings leaves earlier output alone
+@pytest.mark.integration
+def test_compact_ratings_keeps_compacted_files(tmp_path):
+    """
+    Integration test for compact_ratings() run after every weekly load: a month
+    compacted once is not read and rewritten when new small parts arrive, the new
+    parts are merged into a file of their own once there are enough of them.
+    """
+    with patch.dict(
+        "pipeline.storage.STORAGE_CONFIG",
+        {"backend": "local", "local_root": str(tmp_path)},
+    ):
+        storage = get_storage()
+
+        def add_days(days):
+            manifest = read_manifest(storage, "ratings")
+            for ts in days:
+                df = pd.DataFrame(
+                    [[ts.day, 100, 4.0, ts]],
+                    columns=["user_id", "item_id", "rating", "timestamp"],
+                )
+                manifest["files"].append(
+                    write_part(
+                        storage,
+                        df,
+                        "ratings",
+                        ts.strftime("year=%Y/month=%m/day=%d"),
+                        f"r{ts.day:02d}",
+                    )
+                )
+            write_manifest(storage, manifest)
+
+        add_days(pd.date_range("2000-01-01 06:00", "2000-01-07 06:00", freq="D"))
+        assert len(compact_ratings(min_files=2)) == 1
+        compacted = read_manifest(storage, "ratings")["files"]
+        assert len(compacted) == 1
+
+        # one new part: nothing to do, the compacted file is not rewritten
+        add_days([pd.Timestamp("2000-01-08 06:00")])
+        assert compact_ratings(min_files=2) == []
+
+        # a second new part: both are merged next to the compacted file
+        add_days([pd.Timestamp("2000-01-09 06:00")])
+        reports = compact_ratings(min_files=2)
+        manifest = read_manifest(storage, "ratings")
+
+        assert [r["input_files"] for r in reports] == [2]
+        assert manifest["files"][0] == compacted[0]
+        assert len(manifest["files"]) == 2
+        assert storage.list("movie-pipeline-silver", compacted[0]["key"]) == [
+            compacted[0]["key"]
+        ]
+
+        # an explicit request still merges the month into one file
+        reports = compact_ratings(partitions=["year=2000/month=01"])
+        assert [r["input_files"] for r in reports] == [2]
+        assert len(read_manifest(storage, "ratings")["files"]) == 1
+
+
+# test backfill_ratings matches interval by interval runs
+@pytest.mark.integration
+def test_backfill_ratings_matches_weekly_runs(tmp_path):
+    """
+    Integration test for backfill_ratings() on the local storage backend: two weeks
+    backfilled in one job commit the same silver rows and watermark as two weekly
+    runs, and the report counts the rows of each week.
+    """
+    bronze = (
+        "user_id,item_id,rating,timestamp\n"
+        "1,101,4.0,946857600\n"  # 2000-01-03 00:00:00
+        "2,102,5.0,946900800\n"  # 2000-01-03 12:00:00
+        "3,103,3.0,947376000\n"  # 2000-01-09 00:00:00 (second week)
+        "3,103,3.0,947376000\n"  # exact duplicate
+        "4,104,2.0,947980800\n"  # 2000-01-16 00:00:00 (after the range)
+    )
+    pipeline_start = pd.Timestamp("2000-01-01", tz="UTC")
+    start, end = pd.Timestamp("2000-01-02", tz="UTC"), pd.Timestamp(
+        "2000-01-16", tz="UTC"
+    )
+
+    def silver_state(root):
+        storage = get_storage()
+        manifest = read_manifest(storage, "ratings")
+        rows = pd.concat(
+            [
+                read_stored_file(storage, "movie-pipeline-silver", f["key"])
+                for f in manifest["files"]
+            ]
+        )
+        watermarks = watermark_store().history("ratings")
+        rows["timestamp"] = pd.to_datetime(rows["timestamp"], format="ISO8601")
+        return rows.sort_values("timestamp").reset_index(drop=True), watermarks
+
+    states = []
+    for mode in ["weekly", "backfill"]:
+        root = str(tmp_path / mode)
+        with patch.dict(
+            "pipeline.storage.STORAGE_CONFIG", {"backend": "local", "local_root": root}
+        ), patch("config.WATERMARKS_PATH", "watermarks/watermarks.csv"):
+            get_storage().put("movie-pipeline-bronze", "ratings.csv", bronze.encode())
+            if mode == "weekly":
+                for week_start in [start, start + pd.Timedelta(7, "D")]:
+                    prepare_ratings_df(
+                        pipeline_start,
+                        data_interval_start=week_start,
+                        data_interval_end=week_start + pd.Timedelta(7, "D"),
+                        logical_date=week_start,
+                    )
+            else:
+                report = backfill_ratings(
+                    start, end, pipeline_start=pipeline_start, layers=("silver",)
+                )
+                assert [r["rows"] for r in report] == [2, 1]
+            states.append(silver_state(root))
+
+    (weekly_rows, weekly_marks), (backfill_rows, backfill_marks) = states
+    pd.testing.assert_frame_equal(weekly_rows, backfill_rows)
+    assert list(backfill_rows["user_id"]) == [1, 2, 3]
+    weekly_max = pd.to_datetime(weekly_marks["max_value"], format="ISO8601").max()
+    assert weekly_max == pd.Timestamp(backfill_marks["max_value"].iloc[0])
+    assert backfill_marks.shape[0] == 1  # advanced once, to the last interval
+
+
+# test backfill_ratings from a start off the weekly schedule
+@pytest.mark.integration
+def test_backfill_ratings_partial_first_interval(tmp_path):
+    """
+    Integration test for backfill_ratings() from a Wednesday: the days up to the
+    first Sunday are a partial interval of their own, and the initial and the
+    incremental windows are split from a single read of bronze.
+    """
+    bronze = (
+        "user_id,item_id,rating,timestamp\n"
+        "1,101,4.0,946512000\n"  # 1999-12-30 00:00:00 (partial first week)
+        "2,102,5.0,946900800\n"  # 2000-01-03 12:00:00
+        "3,103,3.0,947376000\n"  # 2000-01-09 00:00:00
+    )
+    pipeline_start = pd.Timestamp("2000-01-02", tz="UTC")
+    start = pd.Timestamp("1999-12-29", tz="UTC")  # a Wednesday
+    end = pd.Timestamp("2000-01-16", tz="UTC")
+
+    boundaries = backfill_intervals(start, end)
+    assert [b.date().isoformat() for b in boundaries] == [
+        "1999-12-29",
+        "2000-01-02",
+        "2000-01-09",
+        "2000-01-16",
+    ]
+
+    with patch.dict(
+        "pipeline.storage.STORAGE_CONFIG",
+        {"backend": "local", "local_root": str(tmp_path)},
+    ), patch("config.WATERMARKS_PATH", "watermarks/watermarks.csv"), patch(
+        "pipeline.backfill.read_bronze_ratings",
+        wraps=read_bronze_ratings,
+    ) as backfill_read, patch(
+        "pipeline.b_silver.transform.read_bronze_ratings"
+    ) as run_read:
+        get_storage().put("movie-pipeline-bronze", "ratings.csv", bronze.encode())
+        report = backfill_ratings(
+            start, end, pipeline_start=pipeline_start, layers=("silver",)
+        )
+
+    assert [r["rows"] for r in report] == [1, 1, 1]
+    backfill_read.assert_called_once()
+    run_read.assert_not_called()
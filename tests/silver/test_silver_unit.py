@@ -1,9 +1,38 @@
 # General
+import os
 import pandas as pd
 import pytest
 from io import BytesIO
 from pipeline.b_silver.read_write_buckets import read_file, write_to_silver
 from pipeline.b_silver.watermarks import read_watermarks
+from pipeline.b_silver.transform import write_partitions, commit_partitions
+from pipeline.key_index import (
+    RATINGS_KEY,
+    RATINGS_ROW,
+    read_key_index,
+    key_hashes,
+    is_new,
+)
+from pipeline.b_silver.kernels import (
+    run_kernel,
+    clean_ratings,
+    clean_users,
+    kernel_timings,
+    KERNELS,
+)
+from pipeline.schemas import read_csv
+from pipeline.partitions import (
+    write_part,
+    read_manifest,
+    replace_files,
+    empty_manifest,
+    legacy_files,
+    adopt_legacy_files,
+)
+from pipeline.storage import LocalStorage, S3Storage, update_object
+from pipeline.storage import read_file as read_stored_file
+from concurrent.futures import ThreadPoolExecutor
+from pipeline.watermark_store import WatermarkStore
 from config import S3_BUCKET_SILVER
 
 from botocore.exceptions import ClientError
@@ -14,7 +43,6 @@ from unittest.mock import patch, MagicMock, ANY
 from moto import mock_aws
 import boto3
 
-
 # -------------
 # read_file()
 # ------------
@@ -50,6 +78,30 @@ def test_read_file_success(mock_init_client):
     assert df["rating"].iloc[0] == 5
 
 
+@pytest.mark.unit
+@patch("pipeline.b_silver.read_write_buckets.initialize_s3_client")
+def test_read_file_parquet(mock_init_client):
+    """
+    Test that `read_file()` reads parquet objects and projects columns.
+    """
+    buffer = BytesIO()
+    pd.DataFrame(
+        {"user_id": [1, 2], "rating": [5.0, 4.0], "movie_id": [42, 37]}
+    ).to_parquet(buffer, index=False)
+
+    # mock
+    mock_client = MagicMock()
+    mock_client.get_object.return_value = {"Body": BytesIO(buffer.getvalue())}
+    mock_init_client.return_value = mock_client
+
+    # Run
+    df = read_file("test_bucket", "bronze/test.parquet", columns=["user_id", "rating"])
+
+    # Validate result
+    assert df.shape == (2, 2)
+    assert list(df.columns) == ["user_id", "rating"]
+
+
 # test read_file failure
 @pytest.mark.unit
 @patch("pipeline.b_silver.read_write_buckets.initialize_s3_client")
@@ -255,8 +307,422 @@ def test_read_watermarks_failure(mock_init_client, caplog):
 # ---------------
 
 
+@pytest.mark.unit
+def test_watermark_store_advance_and_compact(tmp_path):
+    """
+    Test that the watermark store only moves forward, logs every run, and folds
+    the history into a segment every compact_every advances.
+    """
+    store = WatermarkStore(LocalStorage(str(tmp_path)), S3_BUCKET_SILVER)
+    assert store.get("ratings") is None
+
+    with patch.dict("config.WATERMARK_CONFIG", {"compact_every": 3}):
+        for day in ["2000-01-02", "2000-01-09", "2000-01-05", "2000-01-16"]:
+            store.advance(
+                "ratings",
+                pd.Timestamp(day),
+                {"records_loaded": 10, "processing_time": day},
+            )
+
+    watermark = store.get("ratings")
+    assert watermark.max_value == "2000-01-16 00:00:00"
+    assert watermark.timestamp == pd.Timestamp("2000-01-16")
+
+    history = store.history("ratings")
+    assert list(history["processing_time"]) == [
+        "2000-01-02",
+        "2000-01-09",
+        "2000-01-05",
+        "2000-01-16",
+    ]
+    keys = store.storage.list(S3_BUCKET_SILVER, "watermarks/history/ratings/")
+    assert [key.rsplit(".", 1)[1] for key in keys] == ["csv", "json"]
+
+
+@pytest.mark.unit
+def test_watermark_store_concurrent_advances(tmp_path):
+    """
+    Test that concurrent advances of the same and of different datasets are all
+    recorded: none of the read-modify-writes of a current record is lost.
+    """
+    store = WatermarkStore(LocalStorage(str(tmp_path)), S3_BUCKET_SILVER)
+    runs = [
+        ("ratings", pd.Timestamp("2000-01-01") + pd.Timedelta(days=d)) for d in range(8)
+    ]
+    runs += [
+        ("users", pd.Timestamp("2000-02-01") + pd.Timedelta(days=d)) for d in range(4)
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(runs)) as pool:
+        list(pool.map(lambda run: store.advance(*run, {"records_loaded": 1}), runs))
+
+    ratings = store._read_current("ratings")
+    assert ratings["max_value"] == "2000-01-08 00:00:00"
+    assert ratings["pending"] == 8
+    assert store._read_current("users")["pending"] == 4
+    assert store.history("ratings").shape[0] == 8
+
+
+@pytest.mark.unit
+def test_local_conditional_put_same_size_same_mtime(tmp_path):
+    """
+    Test that a conditional put on the local backend sees a concurrent write of
+    the same size landing in the same mtime tick: ETags follow the content.
+    """
+    storage = LocalStorage(str(tmp_path))
+    storage.put(S3_BUCKET_SILVER, "current.json", b'{"v": 1}')
+    path = tmp_path / S3_BUCKET_SILVER / "current.json"
+    mtime_ns = path.stat().st_mtime_ns
+    _, etag = storage.get_with_etag(S3_BUCKET_SILVER, "current.json")
+
+    # another writer, same size, same mtime
+    storage.put(S3_BUCKET_SILVER, "current.json", b'{"v": 2}')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    assert storage.head(S3_BUCKET_SILVER, "current.json")["ETag"] != etag
+    with pytest.raises(ClientError, match="PreconditionFailed"):
+        storage.put(S3_BUCKET_SILVER, "current.json", b'{"v": 3}', if_match=etag)
+    assert storage.get(S3_BUCKET_SILVER, "current.json") == b'{"v": 2}'
+
+
+@pytest.mark.unit
+def test_update_object_retries_on_conflict():
+    """
+    Test that update_object re-reads and re-applies its update when the object
+    was written between its read and its conditional write.
+    """
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=S3_BUCKET_SILVER)
+        storage = S3Storage(client)
+        storage.put(S3_BUCKET_SILVER, "counter.txt", b"1")
+
+        calls = []
+
+        def increment(data):
+            calls.append(data)
+            if len(calls) == 1:
+                # another writer commits first
+                client.put_object(Bucket=S3_BUCKET_SILVER, Key="counter.txt", Body=b"5")
+            return str(int(data) + 1).encode()
+
+        with patch.dict("pipeline.storage.STORAGE_CONFIG", {"cas_backoff_seconds": 0}):
+            written = update_object(storage, S3_BUCKET_SILVER, "counter.txt", increment)
+
+    assert calls == [b"1", b"5"]
+    assert written == b"6"
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("backend", ["local", "s3"])
+def test_legacy_files_list_one_level_once(tmp_path, backend):
+    """
+    Test that legacy monthly files are found with a one-level listing of the
+    dataset, and that a manifest that adopted them is never listed again.
+    """
+    keys = [
+        "ratings/1999-12.csv",
+        "ratings/_manifest.json",
+        "ratings/year=2000/month=01/day=01/part-r0.csv",
+        "ratings/year=2000/month=01/day=01/_keys-r0.npy",
+    ]
+
+    def check(storage):
+        for key in keys:
+            storage.put(S3_BUCKET_SILVER, key, b"user_id\n1\n")
+        assert storage.list(S3_BUCKET_SILVER, "ratings/", delimiter="/") == keys[:2]
+
+        manifest = empty_manifest("ratings")
+        with patch.object(storage, "list", wraps=storage.list) as spy:
+            assert adopt_legacy_files(storage, manifest) == 1
+            assert manifest["legacy_adopted"]
+            assert legacy_files(storage, manifest) == []
+        spy.assert_called_once_with(S3_BUCKET_SILVER, "ratings/", delimiter="/")
+        assert [f["key"] for f in manifest["files"]] == keys[:1]
+
+    if backend == "local":
+        check(LocalStorage(str(tmp_path)))
+    else:
+        with mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket=S3_BUCKET_SILVER)
+            check(S3Storage(client))
+
+
 # integration for read watermarks
 
+
+# ---------------
+# local storage backend
+# ---------------
+
+
+@pytest.mark.unit
+@patch("pipeline.b_silver.watermarks.initialize_s3_client")
+@patch("pipeline.b_silver.read_write_buckets.initialize_s3_client")
+def test_local_storage_round_trip(mock_rw_client, mock_wm_client, tmp_path):
+    """
+    Test that silver writes, reads and watermarks work on the local backend
+    without touching S3.
+    """
+    df = pd.DataFrame({"user_id": [1, 2], "age": [24, 35]})
+
+    with patch.dict(
+        "pipeline.storage.STORAGE_CONFIG",
+        {"backend": "local", "local_root": str(tmp_path)},
+    ):
+        write_to_silver(df, "users.csv")
+        result = read_file(S3_BUCKET_SILVER, "users.csv", columns=["age"])
+        empty = read_watermarks()
+
+    mock_rw_client.assert_not_called()
+    mock_wm_client.assert_not_called()
+    assert (tmp_path / S3_BUCKET_SILVER / "users.csv").exists()
+    assert list(result["age"]) == [24, 35]
+    assert empty.empty
+
+
+# -------------
+# write_partitions()
+# ------------
+
+
+@pytest.mark.unit
+def test_write_partitions_isolates_failures(tmp_path):
+    """
+    Test that partitions are written concurrently, that rows already in a partition
+    are skipped by key, that a failing partition does not stop the others and that
+    a failed batch leaves no files behind.
+    """
+    storage = LocalStorage(str(tmp_path))
+    manifest = read_manifest(storage, "ratings")
+    days = [f"year=2000/month=01/day={d:02d}" for d in range(1, 6)]
+    batches = {
+        day: pd.DataFrame(
+            {
+                "user_id": [i],
+                "item_id": [100 + i],
+                "rating": [4.0],
+                "timestamp": [pd.Timestamp(f"2000-01-{i + 1:02d} 10:00:00")],
+            }
+        )
+        for i, day in enumerate(days)
+    }
+
+    entries, indexes = write_partitions(storage, manifest, batches, "ok", max_workers=3)
+    assert [e["partition"] for e in entries] == days
+    assert sorted(indexes) == days
+    manifest["files"].extend(entries)
+    manifest["key_indexes"] = indexes
+
+    # a rerun with one new rating only appends that rating
+    rerun = dict(batches)
+    extra = batches[days[0]].assign(item_id=999)
+    rerun[days[0]] = pd.concat([batches[days[0]], extra, extra])
+    entries, indexes = write_partitions(storage, manifest, rerun, "again")
+    assert [(e["partition"], e["rows"]) for e in entries] == [(days[0], 1)]
+    assert list(indexes) == [days[0]]
+    before = storage.list(S3_BUCKET_SILVER, "ratings/")
+
+    def flaky_write_part(storage, df, dataset, partition, run_id):
+        if partition == days[2]:
+            raise OSError("disk full")
+        return write_part(storage, df, dataset, partition, run_id)
+
+    new_rows = {day: df.assign(item_id=500) for day, df in batches.items()}
+    with patch("pipeline.b_silver.transform.write_part", flaky_write_part):
+        with pytest.raises(RuntimeError, match="1 of 5 ratings partitions failed"):
+            write_partitions(storage, manifest, new_rows, "bad", max_workers=3)
+
+    # nothing written by the failed batch remains
+    assert storage.list(S3_BUCKET_SILVER, "ratings/") == before
+
+
+@pytest.mark.unit
+def test_append_partition_last_row_wins(tmp_path):
+    """
+    Test that a rating whose key is already in a partition replaces the committed
+    one when its value changed, and is skipped when it did not.
+    """
+    storage = LocalStorage(str(tmp_path))
+    day = "year=2000/month=01/day=01"
+
+    def batch(*ratings):
+        return {
+            day: pd.DataFrame(
+                {
+                    "user_id": [1] * len(ratings),
+                    "item_id": [100] * len(ratings),
+                    "rating": list(ratings),
+                    "timestamp": [pd.Timestamp("2000-01-01 10:00:00")] * len(ratings),
+                }
+            )
+        }
+
+    for run_id, ratings in [
+        ("a", (3.0,)),
+        ("b", (3.0,)),
+        ("c", (5.0, 4.5)),
+        ("d", (3.0,)),
+    ]:
+        manifest = read_manifest(storage, "ratings")
+        commit_partitions(
+            storage,
+            manifest,
+            *write_partitions(storage, manifest, batch(*ratings), run_id),
+        )
+
+    manifest = read_manifest(storage, "ratings")
+    rows = pd.concat(
+        [
+            read_stored_file(storage, S3_BUCKET_SILVER, f["key"])
+            for f in manifest["files"]
+        ]
+    )
+    # the unchanged rerun "b" adds nothing, the latest rating of every run is kept
+    assert rows["rating"].tolist() == [3.0, 4.5, 3.0]
+    assert rows.drop_duplicates(subset=RATINGS_KEY, keep="last")["rating"].tolist() == [
+        3.0
+    ]
+
+    # an index built from the files agrees with the committed one
+    del manifest["key_indexes"]
+    assert (
+        read_key_index(storage, manifest, day)
+        == read_key_index(storage, read_manifest(storage, "ratings"), day)
+    ).all()
+
+    # a file replacing the oldest part stays listed before the newer parts
+    keys = [f["key"] for f in manifest["files"]]
+    entry = dict(manifest["files"][0], key="ratings/compacted.csv")
+    committed = replace_files(storage, "ratings", keys[:1], [entry])
+    assert [f["key"] for f in committed["files"]] == [entry["key"]] + keys[1:]
+
+
+@pytest.mark.unit
+def test_commit_partitions_merges_concurrent_key_indexes(tmp_path):
+    """
+    Test that two runs appending to the same partition from the same manifest
+    both keep their keys: the second commit merges the first run's key index.
+    """
+    storage = LocalStorage(str(tmp_path))
+    day = "year=2000/month=01/day=01"
+
+    def batch(user_id):
+        return {
+            day: pd.DataFrame(
+                {
+                    "user_id": [user_id],
+                    "item_id": [100],
+                    "rating": [4.0],
+                    "timestamp": [pd.Timestamp("2000-01-01 10:00:00")],
+                }
+            )
+        }
+
+    first = read_manifest(storage, "ratings")
+    second = read_manifest(storage, "ratings")  # read before the first commit
+    first_run = write_partitions(storage, first, batch(1), "first")
+    second_run = write_partitions(storage, second, batch(2), "second")
+    commit_partitions(storage, first, *first_run)
+    commit_partitions(storage, second, *second_run)
+
+    manifest = read_manifest(storage, "ratings")
+    index = read_key_index(storage, manifest, day)
+    both = pd.concat([batch(1)[day], batch(2)[day]])
+    assert len(manifest["files"]) == 2
+    assert not is_new(index, key_hashes(both), key_hashes(both, RATINGS_ROW)).any()
+    # only the merged index is left
+    keys = storage.list(S3_BUCKET_SILVER, f"ratings/{day}/_keys-")
+    assert keys == [manifest["key_indexes"][day]]
+
+
+# -------------
+# kernels
+# ------------
+
+
+@pytest.mark.unit
+def test_run_kernel_process_pool_matches_inline():
+    """
+    Test that a string kernel run over chunks in worker processes returns the
+    same frame as running it inline, that the run is timed, and that vectorized
+    kernels stay in process whatever the workers.
+    """
+    users = pd.DataFrame(
+        {
+            "User ID": [1, 2, None, 4, 5],
+            "Age": [24, 53, 23, 24, 33],
+            "Gender": [" m", "f ", "M", "F", "m"],
+            "Occupation": ["technician ", "other", "writer", "TECHNICIAN", "other"],
+            "Zip Code": ["85711", " 94043", "32067", "43537", "15213"],
+        }
+    )
+
+    inline = run_kernel(clean_users, users, max_workers=1)
+    pooled = run_kernel(clean_users, users, chunk_rows=2, max_workers=2)
+
+    pd.testing.assert_frame_equal(pooled, inline)
+    assert inline["gender"].tolist() == ["M", "F", "F", "M"]
+    assert kernel_timings["clean_users"]["chunks"] == 3
+    assert kernel_timings["clean_users"]["workers"] == 2
+
+    ratings = pd.DataFrame(
+        {
+            "User ID": [1, 2, None, 4, 5],
+            "Item ID": [101, 102, 103, None, 105],
+            "Rating": [4.0, 5.0, 3.0, 2.0, None],
+            "Timestamp": [946598400 + i for i in range(5)],
+        }
+    )
+    cleaned = run_kernel(clean_ratings, ratings, chunk_rows=2, max_workers=2)
+    assert list(cleaned.columns) == ["user_id", "item_id", "rating", "timestamp"]
+    assert cleaned["user_id"].tolist() == [1, 2]
+    assert kernel_timings["clean_ratings"]["workers"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "dataset, data, kwargs",
+    [
+        (
+            "movies",
+            "item_id,movie_title,release_date,IMDb_URL,primary_genre\n"
+            "1, The Matrix ,1999-03-31, https://imdb/1 ,sci-fi\n"
+            "2,,1997-12-19,https://imdb/2,romance drama\n"
+            ",Heat,1995-12-15,https://imdb/3,crime\n"
+            "4,Toy Story,not a date,,\n"
+            "5,Babe,1995-08-04,,\n",
+            {"cutoff": pd.Timestamp("2000-01-01", tz="UTC")},
+        ),
+        (
+            "ratings",
+            "user_id,item_id,rating,timestamp\n"
+            "1,101,4.0,946598400\n2,,5.0,946624800\n3,103,3.0,\n4,104,,946677600\n",
+            {},
+        ),
+        (
+            "users",
+            "user_id,age,gender,occupation,zip_code\n"
+            "1,24, m ,student,10001\n2,35,F,Engineer ,\n,38,F,teacher,02139\n"
+            "4,29,,o'neil job, 123 \n",
+            {},
+        ),
+    ],
+)
+def test_arrow_engine_matches_pandas(dataset, data, kwargs):
+    """
+    Test that the Arrow kernels give the same rows, values and dtypes as pandas.
+    """
+    df = read_csv(BytesIO(data.encode("utf-8")), dataset)
+
+    expected = KERNELS["pandas"][dataset](df, **kwargs)
+    result = KERNELS["arrow"][dataset](df, **kwargs)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.to_csv(index=False) == expected.to_csv(index=False)
+
+
 #
 # watermarks data quality (as CI/CD with faking real data)
 
@@ -1,16 +1,33 @@
 from datetime import datetime
 from datetime import datetime, timedelta
 import pytz
+import pandas as pd
 from pipeline.s3_client import initialize_s3_client
+from pipeline.storage import get_storage
+from pipeline.a_bronze.fingerprints import read_fingerprints
+from pipeline.a_bronze.upload import bronze_object_name
 from config import S3_BUCKET_BRONZE, S3_BUCKET_SILVER, S3_BUCKET_GOLD
 
 
+# when bronze skipped an unchanged source, the object keeps its old LastModified
+def get_verified_at(client, key):
+    for record in read_fingerprints(client).values():
+        if record.get("object_name") == key and record.get("verified_at"):
+            return pd.Timestamp(record["verified_at"]).to_pydatetime()
+    return None
+
+
 # parent check function
 def check_s3_file_freshness(bucket_name, key, fresh_period=7):
-    client = initialize_s3_client()
-    response = client.head_object(Bucket=bucket_name, Key=key)
+    client = get_storage(initialize_s3_client)
+    response = client.head(bucket_name, key)
     last_modified = response["LastModified"]
 
+    if bucket_name == S3_BUCKET_BRONZE:
+        verified_at = get_verified_at(client, key)
+        if verified_at is not None and verified_at > last_modified:
+            last_modified = verified_at
+
     # Convert to local timezone if needed
     now = datetime.now(pytz.utc)
     freshness_threshold = now - timedelta(days=fresh_period)
@@ -24,12 +41,18 @@ def check_s3_file_freshness(bucket_name, key, fresh_period=7):
 
 
 def check_ratings_file():
-    return check_s3_file_freshness(bucket_name=S3_BUCKET_BRONZE, key="ratings.csv")
+    return check_s3_file_freshness(
+        bucket_name=S3_BUCKET_BRONZE, key=bronze_object_name("ratings")
+    )
 
 
 def check_movies_file():
-    return check_s3_file_freshness(bucket_name=S3_BUCKET_BRONZE, key="movies.csv")
+    return check_s3_file_freshness(
+        bucket_name=S3_BUCKET_BRONZE, key=bronze_object_name("movies")
+    )
 
 
 def check_users_file():
-    return check_s3_file_freshness(bucket_name=S3_BUCKET_BRONZE, key="users.csv")
+    return check_s3_file_freshness(
+        bucket_name=S3_BUCKET_BRONZE, key=bronze_object_name("users")
+    )